@@ -10,7 +10,23 @@ is_production = os.getenv("ENVIRONMENT") == "production"
 def create_app() -> Flask:
     app = Flask(__name__)
 
+    from app import cli
+
+    app.cli.add_command(cli.ratings)
+    app.cli.add_command(cli.head_to_head)
+    app.cli.add_command(cli.archive)
+
+    from app import services
+
+    # the client and storage are built before the first request rather than by
+    # it, and WARM_UP=1 also does the first request's other work up front, such
+    # as preloading the performances of the players in WARM_UP_PLAYERS
+    services.init_services()
+    if os.getenv("WARM_UP") == "1":
+        players = os.getenv("WARM_UP_PLAYERS", "")
+        services.warm_up([p for p in players.split(",") if p.strip()])
+
     with app.app_context():
-        from app.routes import api, views
+        from app.routes import api, instrumentation, views
 
         return app
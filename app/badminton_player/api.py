@@ -8,17 +8,21 @@ raw requests dumped from network traffic -> cURL request -> python code
 recommendation: leave
 """
 
+import json
 import re
+import threading
 import time
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List
+from io import StringIO
+from typing import TYPE_CHECKING, Dict, List, Optional
 
+import cachetools
 import cachetools.func
-import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 
+from app.badminton_player import freshness
+from app.badminton_player.archive import Archive
 from app.badminton_player.models import (
     Game,
     MatchMeta,
@@ -29,6 +33,45 @@ from app.badminton_player.models import (
     TeamMatch,
     Tournament,
 )
+from app.utils import fingerprints, metrics
+from app.utils.concurrency import single_flight
+
+# pandas and BeautifulSoup take a good part of a second to import, so they are
+# imported by the parsers that use them rather than whenever the client is
+if TYPE_CHECKING:
+    import pandas as pd
+
+UPSTREAM_SECONDS = metrics.Histogram(
+    "upstream_request_seconds",
+    "Requests to badmintonplayer.dk by endpoint.",
+    ["endpoint"],
+    timing="upstream",
+)
+UPSTREAM_RESPONSES = metrics.Counter(
+    "upstream_responses_total",
+    "Responses from badmintonplayer.dk by endpoint and status.",
+    ["endpoint", "status"],
+)
+UPSTREAM_IN_FLIGHT = metrics.Gauge(
+    "upstream_requests_in_flight", "Requests to badmintonplayer.dk in progress."
+)
+PARSE_SECONDS = metrics.Histogram(
+    "upstream_parse_seconds",
+    "Parsing of badmintonplayer.dk payloads by parser.",
+    ["parser"],
+    timing="parse",
+)
+
+# seconds to wait for badmintonplayer.dk to connect, and then for each response chunk
+UPSTREAM_TIMEOUT = 30
+
+# idle players are cached for up to a day, so more of them are kept than the
+# 128 of an hour-long cache
+PERFORMANCE_CACHE_SIZE = 1024
+
+
+def _performance_expiry(_, performance: Optional[PlayerPerformance], now: float):
+    return now + freshness.performance_ttl(performance)
 
 
 class TableType(Enum):
@@ -39,8 +82,64 @@ class TableType(Enum):
 
 
 class Client:
-    def __init__(self) -> None:
-        self.base_url = "https://www.badmintonplayer.dk"
+    """Fetches and parses pages from badmintonplayer.dk.
+
+    Every read is split into a fetch of the raw payload and a parse of it. With
+    an archive, fetched payloads are archived, and in replay mode they are only
+    read from the archive, so parsers can be rerun without touching upstream.
+    """
+
+    # archive endpoints
+    PLAYER_PROFILE = "player_profile"
+    SEARCH_PLAYER = "search_player"
+    MATCH = "match"
+
+    BASE_URL = "https://www.badmintonplayer.dk"
+
+    def __init__(
+        self,
+        archive: Optional[Archive] = None,
+        replay: bool = False,
+        base_url: Optional[str] = None,
+    ):
+        if replay and not archive:
+            raise ValueError("Replay mode requires an archive")
+
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.archive = archive
+        self.replay = replay
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """The calling thread's session, which keeps its connections alive.
+
+        One client serves every request thread, and sessions are not safe to
+        share between threads.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _archived(self, endpoint: str, key, payload: str) -> str:
+        if self.archive:
+            try:
+                self.archive.put(endpoint, key, payload)
+            except OSError as e:
+                print(f"Could not archive {endpoint} {key}: {e}")
+        return payload
+
+    def _request(self, endpoint: str, method: str, url: str, **kwargs):
+        with UPSTREAM_IN_FLIGHT.track(), UPSTREAM_SECONDS.time(endpoint=endpoint):
+            try:
+                kwargs.setdefault("timeout", UPSTREAM_TIMEOUT)
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                UPSTREAM_RESPONSES.inc(endpoint=endpoint, status="error")
+                raise
+        UPSTREAM_RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+        return response
 
     def _get_context_key(self) -> str:
         one_hour = 4 * 60 * 60
@@ -48,8 +147,11 @@ class Client:
         return self._extract_context_key(ttl_hash)
 
     @cachetools.func.ttl_cache(ttl=3600)
+    @single_flight
     def _extract_context_key(self, ttl_hash: int) -> str:
-        r = requests.get(self.base_url)
+        from bs4 import BeautifulSoup
+
+        r = self._request("context_key", "GET", self.base_url)
         soup = BeautifulSoup(r.text, features="lxml")
         scripts = soup.find_all("script")
         for s in scripts:
@@ -62,36 +164,14 @@ class Client:
         return ""
 
     def get_player(self, player_id: int) -> Player | None:
-        url = "http://badmintonplayer.dk/SportsResults/Components/WebService1.asmx/GetPlayerProfile"
-
-        payload = {
-            "callbackcontextkey": self._get_context_key(),
-            "seasonid": "",
-            "playerid": player_id,
-            "getplayerdata": True,
-            "showUserProfile": True,
-            "showheader": False,
-        }
-
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/111.0",
-            "Accept": "*/*",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate",
-            "X-Requested-With": "XMLHttpRequest",
-            "Content-Type": "application/json; charset=utf-8",
-            "Origin": "http://badmintonplayer.dk",
-            "DNT": "1",
-            "Connection": "keep-alive",
-            "Referer": "http://badmintonplayer.dk/DBF/Spiller/VisSpiller/",
-        }
-
-        response = requests.post(url, headers=headers, json=payload)
-        if not response.ok:
-            print("Could not get player", player_id, response.status_code)
+        raw = self.fetch_player_profile(player_id)
+        if raw is None:
             return None
+        return self.parse_player(player_id, raw)
 
-        json_obj = response.json()
+    @PARSE_SECONDS.time(parser="player")
+    def parse_player(self, player_id: int, raw: str) -> Player:
+        json_obj = json.loads(raw)
 
         birth_date = datetime.strptime(json_obj["d"]["playernumber"][0:6], "%y%m%d")
         player_name = json_obj["d"]["playername"].strip()
@@ -105,6 +185,15 @@ class Client:
         )
 
     def search_player(self, name: str, club: str | None = None) -> List[Player]:
+        raw = self.fetch_search_player(name)
+        if raw is None:
+            return []
+        return self.parse_search_player(raw, club)
+
+    def fetch_search_player(self, name: str) -> Optional[str]:
+        if self.replay:
+            return self.archive.get(self.SEARCH_PLAYER, name)
+
         json_data = {
             "callbackcontextkey": self._get_context_key(),
             "selectfunction": "SPSel1",
@@ -122,20 +211,32 @@ class Client:
             "Content-Type": "application/json; charset=utf-8",
         }
 
+        url = f"{self.base_url}/SportsResults/Components/WebService1.asmx"
+        r = self._request(
+            self.SEARCH_PLAYER,
+            "POST",
+            url + "/SearchPlayer",
+            headers=headers,
+            json=json_data,
+        )
+        if r.status_code != 200:
+            return None
+
+        return self._archived(self.SEARCH_PLAYER, name, r.text)
+
+    @PARSE_SECONDS.time(parser="search_player")
+    def parse_search_player(self, raw: str, club: str | None = None) -> List[Player]:
+        from bs4 import BeautifulSoup
+
         def extract_value(string, position) -> str | None:
             s = re.findall(r"'(.*?)'", string)
             if len(s) <= position:
                 return None
             return s[position]
 
-        url = f"{self.base_url}/SportsResults/Components/WebService1.asmx"
-        r = requests.post(url + "/SearchPlayer", headers=headers, json=json_data)
-        if r.status_code != 200:
-            return []
-
         players = []
 
-        json_obj = r.json()
+        json_obj = json.loads(raw)
         soup = BeautifulSoup(json_obj["d"]["Html"], features="lxml")
         tbl = soup.find("table")
 
@@ -172,7 +273,9 @@ class Client:
 
         return players
 
-    def __parse_as_df(self, table) -> pd.DataFrame:
+    def __parse_as_df(self, table) -> "pd.DataFrame":
+        import pandas as pd
+
         columns = []
         for th in table.find_all("th"):
             columns.append(th.text)
@@ -196,14 +299,41 @@ class Client:
                     df_row, index=[0]
                 )  # convert the dictionary to a DataFrame with a single row
             else:
-                return pd.read_html(str(table))[0]
+                return pd.read_html(StringIO(str(table)))[0]
 
             df = pd.concat([df, df_row], ignore_index=True)
 
         return df
 
-    @cachetools.func.ttl_cache(ttl=3600)
-    def get_performance_cached_1h(self, player_id: int) -> PlayerPerformance | None:
+    @cachetools.cached(
+        cachetools.TLRUCache(maxsize=PERFORMANCE_CACHE_SIZE, ttu=_performance_expiry),
+        lock=threading.Lock(),
+        info=True,
+    )
+    @single_flight
+    def get_performance_cached(self, player_id: int) -> PlayerPerformance | None:
+        """Cached for as long as freshness.performance_ttl allows for the player."""
+        raw = self.fetch_player_profile(player_id)
+        if raw is None:
+            return None
+        return self.parse_performance_once(raw)
+
+    # keyed by the payload alone, so a profile refetched unchanged after its TTL
+    # is not parsed again
+    @cachetools.cached(
+        cachetools.LRUCache(maxsize=PERFORMANCE_CACHE_SIZE),
+        key=lambda _, raw: fingerprints.payload_digest(raw),
+        lock=threading.Lock(),
+        info=True,
+    )
+    def parse_performance_once(self, raw: str) -> PlayerPerformance:
+        return self.parse_performance(raw)
+
+    def fetch_player_profile(self, player_id: int) -> Optional[str]:
+        """Fetches GetPlayerProfile, which holds both the player and their season."""
+        if self.replay:
+            return self.archive.get(self.PLAYER_PROFILE, player_id)
+
         headers = {
             "authority": "badmintonplayer.dk",
             "accept": "*/*",
@@ -230,7 +360,9 @@ class Client:
             "showheader": False,
         }
 
-        response = requests.post(
+        response = self._request(
+            self.PLAYER_PROFILE,
+            "POST",
             f"{self.base_url}/SportsResults/Components/WebService1.asmx/GetPlayerProfile",
             headers=headers,
             json=json_data,
@@ -241,7 +373,14 @@ class Client:
             )
             return None
 
-        json_data = response.json()
+        return self._archived(self.PLAYER_PROFILE, player_id, response.text)
+
+    @PARSE_SECONDS.time(parser="performance")
+    def parse_performance(self, raw: str) -> PlayerPerformance:
+        import pandas as pd
+        from bs4 import BeautifulSoup
+
+        json_data = json.loads(raw)
         soup = BeautifulSoup(json_data["d"]["Html"], features="lxml")
 
         tables = [
@@ -340,8 +479,8 @@ class Client:
         )
 
     def __identify_tables(
-        self, tables: List[pd.DataFrame]
-    ) -> Dict[TableType, pd.DataFrame]:
+        self, tables: List["pd.DataFrame"]
+    ) -> Dict[TableType, "pd.DataFrame"]:
         result = {}
         for table in tables:
             if table.empty:
@@ -365,12 +504,27 @@ class Client:
 
         return result
 
-    def get_match(self, match_id: int) -> TeamMatch:
+    def get_match(self, match_id: int) -> TeamMatch | None:
+        raw = self.fetch_match(match_id)
+        if raw is None:
+            return None
+        return self.parse_match(raw)
+
+    def fetch_match(self, match_id: int) -> Optional[str]:
+        if self.replay:
+            return self.archive.get(self.MATCH, match_id)
+
         print("Getting match", match_id)
 
-        url = f"http://badmintonplayer.dk/DBF/HoldTurnering/UdskrivHoldkamp/?match={match_id}"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, features="lxml")
+        url = f"{self.base_url}/DBF/HoldTurnering/UdskrivHoldkamp/?match={match_id}"
+        response = self._request(self.MATCH, "GET", url)
+        return self._archived(self.MATCH, match_id, response.text)
+
+    @PARSE_SECONDS.time(parser="match")
+    def parse_match(self, raw: str) -> TeamMatch:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(raw, features="lxml")
         tables = soup.find_all("table")
 
         def get_details(table) -> Dict[str, str]:
@@ -447,10 +601,10 @@ class Client:
                 for cell in cells[3:6]:
                     if cell.text.strip():
                         home_points, away_points = cell.text.split("-")
-                        set_ = Set(
-                            number=len(sets) + 1,
-                            home_points=int(home_points.strip()),
-                            away_points=int(away_points.strip()),
+                        set_ = Set.of(
+                            len(sets) + 1,
+                            int(home_points.strip()),
+                            int(away_points.strip()),
                         )
                         sets.append(set_)
 
@@ -479,3 +633,7 @@ class Client:
             away_team=overall_result.find_all("td")[4].text.strip(),
             games=games,
         )
+
+
+metrics.watch_cache("performance", Client.get_performance_cached.cache_info)
+metrics.watch_cache("parsed_performance", Client.parse_performance_once.cache_info)
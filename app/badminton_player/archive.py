@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+from threading import Lock, get_ident
+from typing import Iterator, Optional, Tuple
+
+from app.utils.fingerprints import payload_digest
+
+
+class Archive:
+    """Content-addressed archive of raw upstream payloads.
+
+    Payloads are stored once per distinct content under objects/, compressed
+    and named by their hash, so refetching an unchanged page only adds a row to
+    the index. The index records every fetch by (endpoint, key, fetched_at).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+
+        self._lock = Lock()
+        self._db = sqlite3.connect(
+            os.path.join(root, "index.db"), check_same_thread=False
+        )
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fetches (
+                endpoint TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                digest TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS fetches_lookup
+                ON fetches (endpoint, key, fetched_at);
+            """
+        )
+
+    def put(self, endpoint: str, key, payload: str) -> str:
+        """Archives a payload fetched now and returns its digest."""
+        data = payload.encode("utf-8")
+        digest = payload_digest(payload)
+
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written under a temporary name so readers never see partial objects
+            tmp = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp, path)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO fetches (endpoint, key, fetched_at, digest) "
+                "VALUES (?, ?, ?, ?)",
+                (endpoint, str(key), datetime.now().isoformat(), digest),
+            )
+        return digest
+
+    def get(self, endpoint: str, key, at: Optional[datetime] = None) -> Optional[str]:
+        """Returns the latest payload fetched for the key, or the latest before `at`."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM fetches WHERE endpoint = ? AND key = ? "
+                "AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1",
+                (endpoint, str(key), (at or datetime.max).isoformat()),
+            ).fetchone()
+        if not row:
+            return None
+        return self.read(row[0])
+
+    def read(self, digest: str) -> str:
+        with open(self._object_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def iter_index(
+        self, endpoint: Optional[str] = None
+    ) -> Iterator[Tuple[str, str, str, str]]:
+        """Yields (endpoint, key, fetched_at, digest) for every archived fetch."""
+        query = "SELECT endpoint, key, fetched_at, digest FROM fetches"
+        parameters = ()
+        if endpoint:
+            query += " WHERE endpoint = ?"
+            parameters = (endpoint,)
+        with self._lock:
+            rows = self._db.execute(
+                query + " ORDER BY fetched_at", parameters
+            ).fetchall()
+        yield from rows
+
+    def size(self) -> int:
+        """Returns the number of bytes taken by the compressed objects."""
+        total = 0
+        for directory, _, files in os.walk(os.path.join(self.root, "objects")):
+            total += sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+        return total
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
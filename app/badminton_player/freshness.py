@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.badminton_player.models import PlayerPerformance
+
+ACTIVE = "active"
+NEAR = "near"
+IDLE = "idle"
+
+# a player is active from the day before a match or tournament until results and
+# standings have settled, and near when one is within a week either way
+ACTIVE_BEFORE = timedelta(days=1)
+ACTIVE_AFTER = timedelta(days=2)
+NEAR_WITHIN = timedelta(days=7)
+
+# seconds a fetched performance is cached for
+PERFORMANCE_TTL = {ACTIVE: 15 * 60, NEAR: 60 * 60, IDLE: 24 * 60 * 60}
+# players without a profile may just not have been created upstream yet
+MISSING_TTL = 15 * 60
+
+# how old stored standings may be before they are rewritten from the performance
+STANDINGS_WINDOW = {
+    ACTIVE: timedelta(minutes=15),
+    NEAR: timedelta(days=1),
+    IDLE: timedelta(days=7),
+}
+
+
+def event_dates(performance: PlayerPerformance) -> List[datetime]:
+    """Dates of the player's team matches and tournaments this season."""
+    # a pandas Series when the profile lists matches, which has no truth value
+    metas = performance.match_metadata if performance.match_metadata is not None else []
+    dates = [meta.date for meta in metas if meta and meta.date]
+    dates.extend(t.date for t in performance.tournaments if t.date)
+    return [d.replace(tzinfo=None) for d in dates]
+
+
+def activity(performance: PlayerPerformance, now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    level = IDLE
+    for date in event_dates(performance):
+        if date - ACTIVE_BEFORE <= now <= date + ACTIVE_AFTER:
+            return ACTIVE
+        if abs(date - now) <= NEAR_WITHIN:
+            level = NEAR
+    return level
+
+
+def performance_ttl(
+    performance: Optional[PlayerPerformance], now: Optional[datetime] = None
+) -> float:
+    """Seconds to cache the performance for, given what the player has coming up.
+
+    The TTL never runs past the start of the next active period, so a player
+    idle for weeks is refreshed in time for their next match.
+    """
+    if performance is None:
+        return MISSING_TTL
+
+    now = now or datetime.now()
+    ttl = PERFORMANCE_TTL[activity(performance, now)]
+    upcoming = [d - ACTIVE_BEFORE for d in event_dates(performance)]
+    until_active = [(d - now).total_seconds() for d in upcoming if d > now]
+    if until_active:
+        ttl = min(ttl, max(min(until_active), PERFORMANCE_TTL[ACTIVE]))
+    return ttl
+
+
+def standings_window(
+    performance: Optional[PlayerPerformance], now: Optional[datetime] = None
+) -> timedelta:
+    if performance is None:
+        return STANDINGS_WINDOW[NEAR]
+    return STANDINGS_WINDOW[activity(performance, now)]
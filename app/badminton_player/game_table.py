@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.badminton_player.models import Game
+
+# normalized categories, e.g. "1. HS" and "HS" both become HS
+CATEGORIES = ("HS", "DS", "S", "HD", "DD", "D", "MD")
+DISCIPLINES = ("singles", "doubles", "mixed")
+
+_CATEGORY_CODES = {c: i for i, c in enumerate(CATEGORIES)}
+_DISCIPLINE_OF_CATEGORY = np.array([0, 0, 0, 1, 1, 1, 2], dtype=np.int8)
+
+MAX_SETS = 3
+NO_PLAYER = -1
+
+
+@dataclass(slots=True)
+class CategoryStats:
+    played: int
+    won: int
+    three_sets: int
+    points_for: int
+    points_against: int
+
+    @property
+    def win_rate(self) -> float:
+        return self.won / self.played if self.played else 0.0
+
+
+class GameTable:
+    """Columnar representation of a list of games for vectorized statistics.
+
+    Players are dictionary encoded: `players` holds indices into `names` in the
+    order home1, home2, away1, away2, with NO_PLAYER for empty slots. Games of
+    unknown categories belong to no discipline, so they are left out.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        categories: np.ndarray,
+        dates: np.ndarray,
+        scores: np.ndarray,
+        players: np.ndarray,
+    ):
+        self.names = names
+        self.categories = categories
+        self.disciplines = _DISCIPLINE_OF_CATEGORY[categories]
+        self.dates = dates
+        self.scores = scores
+        self.players = players
+        self.num_sets = (scores.sum(axis=2) > 0).sum(axis=1)
+        self.home_won = self._compute_home_won()
+        self._ids = {name: i for i, name in enumerate(names)}
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    @staticmethod
+    def from_games(games: List[Game]) -> "GameTable":
+        names, ids = [], {}
+        categories, dates, scores, players = [], [], [], []
+
+        def player_id(name: Optional[str]) -> int:
+            if not name:
+                return NO_PLAYER
+            if name not in ids:
+                ids[name] = len(names)
+                names.append(name)
+            return ids[name]
+
+        for game in games:
+            category = _CATEGORY_CODES.get(_normalize_category(game.category or ""))
+            if category is None:
+                continue
+
+            categories.append(category)
+            dates.append(game.date.replace(tzinfo=None) if game.date else None)
+
+            game_scores = [0] * (MAX_SETS * 2)
+            for j, s in enumerate(game.sets[:MAX_SETS]):
+                game_scores[2 * j] = s.home_points
+                game_scores[2 * j + 1] = s.away_points
+            scores.append(game_scores)
+
+            players.append(
+                (
+                    player_id(game.home_player1),
+                    player_id(game.home_player2),
+                    player_id(game.away_player1),
+                    player_id(game.away_player2),
+                )
+            )
+
+        n = len(categories)
+        return GameTable(
+            names,
+            np.array(categories, dtype=np.int8),
+            np.array(dates, dtype="datetime64[s]"),
+            np.array(scores, dtype=np.int16).reshape(n, MAX_SETS, 2),
+            np.array(players, dtype=np.int32).reshape(n, 4),
+        )
+
+    def player_sides(self, player_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns masks of the games the player played on the home and away side."""
+        player_id = self._ids.get(player_name, NO_PLAYER - 1)
+        home = (self.players[:, 0] == player_id) | (self.players[:, 1] == player_id)
+        away = (self.players[:, 2] == player_id) | (self.players[:, 3] == player_id)
+        return home, away
+
+    def won_by(self, player_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns masks of the games the player played in and won."""
+        home, away = self.player_sides(player_name)
+        played = home | away
+        won = (home & self.home_won) | (away & ~self.home_won)
+        return played, won
+
+    def category_stats(self, player_name: str) -> Dict[str, CategoryStats]:
+        home, away = self.player_sides(player_name)
+        played, won = home | away, (home & self.home_won) | (away & ~self.home_won)
+
+        set_points = self.scores.sum(axis=1)
+        points_for = np.where(home, set_points[:, 0], set_points[:, 1])
+        points_against = np.where(home, set_points[:, 1], set_points[:, 0])
+        three_sets = self.num_sets == 3
+
+        num_categories = len(CATEGORIES)
+        codes = self.categories[played]
+        counts = [
+            np.bincount(codes, minlength=num_categories),
+            np.bincount(codes, weights=won[played], minlength=num_categories),
+            np.bincount(codes, weights=three_sets[played], minlength=num_categories),
+            np.bincount(codes, weights=points_for[played], minlength=num_categories),
+            np.bincount(
+                codes, weights=points_against[played], minlength=num_categories
+            ),
+        ]
+
+        return {
+            category: CategoryStats(*(int(c[i]) for c in counts))
+            for i, category in enumerate(CATEGORIES)
+            if counts[0][i]
+        }
+
+    def discipline_stats(self, player_name: str) -> Dict[str, CategoryStats]:
+        stats = {}
+        for category, s in self.category_stats(player_name).items():
+            discipline = DISCIPLINES[_DISCIPLINE_OF_CATEGORY[_CATEGORY_CODES[category]]]
+            total = stats.setdefault(discipline, CategoryStats(0, 0, 0, 0, 0))
+            total.played += s.played
+            total.won += s.won
+            total.three_sets += s.three_sets
+            total.points_for += s.points_for
+            total.points_against += s.points_against
+        return stats
+
+    def three_set_frequency(self, player_name: Optional[str] = None) -> float:
+        mask = np.ones(len(self), dtype=bool)
+        if player_name is not None:
+            mask, _ = self.won_by(player_name)
+        if not mask.any():
+            return 0.0
+        return float((self.num_sets[mask] == 3).mean())
+
+    def rolling_form(self, player_name: str, window: int = 5) -> np.ndarray:
+        """Rolling win rate over the player's games in chronological order."""
+        played, won = self.won_by(player_name)
+        order = np.argsort(self.dates[played], kind="stable")
+        results = won[played][order].astype(np.float64)
+        if len(results) < window:
+            return np.empty(0)
+
+        cumulative = np.concatenate(([0.0], np.cumsum(results)))
+        return (cumulative[window:] - cumulative[:-window]) / window
+
+    def player_records(self) -> Dict[str, Tuple[int, int]]:
+        """Returns (won, played) for every player in the table."""
+        num_names = len(self.names)
+        played = np.zeros(num_names, dtype=np.int64)
+        won = np.zeros(num_names, dtype=np.int64)
+        for column in range(4):
+            ids = self.players[:, column]
+            present = ids != NO_PLAYER
+            won_column = self.home_won if column < 2 else ~self.home_won
+            played += np.bincount(ids[present], minlength=num_names)
+            won += np.bincount(
+                ids[present], weights=won_column[present], minlength=num_names
+            ).astype(np.int64)
+
+        return {
+            name: (int(won[i]), int(played[i])) for i, name in enumerate(self.names)
+        }
+
+    def _compute_home_won(self) -> np.ndarray:
+        # mirrors Game.get_winner, where no-shows count as missing players
+        no_show = np.array(["Ikke fremmødt" in name for name in self.names] + [True])
+        present = ~no_show[self.players]  # NO_PLAYER indexes the trailing True
+        home1, home2, away1, away2 = present.T
+
+        home_sets = (self.scores[:, :, 0] > self.scores[:, :, 1]).sum(axis=1)
+        away_sets = (self.scores[:, :, 0] < self.scores[:, :, 1]).sum(axis=1)
+
+        return np.select(
+            [
+                ~home1 & ~home2,
+                ~away1 & ~away2,
+                home1 & home2 & (away1 ^ away2),
+                away1 & away2 & (home1 ^ home2),
+            ],
+            [False, True, True, False],
+            default=home_sets > away_sets,
+        )
+
+
+def _normalize_category(category: str) -> str:
+    category = category.strip()
+    if category[:1].isdigit():
+        category = category.split(".", 1)[-1].strip()
+    return category
@@ -1,11 +1,20 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional
 
 from markupsafe import Markup
 
+from app.utils import supabase_utils
 
-@dataclass
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # player names, categories and clubs repeat across thousands of cached games
+    return sys.intern(value) if value else value
+
+
+@dataclass(slots=True, frozen=True)
 class Standing:
     # e.g. Rangliste, Rangliste Single
     category: str
@@ -15,6 +24,10 @@ class Standing:
     num_matches: int
     ranking: int
 
+    def __post_init__(self):
+        object.__setattr__(self, "category", _intern(self.category))
+        object.__setattr__(self, "tier", _intern(self.tier))
+
     def to_dict(self, player_id: int) -> dict:
         return {
             "category": self.category,
@@ -27,21 +40,21 @@ class Standing:
 
     @staticmethod
     def from_json(d: dict) -> "Standing":
-        return Standing(
-            category=d["category"],
-            tier=d["tier"],
-            num_points=d["num_points"],
-            num_matches=d["num_matches"],
-            ranking=d["ranking"],
-        )
+        return supabase_utils.decoder_for(Standing)(d)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Set:
     number: int
     home_points: int
     away_points: int
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def of(number: int, home_points: int, away_points: int) -> "Set":
+        """Returns a shared instance, as only a few thousand distinct sets exist."""
+        return Set(number=number, home_points=home_points, away_points=away_points)
+
     def to_dict(self) -> dict:
         return {
             "number": self.number,
@@ -56,17 +69,39 @@ class Set:
             html = f"{self.home_points} - <b>{self.away_points}</b>"
         return Markup(html)
 
+    def is_won_by_home(self) -> bool:
+        return _set_won(self.home_points, self.away_points)
 
-@dataclass
+    def is_won_by_away(self) -> bool:
+        return _set_won(self.away_points, self.home_points)
+
+
+def _set_won(points: int, other_points: int) -> bool:
+    # sets go to 21 by two clear points, capped at 30
+    return points == 30 or (points >= 21 and points - other_points >= 2)
+
+
+def _decode_sets(sets: List[dict]) -> List[Set]:
+    return [Set.of(s["number"], s["home_points"], s["away_points"]) for s in sets]
+
+
+@dataclass(slots=True)
 class Game:
     date: datetime
     category: str
-    sets: List[Set]
+    sets: List[Set] = field(metadata={"decode": _decode_sets})
     home_player1: Optional[str]
     home_player2: Optional[str]
     away_player1: Optional[str]
     away_player2: Optional[str]
 
+    def __post_init__(self):
+        self.category = _intern(self.category)
+        self.home_player1 = _intern(self.home_player1)
+        self.home_player2 = _intern(self.home_player2)
+        self.away_player1 = _intern(self.away_player1)
+        self.away_player2 = _intern(self.away_player2)
+
     def contains(self, player_name: str) -> bool:
         return player_name in self.players()
 
@@ -109,6 +144,14 @@ class Game:
         away = sum([1 for s in self.sets if s.home_points < s.away_points])
         return "home" if home > away else "away"
 
+    def is_complete(self) -> bool:
+        """Whether the result is final, as a side won two sets or did not show up."""
+        if any(p and "Ikke fremmødt" in p for p in self.players()):
+            return True
+        home = sum(1 for s in self.sets if s.is_won_by_home())
+        away = sum(1 for s in self.sets if s.is_won_by_away())
+        return max(home, away) >= 2
+
     def won_by(self, player_name: str) -> bool:
         if self.get_winner() == "home":
             return player_name in [self.home_player1, self.home_player2]
@@ -128,28 +171,10 @@ class Game:
 
     @staticmethod
     def from_json(d: dict) -> "Game":
-        sets = []
-        for s in d["sets"]:
-            sets.append(
-                Set(
-                    number=s["number"],
-                    home_points=s["home_points"],
-                    away_points=s["away_points"],
-                )
-            )
-
-        return Game(
-            category=d["category"],
-            date=datetime.strptime(d["date"], "%Y-%m-%dT%H:%M:%S%z"),
-            sets=sets,
-            home_player1=d["home_player1"] if "home_player1" in d else None,
-            home_player2=d["home_player2"] if "home_player2" in d else None,
-            away_player1=d["away_player1"] if "away_player1" in d else None,
-            away_player2=d["away_player2"] if "away_player2" in d else None,
-        )
+        return supabase_utils.decoder_for(Game)(d)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MatchMeta:
     id: int
     sort: int
@@ -158,6 +183,11 @@ class MatchMeta:
     team1: Optional[str]
     team2: Optional[str]
 
+    def __post_init__(self):
+        object.__setattr__(self, "division", _intern(self.division))
+        object.__setattr__(self, "team1", _intern(self.team1))
+        object.__setattr__(self, "team2", _intern(self.team2))
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -168,7 +198,7 @@ class MatchMeta:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class TeamMatch:
     id: int
     date: datetime
@@ -179,6 +209,13 @@ class TeamMatch:
     home_club: Optional[str] = None
     away_club: Optional[str] = None
 
+    def __post_init__(self):
+        self.division = _intern(self.division)
+        self.home_team = _intern(self.home_team)
+        self.away_team = _intern(self.away_team)
+        self.home_club = _intern(self.home_club)
+        self.away_club = _intern(self.away_club)
+
     @property
     def home_points(self) -> int:
         return sum([1 for g in self.games if g.get_winner() == "home"])
@@ -223,13 +260,31 @@ class TeamMatch:
         return "W" if won else "L"
 
 
-@dataclass
-class Player:
-    id: int
+@dataclass(slots=True)
+class Club:
+    id: int = field(metadata={"column": "bp_id"})
     name: str
-    club_name: str
-    club_id: int
-    birth_date: datetime
+
+    def __post_init__(self):
+        self.name = _intern(self.name)
+
+    @staticmethod
+    def from_json(d: dict) -> "Club":
+        return supabase_utils.decoder_for(Club)(d)
+
+
+@dataclass(slots=True)
+class Player:
+    id: int = field(metadata={"column": "bp_id"})
+    name: str = field(metadata={"column": "bp_name"})
+    # only present when the query embeds the club, as in `*, clubs (name)`
+    club_name: str = field(metadata={"column": "clubs.name", "default": ""})
+    club_id: int = field(metadata={"column": "bp_club_id"})
+    birth_date: datetime = field(metadata={"column": "birthdate"})
+
+    def __post_init__(self):
+        self.name = _intern(self.name)
+        self.club_name = _intern(self.club_name)
 
     def get_age(self) -> int:
         today = datetime.today()
@@ -253,16 +308,10 @@ class Player:
 
     @staticmethod
     def from_json(d: dict) -> "Player":
-        return Player(
-            id=d["bp_id"],
-            name=d["bp_name"],
-            club_name=d["clubs"]["name"] if "clubs" in d else "",
-            club_id=d["bp_club_id"],
-            birth_date=datetime.strptime(d["birthdate"], "%Y-%m-%dT%H:%M:%S%z"),
-        )
+        return supabase_utils.decoder_for(Player)(d)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Tournament:
     bp_id: int
     date: datetime
@@ -278,7 +327,7 @@ class Tournament:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerPerformance:
     season_start_points: int
     standings: List[Standing]
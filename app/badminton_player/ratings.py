@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.badminton_player.game_table import DISCIPLINES, NO_PLAYER, GameTable
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+
+@dataclass(slots=True)
+class Rating:
+    rating: float = INITIAL_RATING
+    num_games: int = 0
+
+
+# keyed by (player name, discipline)
+Ratings = Dict[Tuple[str, str], Rating]
+
+
+def rate(table: GameTable, ratings: Ratings) -> Ratings:
+    """Applies the games in `table` on top of `ratings` and returns changed ratings.
+
+    Games are processed in rating periods of one day (as in Glicko): every game
+    played on the same day is scored against the ratings from before that day,
+    which lets each day be applied as a single vectorized update. Singles,
+    doubles and mixed are rated separately, and doubles sides are rated by the
+    mean of both partners. Walkovers and incomplete games are ignored.
+    """
+    num_names = len(table.names)
+    if not len(table) or not num_names:
+        return {}
+
+    values = np.full((len(DISCIPLINES), num_names), INITIAL_RATING)
+    counts = np.zeros((len(DISCIPLINES), num_names), dtype=np.int64)
+    for d, discipline in enumerate(DISCIPLINES):
+        for i, name in enumerate(table.names):
+            existing = ratings.get((name, discipline))
+            if existing:
+                values[d, i] = existing.rating
+                counts[d, i] = existing.num_games
+
+    rated = _rated_games(table)
+    order = np.argsort(table.dates[rated], kind="stable")
+    games = np.flatnonzero(rated)[order]
+    days = table.dates[games].astype("datetime64[D]")
+    boundaries = np.flatnonzero(np.diff(days.astype(np.int64))) + 1
+
+    touched = np.zeros((len(DISCIPLINES), num_names), dtype=bool)
+    for day in np.split(games, boundaries):
+        _apply_period(table, day, values, counts, touched)
+
+    return {
+        (table.names[i], DISCIPLINES[d]): Rating(float(values[d, i]), int(counts[d, i]))
+        for d, i in zip(*np.nonzero(touched))
+    }
+
+
+def _rated_games(table: GameTable) -> np.ndarray:
+    players = table.players
+    doubles = table.disciplines != 0
+    home_full = (players[:, 0] != NO_PLAYER) & (~doubles | (players[:, 1] != NO_PLAYER))
+    away_full = (players[:, 2] != NO_PLAYER) & (~doubles | (players[:, 3] != NO_PLAYER))
+    no_show = np.array(["Ikke fremmødt" in name for name in table.names] + [False])
+    any_no_show = no_show[players].any(axis=1)
+    return home_full & away_full & ~any_no_show & (table.num_sets > 0)
+
+
+def _apply_period(
+    table: GameTable,
+    games: np.ndarray,
+    values: np.ndarray,
+    counts: np.ndarray,
+    touched: np.ndarray,
+) -> None:
+    disciplines = table.disciplines[games].astype(np.int64)
+    players = table.players[games]
+    present = players != NO_PLAYER
+    # empty slots borrow their partner so a singles side is rated by one player
+    players = np.where(present, players, players[:, [0, 0, 2, 2]])
+
+    player_ratings = values[disciplines[:, None], players]
+    home = player_ratings[:, :2].mean(axis=1)
+    away = player_ratings[:, 2:].mean(axis=1)
+
+    expected = 1.0 / (1.0 + 10.0 ** ((away - home) / 400.0))
+    delta = K_FACTOR * (table.home_won[games] - expected)
+
+    side_delta = np.column_stack([delta, delta, -delta, -delta])
+    rows = np.broadcast_to(disciplines[:, None], players.shape)
+    rows, players, side_delta = rows[present], players[present], side_delta[present]
+
+    np.add.at(values, (rows, players), side_delta)
+    np.add.at(counts, (rows, players), 1)
+    touched[rows, players] = True
@@ -0,0 +1,53 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.badminton_player.api import Client
+from app.badminton_player.archive import Archive
+from app.badminton_player.models import Game, Standing, Tournament
+
+# set up once per worker process by init_worker
+_archive: Optional[Archive] = None
+_client: Optional[Client] = None
+
+
+@dataclass(slots=True)
+class ParsedBatch:
+    parsed: int = 0
+    games: List[Tuple[int, Game]] = field(default_factory=list)
+    standings: Dict[int, List[Standing]] = field(default_factory=dict)
+    tournaments: Dict[int, List[Tournament]] = field(default_factory=dict)
+    # (endpoint, key, error)
+    failures: List[Tuple[str, str, str]] = field(default_factory=list)
+
+
+def init_worker(archive_root: str) -> None:
+    global _archive, _client
+    _archive = Archive(archive_root)
+    _client = Client()
+
+
+def parse_batch(endpoint: str, items: List[Tuple[str, str]]) -> ParsedBatch:
+    """Parses archived payloads, given as (key, digest), into rows to write.
+
+    Runs in a worker process, so only plain models are returned and a payload
+    that fails to parse is reported instead of failing the batch.
+    """
+    batch = ParsedBatch()
+    for key, digest in items:
+        try:
+            raw = _archive.read(digest)
+            if endpoint == Client.MATCH:
+                match = _client.parse_match(raw)
+                batch.games.extend((match.id, g) for g in match.games if g.category)
+            elif endpoint == Client.PLAYER_PROFILE:
+                performance = _client.parse_performance(raw)
+                batch.standings[int(key)] = list(performance.standings)
+                batch.tournaments[int(key)] = performance.tournaments
+            else:
+                raise ValueError(f"Unsupported endpoint {endpoint}")
+        except Exception as e:
+            batch.failures.append((endpoint, key, f"{type(e).__name__}: {e}"))
+            continue
+
+        batch.parsed += 1
+    return batch
@@ -0,0 +1,99 @@
+import time
+from collections import Counter, defaultdict
+
+import click
+from flask.cli import AppGroup
+
+ratings = AppGroup("ratings", help="Maintain player ratings.")
+head_to_head = AppGroup("head-to-head", help="Maintain the head-to-head index.")
+archive = AppGroup("archive", help="Inspect and reparse the upstream payload archive.")
+
+
+@ratings.command("update")
+def update_ratings():
+    """Rate games inserted since the last update."""
+    from app.services import rating_service
+
+    start = time.perf_counter()
+    processed = rating_service.update_ratings()
+    click.echo(f"Rated {processed} new games in {time.perf_counter() - start:.1f}s")
+
+
+@ratings.command("recompute")
+def recompute_ratings():
+    """Recompute every rating from scratch."""
+    from app.services import rating_service
+
+    start = time.perf_counter()
+    processed = rating_service.recompute_ratings()
+    click.echo(f"Rated {processed} games in {time.perf_counter() - start:.1f}s")
+
+
+@head_to_head.command("rebuild")
+def rebuild_head_to_head():
+    """Index every stored game by player pair."""
+    from app.services import head_to_head_service
+
+    start = time.perf_counter()
+    processed = head_to_head_service.rebuild_index()
+    click.echo(f"Indexed {processed} games in {time.perf_counter() - start:.1f}s")
+
+
+@archive.command("stats")
+def archive_stats():
+    """Show how many payloads are archived and the space they take."""
+    from app.services import badminton_player_client
+
+    if not badminton_player_client.archive:
+        raise click.ClickException("UPSTREAM_ARCHIVE_PATH is not set")
+
+    fetches, digests = Counter(), defaultdict(set)
+    for endpoint, _, _, digest in badminton_player_client.archive.iter_index():
+        fetches[endpoint] += 1
+        digests[endpoint].add(digest)
+
+    size = badminton_player_client.archive.size()
+    for endpoint, count in sorted(fetches.items()):
+        click.echo(f"{endpoint}: {count} fetches, {len(digests[endpoint])} distinct")
+    click.echo(f"{size / 1024 / 1024:.1f} MiB of compressed objects")
+
+
+@archive.command("backfill")
+@click.option(
+    "--endpoint",
+    "endpoints",
+    multiple=True,
+    type=click.Choice(["match", "player_profile"]),
+    help="Endpoints to reparse. Defaults to all.",
+)
+@click.option("--workers", type=int, default=None, help="Parser processes.")
+@click.option("--batch-size", type=int, default=200, help="Payloads per task.")
+def archive_backfill(endpoints, workers, batch_size):
+    """Reparse the latest archived payloads and store the results."""
+    from app.services import backfill_service, badminton_player_client
+
+    if not badminton_player_client.archive:
+        raise click.ClickException("UPSTREAM_ARCHIVE_PATH is not set")
+
+    report = backfill_service.backfill(
+        badminton_player_client.archive,
+        endpoints=endpoints or backfill_service.ENDPOINTS,
+        workers=workers,
+        batch_size=batch_size,
+    )
+
+    click.echo(
+        f"Parsed {report.parsed} payloads in {report.elapsed:.1f}s "
+        f"({report.payloads_per_second:.0f}/s)"
+    )
+    click.echo(
+        f"Wrote {report.games} games, {report.standings} standings and "
+        f"{report.tournaments} tournaments, skipping {report.unchanged} "
+        f"unchanged players and matches"
+    )
+    for endpoint, key, error in report.failures:
+        click.echo(f"Could not parse {endpoint} {key}: {error}", err=True)
+    if report.failures:
+        click.echo(f"{len(report.failures)} payloads failed to parse", err=True)
+    if report.games:
+        click.echo("Run `flask head-to-head rebuild` and `flask ratings update` next")
@@ -1,7 +1,9 @@
+import orjson
+from flask import Response
 from flask import current_app as app
 from flask import jsonify, request
 
-from app.services import player_service
+from app.services import head_to_head_service, player_service
 
 
 @app.route("/api/player/discover", methods=["GET"])
@@ -19,3 +21,76 @@ def discover_player():
         return jsonify({"error": "player not found"}), 404
 
     return jsonify({"id": id})
+
+
+@app.route("/api/player/<int:player_id>", methods=["GET"])
+def player_profile(player_id: int):
+    fields = request.args.get("fields")
+    if fields:
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+    else:
+        fields = list(player_service.PROFILE_FIELDS)
+
+    unknown = [f for f in fields if f not in player_service.PROFILE_FIELDS]
+    if unknown:
+        return jsonify({"error": f"unknown fields: {', '.join(unknown)}"}), 400
+
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit < 0:
+        return jsonify({"error": "limit must be non-negative"}), 400
+
+    profile = player_service.build_player_profile(player_id, fields)
+    if not profile:
+        return jsonify({"error": "player not found"}), 404
+
+    body = {
+        "player": {
+            "id": profile.player.id,
+            "name": profile.player.name,
+            "club_id": profile.player.club_id,
+            "club_name": profile.player.club_name,
+            "birth_date": profile.player.birth_date,
+        },
+        "season_start_points": profile.metadata.season_start_points,
+    }
+    for field in fields:
+        value = getattr(profile, field) or []
+        # games and matches are ordered newest first, so slicing keeps the last N
+        if limit is not None and field in ("games", "matches"):
+            value = value[:limit]
+        body[field] = value
+
+    return Response(orjson.dumps(body), mimetype="application/json")
+
+
+@app.route("/api/head-to-head", methods=["GET"])
+def head_to_head():
+    a, b = request.args.get("a", type=int), request.args.get("b", type=int)
+    if not a or not b:
+        return jsonify({"error": "a and b are required"}), 400
+
+    player, other = player_service.get_player(a), player_service.get_player(b)
+    if not player or not other:
+        return jsonify({"error": "player not found"}), 404
+
+    result = head_to_head_service.get_head_to_head(player.name, other.name)
+    body = {
+        "players": [
+            {"id": player.id, "name": player.name},
+            {"id": other.id, "name": other.name},
+        ],
+        "against": {
+            "played": len(result.against),
+            "won": result.won_against,
+            "lost": len(result.against) - result.won_against,
+            "games": result.against,
+        },
+        "partnered": {
+            "played": len(result.partnered),
+            "won": result.won_partnered,
+            "lost": len(result.partnered) - result.won_partnered,
+            "games": result.partnered,
+        },
+    }
+
+    return Response(orjson.dumps(body), mimetype="application/json")
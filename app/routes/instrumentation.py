@@ -0,0 +1,69 @@
+import time
+
+from flask import Response
+from flask import current_app as app
+from flask import g, request
+
+from app.utils import metrics, profiler
+
+REQUEST_SECONDS = metrics.Histogram(
+    "http_request_seconds",
+    "Requests by route and status, including streamed bodies.",
+    ["route", "status"],
+)
+REQUESTS_IN_FLIGHT = metrics.Gauge(
+    "http_requests_in_flight", "Requests being served, including streamed bodies."
+)
+# for the player routes this is the number of upstream calls per profile
+REQUEST_UPSTREAM_CALLS = metrics.Histogram(
+    "http_request_upstream_calls",
+    "Requests to badmintonplayer.dk made while serving a request, by route.",
+    ["route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.before_request
+def start_timings():
+    g.timings = metrics.Timings()
+    metrics.set_timings(g.timings)
+    REQUESTS_IN_FLIGHT.inc()
+
+    if profiler.should_profile():
+        g.profiler = profiler.RequestProfiler()
+        g.profiler.start()
+
+
+@app.after_request
+def add_server_timing(response: Response) -> Response:
+    # streamed pages send their headers before the body is rendered, so their
+    # timings only cover the work done up to the first byte
+    g.status = response.status_code
+    response.headers["Server-Timing"] = g.timings.header()
+    return response
+
+
+@app.teardown_request
+def finish_timings(_):
+    timings = g.pop("timings", None)
+    if timings is None:
+        return
+
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    status = g.get("status", 500)
+    elapsed = time.perf_counter() - timings.start
+    REQUEST_SECONDS.observe(elapsed, route=route, status=status)
+    REQUEST_UPSTREAM_CALLS.observe(timings.counts["upstream"], route=route)
+    REQUESTS_IN_FLIGHT.dec()
+    metrics.set_timings(None)
+
+    request_profiler = g.pop("profiler", None)
+    if request_profiler:
+        request_profiler.stop()
+        prefix = request_profiler.save(route, status, timings)
+        print(f"Saved profile of {request.full_path} to {prefix}")
@@ -1,8 +1,11 @@
+from datetime import datetime
+
 from flask import abort
 from flask import current_app as app
 from flask import render_template, request
 
-from app.services import club_service, player_service
+from app.services import club_service, head_to_head_service, player_service, view_models
+from app.utils import render_cache
 
 
 @app.route("/", methods=["GET"])
@@ -12,35 +15,117 @@ def index():
 
 @app.route("/player/<player_id>", methods=["GET"])
 def player(player_id: int):
-    profile = player_service.build_player_profile(player_id)
-    if not profile:
+    profile = player_service.PlayerProfileStream(player_id)
+    if not profile.player:
         return abort(404)
 
-    grouped_streak = player_service.group_games_by_category(profile.games)
+    # the matches are listed in the performance, so a page is only served from
+    # the cache while the profile it was rendered from is unchanged
+    stamp = render_cache.content_version(
+        [profile.player, profile.metadata, profile.standings]
+    )
+    cached = render_cache.get_cached_page(stamp)
+    if cached:
+        return cached
+
+    name = profile.player.name
+    streak_limit = view_models.MOBILE_STREAK_LIMIT if render_cache.is_mobile() else None
+    context = dict(
+        player=view_models.build_profile_view(
+            profile.player, profile.metadata, profile.standings
+        ),
+        standings=view_models.build_standing_views(profile.standings),
+        # resolved lazily, these are only complete once every match has been rendered
+        matches=view_models.iter_match_views(profile.iter_matches(), name),
+        streaks=lambda: view_models.build_streaks(
+            profile.standings, profile.games, name, streak_limit
+        ),
+        stats=lambda: view_models.build_stats_views(profile.games, name),
+        opponents=lambda: view_models.build_opponent_views(
+            head_to_head_service.get_opponents(name)
+        ),
+        tournaments=lambda: view_models.build_tournament_views(profile.tournaments),
+    )
+
+    def version() -> str:
+        return render_cache.content_version(
+            [
+                profile.player,
+                profile.metadata.season_start_points,
+                profile.standings,
+                profile.matches,
+                profile.games,
+                profile.tournaments,
+            ]
+        )
+
+    # conditional requests are answered from the fully resolved profile, since
+    # the ETag is only known once every match has been fetched
+    if request.if_none_match:
+        profile.resolve()
+        return render_cache.render_cached_page(
+            "player.html", version(), stamp=stamp, **context
+        )
+
+    return render_cache.stream_cached_page("player.html", stamp, version, **context)
+
+
+@app.route("/match/<int:match_id>/fragment", methods=["GET"])
+def match_fragment(match_id: int):
+    player_id = request.args.get("player", type=int)
+    if not player_id:
+        return abort(404)
 
-    grouped_matches = player_service.group_matches_by_division(profile.matches)
+    match = player_service.get_team_match(match_id, player_id)
+    if not match:
+        return abort(404)
 
-    return render_template(
-        "player.html",
-        profile=profile.metadata,
-        games=profile.games,
-        streak=grouped_streak,
-        player=profile.player,
-        matches=grouped_matches,
-        standings=profile.standings,
-        tournaments=profile.tournaments,
+    player = player_service.get_player(player_id)
+    if not player:
+        return abort(404)
+
+    # a played match never changes, so its fragment can be cached for good, but
+    # a match in progress lists its games before their sets are recorded
+    max_age = render_cache.BROWSER_MAX_AGE
+    if (
+        match.games
+        and all(g.is_complete() for g in match.games)
+        and match.date
+        and match.date < datetime.now()
+    ):
+        max_age = render_cache.IMMUTABLE_MAX_AGE
+
+    return render_cache.render_cached_page(
+        "match_fragment.html",
+        render_cache.content_version(match),
+        max_age=max_age,
+        page_args=(player_id,),
+        match=view_models.build_match_view(match, player.name),
+        games=view_models.build_game_views(match, player.name),
     )
 
 
-@app.route("/club/<club_id>", methods=["GET"])
+@app.route("/club/<int:club_id>", methods=["GET"])
 def club(club_id: int):
-    club = club_service.get_club(club_id)
-    if not club:
+    # served from memory while built in the background, so never waits upstream
+    dashboard = club_service.get_club_dashboard(club_id)
+    if not dashboard:
         return abort(404)
 
-    players = player_service.get_players_for_club(club_id)
-
-    return render_template("club.html", club=club, players=players)
+    version = render_cache.content_version(dashboard)
+    return render_cache.render_cached_page(
+        "club.html",
+        version,
+        # a page still collecting matches should be reloaded, not kept
+        max_age=render_cache.BROWSER_MAX_AGE if dashboard.complete else 0,
+        complete=dashboard.complete,
+        club=dashboard.club,
+        players=dashboard.players,
+        summary=view_models.build_club_summary_view(dashboard),
+        teams=view_models.build_team_record_views(dashboard.teams),
+        matches=view_models.build_club_match_views(dashboard.matches),
+        performers=view_models.build_performer_views(dashboard.top_performers),
+    )
 
 
 @app.route("/search", methods=["GET"])
@@ -55,7 +140,15 @@ def search():
 
     print(f"Searched for {query}, found {len(players)} players and {len(clubs)} clubs")
 
-    return render_template("search.html", players=players, clubs=clubs, query=query)
+    version = render_cache.content_version([players, clubs])
+    return render_cache.render_cached_page(
+        "search.html",
+        version,
+        page_args=(query,),
+        players=players,
+        clubs=clubs,
+        query=query,
+    )
 
 
 @app.errorhandler(404)
@@ -1,14 +1,80 @@
+import importlib
 import os
+import threading
+from typing import Optional
 
-import supabase
-from supabase.lib.client_options import ClientOptions
+from werkzeug.local import LocalProxy
 
 from app.badminton_player import api
+from app.badminton_player.archive import Archive
+from app.storage import create_storage
+from app.storage.base import Storage
 
-badminton_player_client = api.Client()
+_client: Optional[api.Client] = None
+_storage: Optional[Storage] = None
+_lock = threading.Lock()
 
-supabase_client = supabase.create_client(
-    supabase_url=os.getenv("SUPABASE_URL"),
-    supabase_key=os.getenv("SUPABASE_KEY"),
-    options=ClientOptions(postgrest_client_timeout=10000),
-)
+# parsers import these on first use, which a warm-up moves ahead of traffic
+PARSER_MODULES = ("pandas", "bs4", "lxml.etree")
+
+
+def create_client() -> api.Client:
+    # raw upstream payloads are archived when UPSTREAM_ARCHIVE_PATH is set, and
+    # only read from there when UPSTREAM_REPLAY=1. UPSTREAM_BASE_URL points the
+    # client at another server, such as benchmarks.fake_upstream
+    archive_path = os.getenv("UPSTREAM_ARCHIVE_PATH")
+    return api.Client(
+        archive=Archive(archive_path) if archive_path else None,
+        replay=os.getenv("UPSTREAM_REPLAY") == "1",
+        base_url=os.getenv("UPSTREAM_BASE_URL"),
+    )
+
+
+def _get_client() -> api.Client:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = create_client()
+    return _client
+
+
+def _get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+# both are built on first use, so importing the services costs no connections;
+# create_app builds them up front through init_services
+badminton_player_client: api.Client = LocalProxy(_get_client)
+storage: Storage = LocalProxy(_get_storage)
+
+
+def init_services() -> None:
+    _get_client()
+    _get_storage()
+
+
+def warm_up(player_ids=()) -> None:
+    """Does the work a first request would otherwise wait for.
+
+    Imports the parsers, fetches the upstream context key, opens the storage
+    connection and loads the performances of `player_ids` into the cache.
+    Failures are printed, as a worker should start even if upstream is down.
+    """
+    for module in PARSER_MODULES:
+        importlib.import_module(module)
+
+    client = _get_client()
+    try:
+        if not client.replay:
+            client._get_context_key()
+        _get_storage().get_club(0)
+        for player_id in player_ids:
+            client.get_performance_cached(int(player_id))
+    except Exception as e:
+        print(f"Could not warm up: {e}")
@@ -0,0 +1,121 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.badminton_player import reparse
+from app.badminton_player.api import Client
+from app.badminton_player.archive import Archive
+from app.badminton_player.models import Game
+from app.services import fingerprint_service, storage
+
+ENDPOINTS = (Client.MATCH, Client.PLAYER_PROFILE)
+
+# payloads parsed per task; large enough to amortize pickling results back
+BATCH_SIZE = 200
+
+
+@dataclass(slots=True)
+class BackfillReport:
+    parsed: int = 0
+    games: int = 0
+    standings: int = 0
+    tournaments: int = 0
+    # standings and tournaments of a player, or games of a match, stored as parsed
+    unchanged: int = 0
+    failures: List[Tuple[str, str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def payloads_per_second(self) -> float:
+        total = self.parsed + len(self.failures)
+        return total / self.elapsed if self.elapsed else 0.0
+
+
+def backfill(
+    archive: Archive,
+    endpoints: Iterable[str] = ENDPOINTS,
+    workers: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> BackfillReport:
+    """Reparses the latest archived payload of every key and stores the results.
+
+    Parsing is CPU-bound and runs in a pool of `workers` processes, each reading
+    payloads from the archive itself, so only keys and parsed rows cross process
+    boundaries. Results are written in bulk as batches complete.
+    """
+    report = BackfillReport()
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=reparse.init_worker,
+        initargs=(archive.root,),
+    ) as executor:
+        futures = []
+        for endpoint in endpoints:
+            items = _latest_payloads(archive, endpoint)
+            for i in range(0, len(items), batch_size):
+                futures.append(
+                    executor.submit(
+                        reparse.parse_batch, endpoint, items[i : i + batch_size]
+                    )
+                )
+
+        for future in as_completed(futures):
+            _write(future.result(), report)
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _latest_payloads(archive: Archive, endpoint: str) -> List[Tuple[str, str]]:
+    # the index is ordered by fetch time, so later fetches replace earlier ones
+    latest = {}
+    for _, key, _, digest in archive.iter_index(endpoint):
+        latest[key] = digest
+    return list(latest.items())
+
+
+def _write(batch: reparse.ParsedBatch, report: BackfillReport) -> None:
+    games = {}
+    for match_id, game in batch.games:
+        games.setdefault(match_id, []).append(game)
+
+    # rerunning a backfill over the same archive writes nothing but fingerprints
+    report.games += _write_changed(
+        fingerprint_service.GAMES, games, _upsert_games, report
+    )
+    report.standings += _write_changed(
+        fingerprint_service.STANDINGS,
+        batch.standings,
+        lambda standings: storage.upsert_standings_for_players(standings, False),
+        report,
+    )
+    report.tournaments += _write_changed(
+        fingerprint_service.TOURNAMENTS,
+        batch.tournaments,
+        storage.upsert_tournaments_for_players,
+        report,
+    )
+
+    report.parsed += batch.parsed
+    report.failures.extend(batch.failures)
+
+
+def _write_changed(entity: str, entities: dict, write, report: BackfillReport) -> int:
+    """Writes the changed entities and returns how many rows were written."""
+    if not entities:
+        return 0
+
+    # archived payloads may be old, so nothing is stamped as checked now
+    changed = fingerprint_service.write_changed(entity, entities, write, False)
+    report.unchanged += len(entities) - len(changed)
+    return sum(len(rows) for rows in changed.values())
+
+
+def _upsert_games(games: Dict[int, List[Game]]) -> None:
+    storage.upsert_games(
+        [(match_id, game) for match_id, group in games.items() for game in group]
+    )
@@ -1,36 +1,245 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-from app.services import supabase_client
-from app.utils import supabase_utils
+from cachetools import LRUCache
+
+from app.badminton_player.game_table import GameTable
+from app.badminton_player.models import (
+    Club,
+    MatchMeta,
+    Player,
+    PlayerPerformance,
+    TeamMatch,
+)
+from app.services import badminton_player_client, player_service, storage
+from app.utils import metrics
+
+# the dashboard aggregates every match of the club, so it is rebuilt at most this often
+DASHBOARD_TTL = 15 * 60
+TOP_PERFORMERS = 10
+
+# built dashboards by club id with when they were built, served while rebuilt
+_dashboards: LRUCache = LRUCache(maxsize=128)
+_building = set()
+_dashboards_lock = threading.Lock()
+# a build fans out to every player of the club, so only one runs at a time
+_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="club-dashboard")
+
+
+@dataclass
+class ClubMatch:
+    """A team match seen from the club's side."""
+
+    match: TeamMatch
+    team: str
+    opponent: str
+    points: int
+    opponent_points: int
+
+    @property
+    def outcome(self) -> str:
+        if self.points == self.opponent_points:
+            return "T"
+        return "W" if self.points > self.opponent_points else "L"
+
+
+@dataclass
+class TeamRecord:
+    division: str
+    team: str
+    played: int = 0
+    won: int = 0
+    tied: int = 0
+    lost: int = 0
+    points: int = 0
+    opponent_points: int = 0
 
 
 @dataclass
-class Club:
-    id: int
-    name: str
+class PlayerRecord:
+    player: Player
+    won: int
+    played: int
 
-    @staticmethod
-    def from_json(d: dict) -> "Club":
-        return Club(id=d["bp_id"], name=d["name"])
+
+@dataclass
+class ClubDashboard:
+    club: Club
+    players: List[Player]
+    # newest first
+    matches: List[ClubMatch]
+    teams: List[TeamRecord]
+    top_performers: List[PlayerRecord]
+    games_won: int
+    games_played: int
+    # False while the matches are still being collected for the first time
+    complete: bool = True
 
 
 def search_club(name: str) -> List[Club]:
-    fuzzy_clubs = supabase_utils.from_resp(
-        supabase_client.from_("clubs").select("*").ilike("name", f"%{name}%").execute(),
-        Club,
-    )
-    if not fuzzy_clubs:
-        return []
+    return storage.search_clubs(name)
+
 
-    return fuzzy_clubs
+def get_club(club_id: int) -> Optional[Club]:
+    return storage.get_club(club_id)
 
 
-def get_club(club_id: int) -> Club:
-    club = supabase_utils.from_resp(
-        supabase_client.from_("clubs").select("*").eq("bp_id", club_id).execute(), Club
+def get_club_dashboard(club_id: int) -> Optional[ClubDashboard]:
+    """Returns the last dashboard built for the club, building it in the background.
+
+    Until the first build completes, only the club's players are listed and the
+    dashboard is not `complete`. Dashboards older than DASHBOARD_TTL are served
+    while a new one is built.
+    """
+    with _dashboards_lock:
+        built: Optional[Tuple[float, ClubDashboard]] = _dashboards.get(club_id)
+    if built:
+        metrics.CACHE_REQUESTS.inc(cache="club_dashboard", result="hit")
+        if time.monotonic() - built[0] > DASHBOARD_TTL:
+            _build_in_background(club_id)
+        return built[1]
+
+    metrics.CACHE_REQUESTS.inc(cache="club_dashboard", result="miss")
+    club = get_club(club_id)
+    if not club:
+        return None
+
+    _build_in_background(club_id)
+    return ClubDashboard(
+        club=club,
+        players=player_service.get_players_for_club(club_id),
+        matches=[],
+        teams=[],
+        top_performers=[],
+        games_won=0,
+        games_played=0,
+        complete=False,
     )
+
+
+def build_club_dashboard(club_id: int) -> Optional[ClubDashboard]:
+    """Aggregates the matches of every player in the club.
+
+    Performances are fetched concurrently and their matches are deduplicated,
+    so a match played by six teammates is resolved once and shared. Stored
+    games are read in bulk and only unknown matches hit badmintonplayer.dk.
+    """
+    club = get_club(club_id)
     if not club:
         return None
 
-    return club[0]
+    players = player_service.get_players_for_club(club_id)
+    with ThreadPoolExecutor(max_workers=player_service.FETCH_WORKERS) as pool:
+        fetch = metrics.bind(_try_get_performance)
+        performances = list(pool.map(fetch, [p.id for p in players]))
+
+    metas: Dict[int, MatchMeta] = {}
+    for performance in performances:
+        # match_metadata is None when the profile lists no matches
+        if performance is None or performance.match_metadata is None:
+            continue
+        for meta in performance.match_metadata:
+            if meta and meta.id not in metas:
+                metas[meta.id] = meta
+
+    team_matches = player_service.resolve_team_matches(metas.values())
+    names = {p.name for p in players}
+    matches = [
+        _club_match(metas[match_id], match, names)
+        for match_id, match in team_matches.items()
+    ]
+    matches.sort(key=lambda m: m.match.date or datetime.min, reverse=True)
+
+    return ClubDashboard(
+        club=club,
+        players=players,
+        matches=matches,
+        teams=_team_records(matches),
+        top_performers=_top_performers(team_matches.values(), players),
+        games_won=sum(m.points for m in matches),
+        games_played=sum(m.points + m.opponent_points for m in matches),
+    )
+
+
+def _build_in_background(club_id: int) -> None:
+    with _dashboards_lock:
+        if club_id in _building:
+            return
+        _building.add(club_id)
+
+    def build():
+        try:
+            dashboard = build_club_dashboard(club_id)
+            if dashboard:
+                with _dashboards_lock:
+                    _dashboards[club_id] = (time.monotonic(), dashboard)
+        except Exception as e:
+            print(f"Could not build dashboard for club id={club_id}: {e}")
+        finally:
+            with _dashboards_lock:
+                _building.discard(club_id)
+
+    _builder.submit(build)
+
+
+def _try_get_performance(player_id: int) -> Optional[PlayerPerformance]:
+    try:
+        return badminton_player_client.get_performance_cached(player_id)
+    except Exception as e:
+        print(f"Could not get performance for player id={player_id}: {e}")
+        return None
+
+
+def _club_match(meta: MatchMeta, match: TeamMatch, names: set) -> ClubMatch:
+    # the metadata comes from a club player's profile, so team1 is the club's team
+    home = {p for g in match.games for p in g.home_players()}
+    away = {p for g in match.games for p in g.away_players()}
+    club_is_home = len(home & names) >= len(away & names)
+
+    points, opponent_points = match.home_points, match.away_points
+    if not club_is_home:
+        points, opponent_points = opponent_points, points
+
+    return ClubMatch(
+        match=match,
+        team=meta.team1,
+        opponent=meta.team2,
+        points=points,
+        opponent_points=opponent_points,
+    )
+
+
+def _team_records(matches: List[ClubMatch]) -> List[TeamRecord]:
+    records: Dict[tuple, TeamRecord] = {}
+    for m in matches:
+        if not m.match.games:
+            # not played yet
+            continue
+
+        key = (m.match.division, m.team)
+        record = records.setdefault(key, TeamRecord(*key))
+        record.played += 1
+        record.won += m.outcome == "W"
+        record.tied += m.outcome == "T"
+        record.lost += m.outcome == "L"
+        record.points += m.points
+        record.opponent_points += m.opponent_points
+
+    return sorted(records.values(), key=lambda r: (r.division or "", r.team or ""))
+
+
+def _top_performers(
+    matches: List[TeamMatch], players: List[Player]
+) -> List[PlayerRecord]:
+    table = GameTable.from_games([g for m in matches for g in m.games if g.category])
+    records = table.player_records()
+
+    performers = [
+        PlayerRecord(p, *records[p.name]) for p in players if p.name in records
+    ]
+    performers.sort(key=lambda r: (r.won, r.won / r.played), reverse=True)
+    return performers[:TOP_PERFORMERS]
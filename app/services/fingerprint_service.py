@@ -0,0 +1,52 @@
+from typing import Callable, Dict, List, TypeVar
+
+from app.services import storage
+from app.utils import fingerprints, metrics
+
+PLAYERS = "players"
+STANDINGS = "standings"
+TOURNAMENTS = "tournaments"
+GAMES = "games"
+
+T = TypeVar("T")
+
+ENTITY_WRITES = metrics.Counter(
+    "entity_writes_total",
+    "Keys of parsed entities written or found unchanged, by entity.",
+    ["entity", "result"],
+)
+
+
+def write_changed(
+    entity: str,
+    entities: Dict[int, List[T]],
+    write: Callable[[Dict[int, List[T]]], None],
+    checked: bool = True,
+) -> Dict[int, List[T]]:
+    """Writes the entities of the keys whose content changed since last written.
+
+    `entities` maps the player or match id rows are stored under to the parsed
+    models. Their digests are compared with the stored fingerprints, `write` is
+    called with the changed keys only, and the rest are just marked as checked.
+    Entities not `checked` against badmintonplayer.dk now, such as those
+    reparsed from the archive, are not marked as checked. Returns the changed
+    keys.
+    """
+    digests = {key: fingerprints.entity_digest(e) for key, e in entities.items()}
+    stored = storage.get_fingerprints(entity, list(digests))
+
+    changed = {key: entities[key] for key in digests if stored.get(key) != digests[key]}
+    unchanged = [key for key in digests if key not in changed]
+
+    if changed:
+        write(changed)
+        # only once written, so a failed write is retried by the next check
+        storage.put_fingerprints(
+            entity, {key: digests[key] for key in changed}, checked
+        )
+    if unchanged and checked:
+        storage.touch_fingerprints(entity, unchanged)
+
+    ENTITY_WRITES.inc(len(changed), entity=entity, result="written")
+    ENTITY_WRITES.inc(len(unchanged), entity=entity, result="unchanged")
+    return changed
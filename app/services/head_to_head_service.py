@@ -0,0 +1,104 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from app.badminton_player.models import Game
+from app.services import storage
+
+OPPONENT = "opponent"
+PARTNER = "partner"
+
+
+@dataclass
+class HeadToHead:
+    player_name: str
+    other_name: str
+    # games where the two players were on opposite sides, newest first
+    against: List[Game] = field(default_factory=list)
+    won_against: int = 0
+    # games where the two players were partners, newest first
+    partnered: List[Game] = field(default_factory=list)
+    won_partnered: int = 0
+
+
+def get_head_to_head(player_name: str, other_name: str) -> HeadToHead:
+    """Answers from the game_pairs index with a single lookup on the player pair.
+
+    Every pair is stored in both directions, so `won` is always seen from
+    `player_name`, and the referenced games are joined in the same query.
+    """
+    result = HeadToHead(player_name, other_name)
+    for relation, won, game in storage.get_pair_games(player_name, other_name):
+        if relation == OPPONENT:
+            result.against.append(game)
+            result.won_against += won
+        else:
+            result.partnered.append(game)
+            result.won_partnered += won
+
+    return result
+
+
+def get_opponents(player_name: str) -> Dict[str, Tuple[int, int]]:
+    """Returns (won, played) against every opponent of the player."""
+    rows = storage.get_pair_records(player_name, OPPONENT)
+
+    played, won = Counter(), Counter()
+    for row in rows:
+        played[row["other_name"]] += 1
+        won[row["other_name"]] += row["won"]
+
+    return {name: (won[name], played[name]) for name in played}
+
+
+def index_game(game_id: int, game: Game) -> None:
+    rows = _pair_rows(game_id, game)
+    if rows:
+        storage.upsert_game_pairs(rows)
+
+
+def rebuild_index() -> int:
+    """Indexes every stored game and returns how many were processed."""
+    processed = 0
+    for rows in storage.iter_game_rows():
+        pairs = []
+        for row in rows:
+            if row.get("date") and row.get("category"):
+                pairs.extend(_pair_rows(row["id"], Game.from_json(row)))
+
+        if pairs:
+            storage.upsert_game_pairs(pairs)
+        processed += len(rows)
+
+    return processed
+
+
+def _pair_rows(game_id: int, game: Game) -> List[dict]:
+    def present(names: List[str]) -> List[str]:
+        return [n for n in names if "Ikke fremmødt" not in n]
+
+    home, away = present(game.home_players()), present(game.away_players())
+    if not home or not away:
+        return []
+
+    home_won = game.get_winner() == "home"
+    date = game.date.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    rows = []
+    for side, others, won in ((home, away, home_won), (away, home, not home_won)):
+        for player in side:
+            pairs = [(other, OPPONENT) for other in others]
+            pairs += [(other, PARTNER) for other in side if other != player]
+            for other, relation in pairs:
+                rows.append(
+                    {
+                        "player_name": player,
+                        "other_name": other,
+                        "relation": relation,
+                        "game_id": game_id,
+                        "date": date,
+                        "won": won,
+                    }
+                )
+
+    return rows
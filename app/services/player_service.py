@@ -1,21 +1,38 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from threading import Thread
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from pyjarowinkler import distance
 
+from app.badminton_player import freshness
 from app.badminton_player.models import (
     Game,
+    MatchMeta,
     Player,
     PlayerPerformance,
     Standing,
     TeamMatch,
     Tournament,
 )
-from app.services import badminton_player_client, supabase_client
-from app.utils import supabase_utils
+from app.services import (
+    badminton_player_client,
+    fingerprint_service,
+    head_to_head_service,
+    storage,
+)
+from app.utils import metrics
+from app.utils.concurrency import run_in_background
+
+PROFILE_FIELDS = ("standings", "matches", "games", "tournaments")
+
+# matches fetched from badmintonplayer.dk at once when resolving in bulk
+FETCH_WORKERS = 8
+
+STAGE_SECONDS = metrics.Histogram(
+    "profile_stage_seconds", "Player profile stages by stage.", ["stage"]
+)
 
 
 @dataclass
@@ -29,15 +46,11 @@ class AggregatePlayerProfile:
 
 
 def get_players_for_club(club_id: int) -> List[Player]:
-    players = supabase_utils.from_resp(
-        supabase_client.from_("players")
-        .select("*")
-        .eq("bp_club_id", club_id)
-        .order("bp_name")
-        .execute(),
-        Player,
-    )
-    return players
+    return storage.get_players_for_club(club_id)
+
+
+def get_player(player_id: int) -> Optional[Player]:
+    return _try_find_player(int(player_id))
 
 
 def get_player_id(name: str, club_name: str) -> Optional[int]:
@@ -50,15 +63,7 @@ def get_player_id(name: str, club_name: str) -> Optional[int]:
 
 def search_player(name: str, club: str = None) -> List[Player]:
     parts = name.split(" ")
-    query = " | ".join([p for p in parts if p])
-
-    fuzzy_players = supabase_utils.from_resp(
-        supabase_client.from_("players")
-        .select("*, clubs (name)")
-        .text_search("bp_name", query)
-        .execute(),
-        Player,
-    )
+    fuzzy_players = storage.search_players([p for p in parts if p])
 
     visited = set()
     players = []
@@ -92,50 +97,144 @@ def search_player(name: str, club: str = None) -> List[Player]:
     return players
 
 
-def build_player_profile(player_id: int) -> Optional[AggregatePlayerProfile]:
+class PlayerProfileStream:
+    """Player profile whose matches are resolved while they are being consumed.
+
+    The player, performance metadata and standings are resolved up front, while
+    matches, games and tournaments only become available as `iter_matches` is
+    iterated, which lets a page render its header before any match is fetched.
+    """
+
+    def __init__(self, player_id: int, fields: Optional[Iterable[str]] = None):
+        self.player: Optional[Player] = None
+        self.metadata: Optional[PlayerPerformance] = None
+        self.standings: List[Standing] = []
+        self.matches: List[TeamMatch] = []
+        self.games: List[Game] = []
+        self.tournaments: List[Tournament] = []
+
+        self._stages = iter_player_profile(player_id, fields)
+        for stage, value in self._stages:
+            setattr(self, stage, value)
+            if stage == "standings":
+                break
+
+    def iter_matches(self) -> Iterator[TeamMatch]:
+        yield from list(self.matches)
+        for stage, value in self._stages:
+            if stage == "match":
+                self.matches.append(value)
+                yield value
+            else:
+                setattr(self, stage, value)
+
+    def resolve(self) -> "PlayerProfileStream":
+        for _ in self.iter_matches():
+            pass
+        return self
+
+
+def iter_player_profile(
+    player_id: int, fields: Optional[Iterable[str]] = None
+) -> Iterator[Tuple[str, Any]]:
+    """Yields (stage, value) pairs in the order the profile can be resolved.
+
+    Stages are "player", "metadata", "standings", one "match" per team match,
+    "games" and "tournaments". Nothing is yielded for unknown players.
+    """
     player_id = int(player_id)
+    fields = set(fields) if fields is not None else set(PROFILE_FIELDS)
 
-    player = _try_find_player(player_id)
+    with STAGE_SECONDS.time(stage="player"):
+        player = _try_find_player(player_id)
     if not player:
         print(f"Could not find player with id {player_id}")
+        return
+
+    with STAGE_SECONDS.time(stage="metadata"):
+        performance = badminton_player_client.get_performance_cached(player_id)
+    if not performance:
+        print(f"Could not find meta for player with id {player_id}")
+        return
+
+    yield "player", player
+    yield "metadata", performance
+
+    standings = []
+    if "standings" in fields:
+        with STAGE_SECONDS.time(stage="standings"):
+            standings = _try_find_standings(player_id)
+        if not standings:
+            print(f"Could not find standing for player with id {player_id}")
+    yield "standings", standings
+
+    # games are derived from matches, so requesting games implies fetching matches
+    matches = []
+    if "matches" in fields or "games" in fields:
+        team_matches = _iter_team_matches(player_id)
+        for match in STAGE_SECONDS.time_iter(team_matches, stage="matches"):
+            matches.append(match)
+            if "matches" in fields:
+                yield "match", match
+        if not matches:
+            print(f"Could not find matches for player with id {player_id}")
+
+    games = []
+    if "games" in fields:
+        with STAGE_SECONDS.time(stage="games"):
+            games = _try_find_games(player.name, matches)
+        if not games:
+            print(f"Could not find games for player with id {player_id}")
+    yield "games", games
+
+    tournaments = []
+    if "tournaments" in fields:
+        with STAGE_SECONDS.time(stage="tournaments"):
+            tournaments = _try_find_tournaments(player_id)
+        if not tournaments:
+            print(f"Could not find tournaments for player with id {player_id}")
+    yield "tournaments", tournaments
+
+
+def build_player_profile(
+    player_id: int, fields: Optional[Iterable[str]] = None
+) -> Optional[AggregatePlayerProfile]:
+    profile = PlayerProfileStream(player_id, fields).resolve()
+    if not profile.player:
         return None
 
-    standings = _try_find_standings(player_id)
-    if not standings:
-        print(f"Could not find standing for player with id {player_id}")
+    return AggregatePlayerProfile(
+        player=profile.player,
+        metadata=profile.metadata,
+        games=profile.games,
+        matches=profile.matches,
+        standings=profile.standings,
+        tournaments=profile.tournaments,
+    )
 
-    matches = _try_find_team_matches(player_id)
-    if not matches:
-        print(f"Could not find matches for player with id {player_id}")
 
-    games = _try_find_games(player.name, matches)
-    if not games:
-        print(f"Could not find games for player with id {player_id}")
+def get_team_match(match_id: int, player_id: int) -> Optional[TeamMatch]:
+    player = _try_find_player(int(player_id))
+    if not player:
+        return None
 
-    performance = badminton_player_client.get_performance_cached_1h(player_id)
+    performance = badminton_player_client.get_performance_cached(player.id)
     if not performance:
-        print(f"Could not find meta for player with id {player_id}")
         return None
 
-    tournaments = _try_find_tournaments(player_id)
-    if not tournaments:
-        print(f"Could not find tournaments for player with id {player_id}")
+    for meta in performance.match_metadata:
+        if meta and meta.id == match_id:
+            return _resolve_team_match(meta, player)
 
-    return AggregatePlayerProfile(
-        player=player,
-        metadata=performance,
-        games=games,
-        matches=matches,
-        standings=standings,
-        tournaments=tournaments,
-    )
+    return None
 
 
 def group_games_by_category(games: List[Game]) -> Dict[str, List[Game]]:
     streak = defaultdict(list)
     for game in games:
         category = game.category
-        if category != "MD":
+        # team match games are numbered, as in "1. HS"
+        if category[:1].isdigit():
             category = category[2:].strip()
         streak[category].append(game)
 
@@ -158,26 +257,6 @@ def group_games_by_category(games: List[Game]) -> Dict[str, List[Game]]:
     return {mapping[k]: v for k, v in streak.items() if k in mapping}
 
 
-def group_matches_by_division(matches: List[TeamMatch]) -> List[List[TeamMatch]]:
-    grouped_matches = []
-    curr_group = []
-    prev_division = None
-    for m in matches:
-        if m.division == prev_division:
-            m.division = None
-            curr_group.append(m)
-        else:
-            if curr_group:
-                grouped_matches.append(curr_group)
-            curr_group = [m]
-            prev_division = m.division
-
-    if curr_group:
-        grouped_matches.append(curr_group)
-
-    return grouped_matches
-
-
 def _try_find_standings(player_id: int) -> Optional[List[Standing]]:
     def sort_standings(standings: List[Standing]) -> List[Standing]:
         return sorted(
@@ -186,32 +265,24 @@ def _try_find_standings(player_id: int) -> Optional[List[Standing]]:
             reverse=True,
         )
 
-    one_day_ago = datetime.now() - timedelta(days=1)
-    standings = supabase_utils.from_resp(
-        supabase_client.from_("standings")
-        .select("*")
-        .eq("bp_player_id", player_id)
-        .gte("updated_at", one_day_ago)
-        .execute(),
-        Standing,
-    )
+    # standings change with every match, so they are kept for longer the further
+    # the player is from their next or last one
+    profile = badminton_player_client.get_performance_cached(player_id)
+    window = freshness.standings_window(profile)
+    standings = storage.get_standings(player_id, datetime.now() - window)
     if standings:
         print(f"Found existing standings for player with id {player_id}")
         return sort_standings(standings)
 
     print(f"Retrieving standings for player with id {player_id}")
-    profile = badminton_player_client.get_performance_cached_1h(player_id)
     if not profile or len(profile.standings) == 0:
         return None
 
-    standings_data = [s.to_dict(player_id) for s in profile.standings]
-    for standing in standings_data:
-        standing["updated_at"] = "now()"
-
-    supabase_client.from_("standings").upsert(
-        standings_data,
-        on_conflict="bp_player_id,category",
-    ).execute()
+    fingerprint_service.write_changed(
+        fingerprint_service.STANDINGS,
+        {player_id: list(profile.standings)},
+        storage.upsert_standings_for_players,
+    )
 
     standings = list(profile.standings)
     return sort_standings(standings)
@@ -219,15 +290,9 @@ def _try_find_standings(player_id: int) -> Optional[List[Standing]]:
 
 def _try_find_player(player_id: int) -> Optional[Player]:
     def _getter() -> Optional[Player]:
-        player = supabase_utils.from_resp(
-            supabase_client.from_("players")
-            .select("*, clubs (name)")
-            .eq("bp_id", player_id)
-            .execute(),
-            Player,
-        )
+        player = storage.get_player(player_id)
         if player:
-            return player[0]
+            return player
 
         player = badminton_player_client.get_player(player_id)
         if not player:
@@ -247,138 +312,160 @@ def _try_find_player(player_id: int) -> Optional[Player]:
 
 
 def _upsert_player_async(player: Player) -> None:
-    def _upsert_player_job():
-        if not player.club_id:
-            return
+    if not player.club_id:
+        return
 
-        supabase_client.from_("clubs").upsert(
-            {
-                "bp_id": player.club_id,
-                "name": player.club_name,
-            },
-            on_conflict="bp_id",
-        ).execute()
+    # unchanged players are not rewritten, which would bump their updated_at and
+    # have every replica and snapshot pull them again
+    run_in_background(
+        fingerprint_service.write_changed,
+        fingerprint_service.PLAYERS,
+        {player.id: [player]},
+        _upsert_players,
+    )
 
-        supabase_client.from_("players").upsert(
-            player.to_dict(), on_conflict="bp_id"
-        ).execute()
 
-    t = Thread(target=_upsert_player_job)
-    t.start()
+def _upsert_players(players: Dict[int, List[Player]]) -> None:
+    for group in players.values():
+        for player in group:
+            storage.upsert_player(player)
 
 
-def _try_find_team_matches(player_id: int) -> Optional[List[TeamMatch]]:
-    profile = badminton_player_client.get_performance_cached_1h(player_id)
+def _iter_team_matches(player_id: int) -> Iterator[TeamMatch]:
+    profile = badminton_player_client.get_performance_cached(player_id)
     if not profile:
-        return []
+        return
 
     player = _try_find_player(player_id)
     if not player:
-        return []
+        return
 
-    matches = []
-    sort_for_match = {}
-    for i, meta in enumerate(profile.match_metadata):
+    # the profile lists matches oldest first, but they are shown newest first
+    for meta in list(profile.match_metadata)[::-1]:
         if not meta:
             continue
 
-        games: List[Game] = supabase_utils.from_resp(
-            supabase_client.from_("games")
-            .select("*")
-            .eq("bp_match_id", meta.id)
-            .execute(),
-            Game,
-        )
-        if games:
-            # Order: 1. MD, 2. MD, 1. DS, 2. DS, 1. HS, 2. HS, 3. HS, 4. HS, 1. DD, 2. DD
-            # Sort by type (last two chars): MD, DS, HS, DD
-            # Sort by number (first char): 1, 2, 3, 4
-            order = {
-                "MD": 0,
-                "DS": 1,
-                "HS": 2,
-                "DD": 3,
-                "HD": 4,
-                "S": 5,
-                "D": 6,
-            }
-            games.sort(
-                key=lambda g: (
-                    (
-                        order[g.category[3:]]
-                        if g.category[0].isdigit()
-                        else order[g.category]
-                    ),
-                    int(g.category.strip()[0]) if g.category[0].isdigit() else 0,
-                )
-            )
-
-            for g in games:
-                g.date = g.date.replace(tzinfo=None)
-
-            print(f"Found games for match id={meta.id}")
-
-            match = TeamMatch(
-                id=meta.id,
-                date=meta.date,
-                division=meta.division.strip(),
-                games=games,
-            )
-
-            sort_for_match[match.id] = i
-        else:
-            print("Retrieving games for match with id", meta.id)
-            match = badminton_player_client.get_match(meta.id)
-            if not match:
-                continue
-
-            for game in match.games:
-                # TODO: are we persisting games correctly?
-                _upsert_game_async(meta.id, game)
-
-            sort_for_match[match.id] = meta.sort
-
-        home_players, away_players = [], []
-        for g in match.games:
-            home_players.append(g.home_player1)
-            away_players.append(g.away_player1)
-
-            if g.home_player2:
-                home_players.append(g.home_player2)
-            if g.away_player2:
-                away_players.append(g.away_player2)
-
-        home_team, away_team = meta.team1, meta.team2
-        home_club, away_club = "", ""
-
-        if player.name not in home_players:
-            home_team, away_team = away_team, home_team
-            home_club = _identify_club_name(home_players)
-            away_club = player.club_name
-        else:
-            home_club = player.club_name
-            away_club = _identify_club_name(away_players)
+        match = _resolve_team_match(meta, player)
+        if match:
+            yield match
+
 
-        match.home_team = home_team
-        match.away_team = away_team
-        match.home_club = home_club
-        match.away_club = away_club
+def resolve_team_matches(metas: Iterable[MatchMeta]) -> Dict[int, TeamMatch]:
+    """Resolves many matches at once, keyed by match id.
 
-        matches.append(match)
+    Stored games are read with one query per batch of matches and the missing
+    matches are fetched concurrently. Unlike the single-player path, the teams
+    are left as reported by the match and not oriented towards any player.
+    """
+    metas = {meta.id: meta for meta in metas if meta}
+
+    matches = {
+        match_id: _team_match_from_games(metas[match_id], games)
+        for match_id, games in storage.get_games_for_matches(list(metas)).items()
+    }
+
+    missing = [match_id for match_id in metas if match_id not in matches]
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        fetch = metrics.bind(_try_fetch_team_match)
+        for match_id, match in zip(missing, pool.map(fetch, missing)):
+            if match:
+                matches[match_id] = match
 
-    matches.sort(key=lambda m: sort_for_match[m.id], reverse=True)
-    
     return matches
 
 
-def _identify_club_name(player_names: List[str]) -> str:
-    players = supabase_utils.from_resp(
-        supabase_client.from_("players")
-        .select("*, clubs (name)")
-        .in_("bp_name", player_names)
-        .execute(),
-        Player,
+def _resolve_team_match(meta: MatchMeta, player: Player) -> Optional[TeamMatch]:
+    games = storage.get_games_for_matches([meta.id]).get(meta.id)
+    if games:
+        print(f"Found games for match id={meta.id}")
+        match = _team_match_from_games(meta, games)
+    else:
+        match = _fetch_team_match(meta.id)
+        if not match:
+            return None
+
+    home_players, away_players = [], []
+    for g in match.games:
+        home_players.append(g.home_player1)
+        away_players.append(g.away_player1)
+
+        if g.home_player2:
+            home_players.append(g.home_player2)
+        if g.away_player2:
+            away_players.append(g.away_player2)
+
+    home_team, away_team = meta.team1, meta.team2
+    home_club, away_club = "", ""
+
+    if player.name not in home_players:
+        home_team, away_team = away_team, home_team
+        home_club = _identify_club_name(home_players)
+        away_club = player.club_name
+    else:
+        home_club = player.club_name
+        away_club = _identify_club_name(away_players)
+
+    match.home_team = home_team
+    match.away_team = away_team
+    match.home_club = home_club
+    match.away_club = away_club
+
+    return match
+
+
+def _team_match_from_games(meta: MatchMeta, games: List[Game]) -> TeamMatch:
+    # Order: 1. MD, 2. MD, 1. DS, 2. DS, 1. HS, 2. HS, 3. HS, 4. HS, 1. DD, 2. DD
+    # Sort by type (last two chars): MD, DS, HS, DD
+    # Sort by number (first char): 1, 2, 3, 4
+    order = {
+        "MD": 0,
+        "DS": 1,
+        "HS": 2,
+        "DD": 3,
+        "HD": 4,
+        "S": 5,
+        "D": 6,
+    }
+    games.sort(
+        key=lambda g: (
+            (order[g.category[3:]] if g.category[0].isdigit() else order[g.category]),
+            int(g.category.strip()[0]) if g.category[0].isdigit() else 0,
+        )
     )
+
+    for g in games:
+        g.date = g.date.replace(tzinfo=None)
+
+    return TeamMatch(
+        id=meta.id,
+        date=meta.date,
+        division=meta.division.strip(),
+        games=games,
+    )
+
+
+def _fetch_team_match(match_id: int) -> Optional[TeamMatch]:
+    print("Retrieving games for match with id", match_id)
+    match = badminton_player_client.get_match(match_id)
+    if not match:
+        return None
+
+    _upsert_games_async(match_id, match.games)
+
+    return match
+
+
+def _try_fetch_team_match(match_id: int) -> Optional[TeamMatch]:
+    # one unparseable match should not fail a whole batch
+    try:
+        return _fetch_team_match(match_id)
+    except Exception as e:
+        print(f"Could not fetch match id={match_id}: {e}")
+        return None
+
+
+def _identify_club_name(player_names: List[str]) -> str:
+    players = storage.get_players_by_name(player_names)
     if not players:
         return "unknown"
 
@@ -393,17 +480,25 @@ def _identify_club_name(player_names: List[str]) -> str:
     return club_name
 
 
-def _upsert_game_async(match_id: str, game: Game) -> None:
-    if not game.category:
+def _upsert_games_async(match_id: int, games: List[Game]) -> None:
+    games = [game for game in games if game.category]
+    if not games:
         return
 
-    def upsert_game():
-        row = game.to_dict()
-        row["bp_match_id"] = match_id
-        supabase_client.from_("games").upsert(row).execute()
+    run_in_background(
+        fingerprint_service.write_changed,
+        fingerprint_service.GAMES,
+        {match_id: games},
+        _upsert_games,
+    )
+
 
-    t = Thread(target=upsert_game)
-    t.start()
+def _upsert_games(games: Dict[int, List[Game]]) -> None:
+    for match_id, match_games in games.items():
+        for game in match_games:
+            game_id = storage.upsert_game(match_id, game)
+            if game_id:
+                head_to_head_service.index_game(game_id, game)
 
 
 def _try_find_games(player_name: str, matches: List[TeamMatch]) -> List[Game]:
@@ -427,18 +522,16 @@ def _upsert_tournaments_async(player_id: int, tournaments: List[Tournament]) ->
     if not tournaments:
         return
 
-    def upsert_tournaments():
-        for tournament in tournaments:
-            row = tournament.to_dict()
-            row["bp_player_id"] = player_id
-            supabase_client.from_("tournaments").upsert(row).execute()
-
-    t = Thread(target=upsert_tournaments)
-    t.start()
+    run_in_background(
+        fingerprint_service.write_changed,
+        fingerprint_service.TOURNAMENTS,
+        {player_id: tournaments},
+        storage.upsert_tournaments_for_players,
+    )
 
 
 def _try_find_tournaments(player_id: int) -> List[Tournament]:
-    profile = badminton_player_client.get_performance_cached_1h(player_id)
+    profile = badminton_player_client.get_performance_cached(player_id)
     if not profile:
         return []
 
@@ -447,6 +540,5 @@ def _try_find_tournaments(player_id: int) -> List[Tournament]:
 
     _upsert_tournaments_async(player_id, profile.tournaments)
 
-    profile.tournaments.sort(key=lambda t: t.date, reverse=True)
-
-    return profile.tournaments
+    # the profile is cached and shared between requests, so it is not sorted in place
+    return sorted(profile.tournaments, key=lambda t: t.date, reverse=True)
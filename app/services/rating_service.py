@@ -0,0 +1,86 @@
+from typing import Dict, Iterator, List
+
+from app.badminton_player.game_table import GameTable
+from app.badminton_player.models import Game
+from app.badminton_player.ratings import Rating, Ratings, rate
+from app.services import storage
+
+# games are read from the games table in pages of this size
+BATCH_SIZE = 1000
+
+
+def get_ratings(player_name: str) -> Dict[str, Rating]:
+    rows = storage.get_rating_rows([player_name])
+    return {r["discipline"]: Rating(r["rating"], r["num_games"]) for r in rows}
+
+
+def update_ratings() -> int:
+    """Rates games inserted since the last run and returns how many were processed.
+
+    Ratings of the players involved are loaded, updated with the new games and
+    written back, so the cost depends on the number of new games only. Games
+    are rated once by id, so only complete games are rated, and a game whose
+    sets are filled in after it was stored is only rated by recompute_ratings.
+    """
+    last_game_id = storage.get_last_rated_game_id()
+    processed = 0
+
+    for rows in _iter_game_pages(after_id=last_game_id):
+        last_game_id = rows[-1]["id"]
+        games = _rateable_games(rows)
+        table = GameTable.from_games(games)
+
+        ratings = _load_ratings(table.names)
+        _save_ratings(rate(table, ratings))
+
+        storage.set_last_rated_game_id(last_game_id)
+        processed += len(rows)
+
+    return processed
+
+
+def recompute_ratings() -> int:
+    """Rates every stored game from scratch in a single vectorized pass."""
+    games, last_game_id = [], 0
+    for rows in _iter_game_pages(after_id=0):
+        last_game_id = rows[-1]["id"]
+        games.extend(_rateable_games(rows))
+
+    ratings = rate(GameTable.from_games(games), {})
+
+    storage.delete_ratings()
+    _save_ratings(ratings)
+    storage.set_last_rated_game_id(last_game_id)
+
+    return len(games)
+
+
+def _iter_game_pages(after_id: int) -> Iterator[List[dict]]:
+    return storage.iter_game_rows(after_id=after_id, page_size=BATCH_SIZE)
+
+
+def _rateable_games(rows: List[dict]) -> List[Game]:
+    games = [Game.from_json(r) for r in rows if r.get("date") and r.get("category")]
+    # games stored while their match was played may lack sets
+    return [g for g in games if g.is_complete()]
+
+
+def _load_ratings(player_names: List[str]) -> Ratings:
+    return {
+        (r["player_name"], r["discipline"]): Rating(r["rating"], r["num_games"])
+        for r in storage.get_rating_rows(player_names)
+    }
+
+
+def _save_ratings(ratings: Ratings) -> None:
+    storage.upsert_rating_rows(
+        [
+            {
+                "player_name": name,
+                "discipline": discipline,
+                "rating": rating.rating,
+                "num_games": rating.num_games,
+            }
+            for (name, discipline), rating in ratings.items()
+        ]
+    )
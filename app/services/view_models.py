@@ -0,0 +1,380 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from markupsafe import Markup
+
+from app.badminton_player.game_table import DISCIPLINES, GameTable
+from app.badminton_player.models import (
+    Game,
+    Player,
+    PlayerPerformance,
+    Standing,
+    TeamMatch,
+    Tournament,
+)
+from app.services import club_service, player_service
+
+MOBILE_STREAK_LIMIT = 3
+MAX_OPPONENTS = 10
+
+_OUTCOME_BADGES = {"W": "bg-success", "L": "bg-danger", "T": "bg-secondary"}
+
+
+@dataclass
+class ProfileView:
+    id: int
+    name: str
+    club_id: int
+    club_name: str
+    age: int
+    points: Optional[int]
+    points_delta: Optional[int]
+
+
+@dataclass
+class StandingView:
+    category: str
+    tier: str
+    num_points: int
+    num_matches: int
+    ranking: str
+
+
+@dataclass
+class GameView:
+    category: str
+    home_player1: Optional[str]
+    home_player2: Optional[str]
+    away_player1: Optional[str]
+    away_player2: Optional[str]
+    home_won: bool
+    row_class: str
+    # always three entries, empty for sets that were not played
+    sets: List[Markup]
+
+
+@dataclass
+class MatchView:
+    id: int
+    division: Optional[str]
+    home_team: Optional[str]
+    away_team: Optional[str]
+    home_club: Optional[str]
+    away_club: Optional[str]
+    home_points: int
+    away_points: int
+    outcome: str
+    outcome_badge: str
+    date: str
+
+
+@dataclass
+class StatsView:
+    discipline: str
+    played: int
+    win_rate: str
+    three_set_rate: str
+    points: str
+
+
+@dataclass
+class OpponentView:
+    name: str
+    played: int
+    won: int
+    lost: int
+    win_rate: str
+
+
+@dataclass
+class ClubSummaryView:
+    matches: int
+    record: str
+    game_win_rate: str
+
+
+@dataclass
+class ClubMatchView:
+    url: str
+    date: str
+    division: Optional[str]
+    team: str
+    opponent: str
+    score: str
+    outcome: str
+    badge_class: str
+
+
+@dataclass
+class TeamRecordView:
+    division: str
+    team: str
+    played: int
+    record: str
+    games: str
+
+
+@dataclass
+class PerformerView:
+    id: int
+    name: str
+    record: str
+    win_rate: str
+
+
+@dataclass
+class TournamentView:
+    url: str
+    host_club: str
+    level: str
+    date: str
+
+
+def build_profile_view(
+    player: Player, metadata: PlayerPerformance, standings: List[Standing]
+) -> ProfileView:
+    points, points_delta = None, None
+    if standings:
+        points = standings[0].num_points
+        points_delta = points - metadata.season_start_points
+
+    return ProfileView(
+        id=player.id,
+        name=player.name,
+        club_id=player.club_id,
+        club_name=player.club_name,
+        age=player.get_age(),
+        points=points,
+        points_delta=points_delta,
+    )
+
+
+def build_standing_views(standings: List[Standing]) -> List[StandingView]:
+    if not standings:
+        return []
+
+    return [
+        StandingView(
+            category=s.category[10:],
+            tier=s.tier,
+            num_points=s.num_points,
+            num_matches=s.num_matches,
+            ranking=str(s.ranking) if s.ranking != -1 else "-",
+        )
+        for s in standings
+    ]
+
+
+def build_streaks(
+    standings: List[Standing],
+    games: List[Game],
+    player_name: str,
+    limit: Optional[int] = None,
+) -> List[List[bool]]:
+    """Returns the newest first win/loss streak for each standing."""
+    if not standings:
+        return []
+
+    streaks: Dict[str, List[bool]] = {}
+    grouped = player_service.group_games_by_category(games)
+    for category, category_games in grouped.items():
+        category_games = sorted(category_games, key=lambda g: g.date, reverse=True)
+        streaks[category] = [
+            _won_by(g, g.get_winner(), player_name) for g in category_games[:limit]
+        ]
+
+    return [streaks.get(s.category, []) for s in standings]
+
+
+def build_match_view(match: TeamMatch, player_name: str) -> MatchView:
+    winners = [g.get_winner() for g in match.games]
+    home_points = winners.count("home")
+    away_points = winners.count("away")
+
+    if home_points == away_points:
+        outcome = "T"
+    else:
+        home_players, away_players = set(), set()
+        for g in match.games:
+            home_players.update(g.home_players())
+            away_players.update(g.away_players())
+
+        if not match.date:
+            players = home_players if home_players else away_players
+        elif home_points > away_points:
+            players = home_players
+        else:
+            players = away_players
+        outcome = "W" if player_name in players else "L"
+
+    return MatchView(
+        id=match.id,
+        division=match.division,
+        home_team=match.home_team,
+        away_team=match.away_team,
+        home_club=match.home_club,
+        away_club=match.away_club,
+        home_points=home_points,
+        away_points=away_points,
+        outcome=outcome,
+        outcome_badge=_OUTCOME_BADGES[outcome],
+        date=match.date.strftime("%d %b, %Y") if match.date else "Forfeit",
+    )
+
+
+def iter_match_views(
+    matches: Iterable[TeamMatch], player_name: str
+) -> Iterator[MatchView]:
+    for match in matches:
+        yield build_match_view(match, player_name)
+
+
+def build_game_views(match: TeamMatch, player_name: str) -> List[GameView]:
+    views = []
+    for game in match.games:
+        winner = game.get_winner()
+
+        row_class = ""
+        if game.contains(player_name):
+            won = _won_by(game, winner, player_name)
+            row_class = "table-success" if won else "table-danger"
+
+        sets = [s.to_html(winner) for s in game.sets[:3]]
+        sets += [Markup("")] * (3 - len(sets))
+
+        views.append(
+            GameView(
+                category=game.category,
+                home_player1=game.home_player1,
+                home_player2=game.home_player2,
+                away_player1=game.away_player1,
+                away_player2=game.away_player2,
+                home_won=winner == "home",
+                row_class=row_class,
+                sets=sets,
+            )
+        )
+
+    return views
+
+
+def build_stats_views(games: List[Game], player_name: str) -> List[StatsView]:
+    stats = GameTable.from_games(games).discipline_stats(player_name)
+
+    views = []
+    for discipline in DISCIPLINES:
+        if discipline not in stats:
+            continue
+        s = stats[discipline]
+        views.append(
+            StatsView(
+                discipline=discipline.capitalize(),
+                played=s.played,
+                win_rate=f"{s.win_rate:.0%}",
+                three_set_rate=f"{s.three_sets / s.played:.0%}",
+                points=f"{s.points_for} - {s.points_against}",
+            )
+        )
+
+    return views
+
+
+def build_opponent_views(
+    opponents: Dict[str, Tuple[int, int]], limit: int = MAX_OPPONENTS
+) -> List[OpponentView]:
+    """Returns the most frequent opponents from (won, played) records."""
+    frequent = sorted(opponents.items(), key=lambda o: (-o[1][1], o[0]))[:limit]
+    return [
+        OpponentView(
+            name=name,
+            played=played,
+            won=won,
+            lost=played - won,
+            win_rate=f"{won / played:.0%}",
+        )
+        for name, (won, played) in frequent
+    ]
+
+
+def build_club_summary_view(
+    dashboard: club_service.ClubDashboard,
+) -> ClubSummaryView:
+    played = [m for m in dashboard.matches if m.match.games]
+    outcomes = Counter(m.outcome for m in played)
+    game_win_rate = (
+        dashboard.games_won / dashboard.games_played if dashboard.games_played else 0
+    )
+    return ClubSummaryView(
+        matches=len(played),
+        record=f"{outcomes['W']} - {outcomes['T']} - {outcomes['L']}",
+        game_win_rate=f"{game_win_rate:.0%}",
+    )
+
+
+def build_club_match_views(
+    matches: List[club_service.ClubMatch],
+) -> List[ClubMatchView]:
+    views = []
+    for m in matches:
+        played = bool(m.match.games)
+        views.append(
+            ClubMatchView(
+                url=f"http://badmintonplayer.dk/DBF/HoldTurnering/UdskrivHoldkamp/?match={m.match.id}",
+                date=m.match.date.strftime("%d %b, %Y") if m.match.date else "",
+                division=m.match.division,
+                team=m.team,
+                opponent=m.opponent,
+                score=f"{m.points} - {m.opponent_points}" if played else "",
+                outcome=m.outcome if played else "",
+                badge_class=_OUTCOME_BADGES[m.outcome] if played else "",
+            )
+        )
+    return views
+
+
+def build_team_record_views(
+    teams: List[club_service.TeamRecord],
+) -> List[TeamRecordView]:
+    return [
+        TeamRecordView(
+            division=t.division,
+            team=t.team,
+            played=t.played,
+            record=f"{t.won} - {t.tied} - {t.lost}",
+            games=f"{t.points} - {t.opponent_points}",
+        )
+        for t in teams
+    ]
+
+
+def build_performer_views(
+    performers: List[club_service.PlayerRecord],
+) -> List[PerformerView]:
+    return [
+        PerformerView(
+            id=r.player.id,
+            name=r.player.name,
+            record=f"{r.won} - {r.played - r.won}",
+            win_rate=f"{r.won / r.played:.0%}",
+        )
+        for r in performers
+    ]
+
+
+def build_tournament_views(tournaments: List[Tournament]) -> List[TournamentView]:
+    return [
+        TournamentView(
+            url=f"http://badmintonplayer.dk/DBF/Turnering/VisResultater/#{t.bp_id},",
+            host_club=t.host_club,
+            level=t.level,
+            date=t.date.strftime("%d %b, %Y"),
+        )
+        for t in tournaments or []
+    ]
+
+
+def _won_by(game: Game, winner: str, player_name: str) -> bool:
+    if winner == "home":
+        return player_name in (game.home_player1, game.home_player2)
+    return player_name in (game.away_player1, game.away_player2)
@@ -0,0 +1,47 @@
+import os
+
+from app.storage.base import Storage
+
+
+def create_storage() -> Storage:
+    """Creates the backend selected by the STORAGE_BACKEND environment variable.
+
+    `supabase` (the default) uses SUPABASE_URL and SUPABASE_KEY, while `sqlite`
+    keeps everything in the database file at SQLITE_PATH. When REPLICA_PATH is
+    set, clubs and players of the Supabase backend are replicated into a local
+    SQLite database at that path, which may be `:memory:`. When SNAPSHOT_PATH is
+    set, clubs and players are served from a snapshot file at that path, which
+    the workers of a host build in turn and share.
+    """
+    storage = _create_backend()
+    if os.getenv("SNAPSHOT_PATH"):
+        from app.storage.snapshot import SnapshotStorage
+
+        storage = SnapshotStorage(storage, os.getenv("SNAPSHOT_PATH"))
+        storage.start_refresh()
+    return storage
+
+
+def _create_backend() -> Storage:
+    backend = os.getenv("STORAGE_BACKEND", "supabase")
+
+    if backend == "supabase":
+        from app.storage.supabase_storage import SupabaseStorage
+
+        storage = SupabaseStorage(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        if os.getenv("REPLICA_PATH"):
+            from app.storage.replicated_storage import ReplicatedStorage
+            from app.storage.sqlite_storage import SqliteStorage
+
+            storage = ReplicatedStorage(
+                storage, SqliteStorage(os.getenv("REPLICA_PATH"))
+            )
+            storage.start_sync()
+        return storage
+
+    if backend == "sqlite":
+        from app.storage.sqlite_storage import SqliteStorage
+
+        return SqliteStorage(os.getenv("SQLITE_PATH", "badminton.db"))
+
+    raise ValueError(f"Unknown storage backend: {backend}")
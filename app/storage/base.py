@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.badminton_player.models import Club, Game, Player, Standing, Tournament
+from app.utils import metrics
+
+# read far more often than they are written, so they can be replicated locally
+REPLICATED_TABLES = ("clubs", "players")
+
+QUERY_SECONDS = metrics.Histogram(
+    "storage_query_seconds",
+    "Storage calls by backend and method.",
+    ["backend", "method"],
+    timing="db",
+)
+
+
+class Storage(ABC):
+    """Persistence used by the services, independent of where the data lives.
+
+    Rows passed to and returned from the game, pair and rating methods use the
+    column names of the Supabase tables, which every backend mirrors.
+    """
+
+    # players
+
+    @abstractmethod
+    def get_player(self, player_id: int) -> Optional[Player]:
+        """Returns the player including the name of their club."""
+
+    @abstractmethod
+    def get_players_for_club(self, club_id: int) -> List[Player]:
+        """Returns the players of a club ordered by name, without club names."""
+
+    @abstractmethod
+    def get_players_by_name(self, names: List[str]) -> List[Player]:
+        """Returns the players with any of the names, including club names."""
+
+    @abstractmethod
+    def search_players(self, terms: List[str]) -> List[Player]:
+        """Full text search for players whose name matches any of the terms."""
+
+    @abstractmethod
+    def upsert_player(self, player: Player) -> None:
+        """Stores the player and their club."""
+
+    # clubs
+
+    @abstractmethod
+    def get_club(self, club_id: int) -> Optional[Club]:
+        pass
+
+    @abstractmethod
+    def search_clubs(self, name: str) -> List[Club]:
+        """Returns the clubs whose name contains `name`, ignoring case."""
+
+    # standings
+
+    @abstractmethod
+    def get_standings(self, player_id: int, updated_since: datetime) -> List[Standing]:
+        """Returns the player's standings if checked at or after `updated_since`.
+
+        Standings are checked when written, and when their fingerprint is touched
+        as they were found unchanged.
+        """
+
+    @abstractmethod
+    def upsert_standings(self, player_id: int, standings: List[Standing]) -> None:
+        pass
+
+    # games
+
+    @abstractmethod
+    def get_games_for_matches(self, match_ids: List[int]) -> Dict[int, List[Game]]:
+        """Returns the stored games of each match, keyed by match id."""
+
+    @abstractmethod
+    def upsert_game(self, match_id: int, game: Game) -> Optional[int]:
+        """Stores the game and returns its id."""
+
+    def upsert_games(self, games: List[Tuple[int, Game]]) -> None:
+        """Stores many (match id, game) pairs, for backfills."""
+        for match_id, game in games:
+            self.upsert_game(match_id, game)
+
+    @abstractmethod
+    def iter_game_rows(
+        self, after_id: int = 0, page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        """Pages through the game rows in id order, starting after `after_id`."""
+
+    @abstractmethod
+    def upsert_standings_for_players(
+        self, standings: Dict[int, List[Standing]], checked: bool = True
+    ) -> None:
+        """Stores the standings of many players, keyed by player id.
+
+        Standings not `checked` against badmintonplayer.dk now, such as those
+        reparsed from the archive, are stored without an update time, so
+        `get_standings` does not serve them as fresh.
+        """
+
+    # tournaments
+
+    @abstractmethod
+    def upsert_tournaments(self, player_id: int, tournaments: List[Tournament]) -> None:
+        pass
+
+    def upsert_tournaments_for_players(
+        self, tournaments: Dict[int, List[Tournament]]
+    ) -> None:
+        """Stores the tournaments of many players, keyed by player id."""
+        for player_id, player_tournaments in tournaments.items():
+            self.upsert_tournaments(player_id, player_tournaments)
+
+    # fingerprints
+
+    @abstractmethod
+    def get_fingerprints(self, entity: str, keys: List[int]) -> Dict[int, str]:
+        """Returns the digest stored for each of the keys that has one.
+
+        Entities are named after their table, and keyed by the player or match
+        id the rows are stored under.
+        """
+
+    @abstractmethod
+    def put_fingerprints(
+        self, entity: str, digests: Dict[int, str], checked: bool = True
+    ) -> None:
+        """Stores the digests of the keys and marks them as checked now, or as
+        never checked unless `checked`."""
+
+    @abstractmethod
+    def touch_fingerprints(self, entity: str, keys: List[int]) -> None:
+        """Marks the keys as checked now, keeping their digests."""
+
+    # head-to-head index
+
+    @abstractmethod
+    def upsert_game_pairs(self, rows: List[dict]) -> None:
+        pass
+
+    @abstractmethod
+    def get_pair_games(
+        self, player_name: str, other_name: str
+    ) -> List[Tuple[str, bool, Game]]:
+        """Returns (relation, won, game) for every game of the pair, newest first."""
+
+    @abstractmethod
+    def get_pair_records(self, player_name: str, relation: str) -> List[dict]:
+        """Returns the other_name and won columns of the player's pair rows."""
+
+    # ratings
+
+    @abstractmethod
+    def get_rating_rows(self, player_names: Iterable[str]) -> List[dict]:
+        pass
+
+    @abstractmethod
+    def upsert_rating_rows(self, rows: List[dict]) -> None:
+        pass
+
+    @abstractmethod
+    def delete_ratings(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_last_rated_game_id(self) -> int:
+        pass
+
+    @abstractmethod
+    def set_last_rated_game_id(self, game_id: int) -> None:
+        pass
+
+    # replication
+
+    @abstractmethod
+    def iter_updated_rows(
+        self, table: str, updated_since: Optional[str], page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        """Pages through the raw rows of a table changed at or after `updated_since`.
+
+        Rows are ordered by `updated_at`, and every row is returned when
+        `updated_since` is None.
+        """
+
+    @abstractmethod
+    def load_rows(self, table: str, rows: List[dict]) -> None:
+        """Inserts or replaces raw rows, as returned by `iter_updated_rows`."""
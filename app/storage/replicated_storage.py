@@ -0,0 +1,180 @@
+import time
+from datetime import datetime
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.badminton_player.models import Club, Game, Player, Standing, Tournament
+from app.storage.base import REPLICATED_TABLES, Storage
+
+# how often changed clubs and players are pulled from the primary
+SYNC_INTERVAL = 60
+
+
+class ReplicatedStorage(Storage):
+    """Serves clubs and players from a local replica of the primary storage.
+
+    The replica is bulk loaded when syncing starts and then kept up to date by
+    pulling rows whose `updated_at` changed since the last sync. Upserts are
+    written to the primary and then to the replica. Until the first sync has
+    finished, and for players missing from the replica, reads go to the primary.
+    Everything else is passed through to the primary.
+    """
+
+    def __init__(self, primary: Storage, replica: Storage):
+        self.primary = primary
+        self.replica = replica
+        self.ready = Event()
+        # rows at or after these `updated_at` values are pulled by the next sync
+        self._synced_until: Dict[str, Optional[str]] = dict.fromkeys(REPLICATED_TABLES)
+        self._sync_lock = Lock()
+
+    def start_sync(self, interval: float = SYNC_INTERVAL) -> None:
+        def sync_job():
+            while True:
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"Could not sync replica: {e}")
+                time.sleep(interval)
+
+        t = Thread(target=sync_job, daemon=True)
+        t.start()
+
+    def sync(self) -> int:
+        """Pulls changed rows into the replica and returns how many were loaded."""
+        loaded = 0
+        with self._sync_lock:
+            # clubs first, so players of a new club are joined with its name
+            for table in REPLICATED_TABLES:
+                for rows in self.primary.iter_updated_rows(
+                    table, self._synced_until[table]
+                ):
+                    self.replica.load_rows(table, rows)
+                    updated = [r["updated_at"] for r in rows if r.get("updated_at")]
+                    if updated:
+                        self._synced_until[table] = max(
+                            self._synced_until[table] or "", *updated
+                        )
+                    loaded += len(rows)
+
+        if not self.ready.is_set():
+            print(f"Replica loaded with {loaded} rows")
+            self.ready.set()
+        return loaded
+
+    # players
+
+    def get_player(self, player_id: int) -> Optional[Player]:
+        player = self.replica.get_player(player_id) if self.ready.is_set() else None
+        if player:
+            return player
+
+        player = self.primary.get_player(player_id)
+        if player and self.ready.is_set():
+            self.replica.upsert_player(player)
+        return player
+
+    def get_players_for_club(self, club_id: int) -> List[Player]:
+        return self._reader().get_players_for_club(club_id)
+
+    def get_players_by_name(self, names: List[str]) -> List[Player]:
+        return self._reader().get_players_by_name(names)
+
+    def search_players(self, terms: List[str]) -> List[Player]:
+        return self._reader().search_players(terms)
+
+    def upsert_player(self, player: Player) -> None:
+        self.primary.upsert_player(player)
+        self.replica.upsert_player(player)
+
+    # clubs
+
+    def get_club(self, club_id: int) -> Optional[Club]:
+        return self._reader().get_club(club_id)
+
+    def search_clubs(self, name: str) -> List[Club]:
+        return self._reader().search_clubs(name)
+
+    def _reader(self) -> Storage:
+        return self.replica if self.ready.is_set() else self.primary
+
+    # everything below is served by the primary
+
+    def get_standings(self, player_id: int, updated_since: datetime) -> List[Standing]:
+        return self.primary.get_standings(player_id, updated_since)
+
+    def upsert_standings(self, player_id: int, standings: List[Standing]) -> None:
+        self.primary.upsert_standings(player_id, standings)
+
+    def upsert_standings_for_players(
+        self, standings: Dict[int, List[Standing]], checked: bool = True
+    ) -> None:
+        self.primary.upsert_standings_for_players(standings, checked)
+
+    def get_games_for_matches(self, match_ids: List[int]) -> Dict[int, List[Game]]:
+        return self.primary.get_games_for_matches(match_ids)
+
+    def upsert_game(self, match_id: int, game: Game) -> Optional[int]:
+        return self.primary.upsert_game(match_id, game)
+
+    def upsert_games(self, games: List[Tuple[int, Game]]) -> None:
+        self.primary.upsert_games(games)
+
+    def iter_game_rows(
+        self, after_id: int = 0, page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        return self.primary.iter_game_rows(after_id, page_size)
+
+    def upsert_tournaments(self, player_id: int, tournaments: List[Tournament]) -> None:
+        self.primary.upsert_tournaments(player_id, tournaments)
+
+    def upsert_tournaments_for_players(
+        self, tournaments: Dict[int, List[Tournament]]
+    ) -> None:
+        self.primary.upsert_tournaments_for_players(tournaments)
+
+    def get_fingerprints(self, entity: str, keys: List[int]) -> Dict[int, str]:
+        return self.primary.get_fingerprints(entity, keys)
+
+    def put_fingerprints(
+        self, entity: str, digests: Dict[int, str], checked: bool = True
+    ) -> None:
+        self.primary.put_fingerprints(entity, digests, checked)
+
+    def touch_fingerprints(self, entity: str, keys: List[int]) -> None:
+        self.primary.touch_fingerprints(entity, keys)
+
+    def upsert_game_pairs(self, rows: List[dict]) -> None:
+        self.primary.upsert_game_pairs(rows)
+
+    def get_pair_games(
+        self, player_name: str, other_name: str
+    ) -> List[Tuple[str, bool, Game]]:
+        return self.primary.get_pair_games(player_name, other_name)
+
+    def get_pair_records(self, player_name: str, relation: str) -> List[dict]:
+        return self.primary.get_pair_records(player_name, relation)
+
+    def get_rating_rows(self, player_names: Iterable[str]) -> List[dict]:
+        return self.primary.get_rating_rows(player_names)
+
+    def upsert_rating_rows(self, rows: List[dict]) -> None:
+        self.primary.upsert_rating_rows(rows)
+
+    def delete_ratings(self) -> None:
+        self.primary.delete_ratings()
+
+    def get_last_rated_game_id(self) -> int:
+        return self.primary.get_last_rated_game_id()
+
+    def set_last_rated_game_id(self, game_id: int) -> None:
+        self.primary.set_last_rated_game_id(game_id)
+
+    def iter_updated_rows(
+        self, table: str, updated_since: Optional[str], page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        return self.primary.iter_updated_rows(table, updated_since, page_size)
+
+    def load_rows(self, table: str, rows: List[dict]) -> None:
+        self.primary.load_rows(table, rows)
+        self.replica.load_rows(table, rows)
@@ -0,0 +1,429 @@
+import fcntl
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+from threading import Lock, Thread
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.badminton_player.models import Club, Game, Player, Standing, Tournament
+from app.storage.base import QUERY_SECONDS, Storage
+from app.utils import metrics
+
+# how often the snapshot is rebuilt from the storage, and how often every worker
+# checks whether it has been
+SNAPSHOT_INTERVAL = 5 * 60
+CHECK_INTERVAL = 10
+
+# sections are arrays of these typecodes, written in the host's byte order
+MAGIC = b"BPSNAP1" + sys.byteorder[0].upper().encode()
+_SECTIONS = (
+    # clubs by id, and the offsets of their names in the blob
+    ("club_ids", "q"),
+    ("club_names", "I"),
+    # players by id, with their club ids, birth dates as ordinals (0 if unknown)
+    # and the offsets of their names in the blob
+    ("player_ids", "q"),
+    ("player_clubs", "q"),
+    ("player_births", "i"),
+    ("player_names", "I"),
+    # player indices by club id and name, and by name
+    ("by_club", "I"),
+    ("by_name", "I"),
+    # the offsets of the sorted name tokens in the blob, and the indices of the
+    # players whose name has each token
+    ("tokens", "I"),
+    ("postings_start", "I"),
+    ("postings", "I"),
+    ("blob", "B"),
+)
+_HEADER = struct.Struct(f"<8s{2 * len(_SECTIONS)}Q")
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\w+", text.casefold())
+
+
+def write_snapshot(path: str, clubs: Iterable[Club], players: Iterable[Player]) -> None:
+    """Writes a snapshot of the clubs and players, replacing any at `path`.
+
+    The file is written next to `path` and renamed into place, so processes
+    that have mapped the previous snapshot keep reading it undisturbed.
+    """
+    clubs = sorted(clubs, key=lambda c: c.id)
+    players = sorted(players, key=lambda p: p.id)
+    sections = {name: array(typecode) for name, typecode in _SECTIONS}
+    blob = sections["blob"]
+
+    def add_text(offsets: array, text: str) -> None:
+        offsets.append(len(blob))
+        blob.frombytes(text.encode())
+
+    for club in clubs:
+        sections["club_ids"].append(club.id)
+        add_text(sections["club_names"], club.name or "")
+    sections["club_names"].append(len(blob))
+
+    postings = defaultdict(set)
+    for i, player in enumerate(players):
+        sections["player_ids"].append(player.id)
+        sections["player_clubs"].append(player.club_id or 0)
+        birth_date = player.birth_date
+        sections["player_births"].append(birth_date.toordinal() if birth_date else 0)
+        add_text(sections["player_names"], player.name or "")
+        for token in _tokens(player.name or ""):
+            postings[token.encode()].add(i)
+    sections["player_names"].append(len(blob))
+
+    names = [(p.name or "").encode() for p in players]
+    order = range(len(players))
+    sections["by_club"].extend(
+        sorted(order, key=lambda i: (players[i].club_id or 0, names[i]))
+    )
+    sections["by_name"].extend(sorted(order, key=lambda i: names[i]))
+
+    for token in sorted(postings):
+        sections["tokens"].append(len(blob))
+        blob.frombytes(token)
+        sections["postings_start"].append(len(sections["postings"]))
+        sections["postings"].extend(sorted(postings[token]))
+    sections["tokens"].append(len(blob))
+    sections["postings_start"].append(len(sections["postings"]))
+
+    positions, offset = [], _HEADER.size
+    for name, _ in _SECTIONS:
+        # aligned, so that every section can be cast in place
+        offset += -offset % 8
+        size = len(sections[name]) * sections[name].itemsize
+        positions.extend((offset, size))
+        offset += size
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        f.write(_HEADER.pack(MAGIC, *positions))
+        for (name, _), start in zip(_SECTIONS, positions[::2]):
+            f.write(b"\0" * (start - f.tell()))
+            sections[name].tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    # temporary files are only readable by their owner
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+def build_snapshot(storage: Storage, path: str) -> Tuple[int, int]:
+    """Snapshots the clubs and players tables and returns how many of each."""
+    clubs = [
+        Club.from_json(row)
+        for rows in storage.iter_updated_rows("clubs", None)
+        for row in rows
+    ]
+    players = [
+        Player.from_json(row)
+        for rows in storage.iter_updated_rows("players", None)
+        for row in rows
+    ]
+    write_snapshot(path, clubs, players)
+    return len(clubs), len(players)
+
+
+@metrics.instrument(QUERY_SECONDS, backend="snapshot")
+class Snapshot:
+    """Read-only player and club directory mapped from a snapshot file.
+
+    Lookups binary search the mapped arrays and only decode the rows they
+    return, so every process mapping the same file shares its pages. The
+    methods answer like the storage methods of the same names.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        magic, *positions = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot written on this platform")
+
+        for (name, typecode), start, size in zip(
+            _SECTIONS, positions[::2], positions[1::2]
+        ):
+            setattr(self, f"_{name}", view[start : start + size].cast(typecode))
+
+    def __len__(self) -> int:
+        return len(self._player_ids)
+
+    def _bytes(self, offsets: memoryview, i: int) -> bytes:
+        return bytes(self._blob[offsets[i] : offsets[i + 1]])
+
+    def _text(self, offsets: memoryview, i: int) -> str:
+        return str(self._blob[offsets[i] : offsets[i + 1]], "utf-8")
+
+    def _club_name(self, club_id: int) -> str:
+        i = bisect_left(self._club_ids, club_id)
+        if i < len(self._club_ids) and self._club_ids[i] == club_id:
+            return self._text(self._club_names, i)
+        return ""
+
+    def _player(self, i: int, with_club: bool = True) -> Player:
+        club_id, birth = self._player_clubs[i], self._player_births[i]
+        return Player(
+            id=self._player_ids[i],
+            name=self._text(self._player_names, i),
+            club_name=self._club_name(club_id) if with_club else "",
+            club_id=club_id,
+            birth_date=datetime.fromordinal(birth) if birth else None,
+        )
+
+    def get_player(self, player_id: int) -> Optional[Player]:
+        i = bisect_left(self._player_ids, player_id)
+        if i < len(self._player_ids) and self._player_ids[i] == player_id:
+            return self._player(i)
+        return None
+
+    def get_players_for_club(self, club_id: int) -> List[Player]:
+        by_club, clubs = self._by_club, self._player_clubs
+        k = bisect_left(by_club, club_id, key=lambda i: clubs[i])
+        players = []
+        while k < len(by_club) and clubs[by_club[k]] == club_id:
+            players.append(self._player(by_club[k], with_club=False))
+            k += 1
+        return players
+
+    def get_players_by_name(self, names: List[str]) -> List[Player]:
+        by_name = self._by_name
+        players = []
+        for name in set(names):
+            key = name.encode()
+            k = bisect_left(
+                by_name, key, key=lambda i: self._bytes(self._player_names, i)
+            )
+            while (
+                k < len(by_name) and self._bytes(self._player_names, by_name[k]) == key
+            ):
+                players.append(self._player(by_name[k]))
+                k += 1
+        return players
+
+    def search_players(self, terms: List[str]) -> List[Player]:
+        """Matches whole name tokens, ordered by how many of the terms match."""
+        num_tokens = len(self._tokens) - 1
+        matches = Counter()
+        for token in {t.encode() for term in terms for t in _tokens(term)}:
+            t = bisect_left(
+                range(num_tokens), token, key=lambda t: self._bytes(self._tokens, t)
+            )
+            if t < num_tokens and self._bytes(self._tokens, t) == token:
+                start, end = self._postings_start[t], self._postings_start[t + 1]
+                matches.update(self._postings[start:end])
+
+        order = sorted(
+            matches, key=lambda i: (-matches[i], self._bytes(self._player_names, i))
+        )
+        return [self._player(i) for i in order]
+
+    def get_club(self, club_id: int) -> Optional[Club]:
+        i = bisect_left(self._club_ids, club_id)
+        if i < len(self._club_ids) and self._club_ids[i] == club_id:
+            return Club(id=club_id, name=self._text(self._club_names, i))
+        return None
+
+    def search_clubs(self, name: str) -> List[Club]:
+        query = name.casefold()
+        clubs = []
+        for i, club_id in enumerate(self._club_ids):
+            club_name = self._text(self._club_names, i)
+            if query in club_name.casefold():
+                clubs.append(Club(id=club_id, name=club_name))
+        return clubs
+
+
+class SnapshotStorage(Storage):
+    """Serves clubs and players from a snapshot file shared by every worker.
+
+    The snapshot is rebuilt from the wrapped storage every SNAPSHOT_INTERVAL by
+    whichever worker takes the lock on it first, and every worker maps the new
+    file once it has been renamed into place. Until a snapshot is mapped, and
+    for players and clubs missing from it, reads go to the wrapped storage,
+    which everything else is passed through to.
+    """
+
+    def __init__(self, storage: Storage, path: str):
+        self.storage = storage
+        self.path = path
+        self.snapshot: Optional[Snapshot] = None
+        # identifies the mapped file, which is replaced rather than rewritten
+        self._mapped: Optional[Tuple[int, int]] = None
+        self._refresh_lock = Lock()
+
+    def start_refresh(
+        self,
+        interval: float = SNAPSHOT_INTERVAL,
+        check_interval: float = CHECK_INTERVAL,
+    ) -> None:
+        def refresh_job():
+            while True:
+                try:
+                    self.refresh(interval)
+                except Exception as e:
+                    print(f"Could not refresh snapshot: {e}")
+                time.sleep(check_interval)
+
+        t = Thread(target=refresh_job, daemon=True)
+        t.start()
+
+    def refresh(self, interval: float = SNAPSHOT_INTERVAL) -> None:
+        """Rebuilds the snapshot if it is older than `interval`, then maps it."""
+        with self._refresh_lock:
+            if self._age() >= interval:
+                with open(f"{self.path}.lock", "w") as lock:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # another worker is building it
+                        pass
+                    else:
+                        # it may have been built while the lock was taken
+                        if self._age() >= interval:
+                            self._build()
+
+            if not os.path.exists(self.path):
+                return
+            stat = os.stat(self.path)
+            if (stat.st_ino, stat.st_mtime_ns) != self._mapped:
+                # requests holding the previous snapshot keep their own mapping
+                self.snapshot = Snapshot(self.path)
+                self._mapped = (stat.st_ino, stat.st_mtime_ns)
+
+    def _age(self) -> float:
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return float("inf")
+
+    def _build(self) -> None:
+        start = time.perf_counter()
+        num_clubs, num_players = build_snapshot(self.storage, self.path)
+        print(
+            f"Snapshot of {num_clubs} clubs and {num_players} players built in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+
+    # players
+
+    def get_player(self, player_id: int) -> Optional[Player]:
+        snapshot = self.snapshot
+        player = snapshot.get_player(player_id) if snapshot else None
+        return player or self.storage.get_player(player_id)
+
+    def get_players_for_club(self, club_id: int) -> List[Player]:
+        return self._reader().get_players_for_club(club_id)
+
+    def get_players_by_name(self, names: List[str]) -> List[Player]:
+        return self._reader().get_players_by_name(names)
+
+    def search_players(self, terms: List[str]) -> List[Player]:
+        return self._reader().search_players(terms)
+
+    def upsert_player(self, player: Player) -> None:
+        self.storage.upsert_player(player)
+
+    # clubs
+
+    def get_club(self, club_id: int) -> Optional[Club]:
+        snapshot = self.snapshot
+        club = snapshot.get_club(club_id) if snapshot else None
+        return club or self.storage.get_club(club_id)
+
+    def search_clubs(self, name: str) -> List[Club]:
+        return self._reader().search_clubs(name)
+
+    def _reader(self):
+        return self.snapshot or self.storage
+
+    # everything below is served by the wrapped storage
+
+    def get_standings(self, player_id: int, updated_since: datetime) -> List[Standing]:
+        return self.storage.get_standings(player_id, updated_since)
+
+    def upsert_standings(self, player_id: int, standings: List[Standing]) -> None:
+        self.storage.upsert_standings(player_id, standings)
+
+    def upsert_standings_for_players(
+        self, standings: Dict[int, List[Standing]], checked: bool = True
+    ) -> None:
+        self.storage.upsert_standings_for_players(standings, checked)
+
+    def get_games_for_matches(self, match_ids: List[int]) -> Dict[int, List[Game]]:
+        return self.storage.get_games_for_matches(match_ids)
+
+    def upsert_game(self, match_id: int, game: Game) -> Optional[int]:
+        return self.storage.upsert_game(match_id, game)
+
+    def upsert_games(self, games: List[Tuple[int, Game]]) -> None:
+        self.storage.upsert_games(games)
+
+    def iter_game_rows(
+        self, after_id: int = 0, page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        return self.storage.iter_game_rows(after_id, page_size)
+
+    def upsert_tournaments(self, player_id: int, tournaments: List[Tournament]) -> None:
+        self.storage.upsert_tournaments(player_id, tournaments)
+
+    def upsert_tournaments_for_players(
+        self, tournaments: Dict[int, List[Tournament]]
+    ) -> None:
+        self.storage.upsert_tournaments_for_players(tournaments)
+
+    def get_fingerprints(self, entity: str, keys: List[int]) -> Dict[int, str]:
+        return self.storage.get_fingerprints(entity, keys)
+
+    def put_fingerprints(
+        self, entity: str, digests: Dict[int, str], checked: bool = True
+    ) -> None:
+        self.storage.put_fingerprints(entity, digests, checked)
+
+    def touch_fingerprints(self, entity: str, keys: List[int]) -> None:
+        self.storage.touch_fingerprints(entity, keys)
+
+    def upsert_game_pairs(self, rows: List[dict]) -> None:
+        self.storage.upsert_game_pairs(rows)
+
+    def get_pair_games(
+        self, player_name: str, other_name: str
+    ) -> List[Tuple[str, bool, Game]]:
+        return self.storage.get_pair_games(player_name, other_name)
+
+    def get_pair_records(self, player_name: str, relation: str) -> List[dict]:
+        return self.storage.get_pair_records(player_name, relation)
+
+    def get_rating_rows(self, player_names: Iterable[str]) -> List[dict]:
+        return self.storage.get_rating_rows(player_names)
+
+    def upsert_rating_rows(self, rows: List[dict]) -> None:
+        self.storage.upsert_rating_rows(rows)
+
+    def delete_ratings(self) -> None:
+        self.storage.delete_ratings()
+
+    def get_last_rated_game_id(self) -> int:
+        return self.storage.get_last_rated_game_id()
+
+    def set_last_rated_game_id(self, game_id: int) -> None:
+        self.storage.set_last_rated_game_id(game_id)
+
+    def iter_updated_rows(
+        self, table: str, updated_since: Optional[str], page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        return self.storage.iter_updated_rows(table, updated_since, page_size)
+
+    def load_rows(self, table: str, rows: List[dict]) -> None:
+        self.storage.load_rows(table, rows)
@@ -0,0 +1,520 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.badminton_player.models import Club, Game, Player, Standing, Tournament
+from app.storage.base import QUERY_SECONDS, REPLICATED_TABLES, Storage
+from app.utils import metrics
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS clubs (
+    bp_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    bp_id INTEGER PRIMARY KEY,
+    bp_name TEXT NOT NULL,
+    bp_club_id INTEGER,
+    birthdate TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS players_bp_club_id ON players (bp_club_id, bp_name);
+CREATE INDEX IF NOT EXISTS players_bp_name ON players (bp_name);
+CREATE INDEX IF NOT EXISTS players_updated_at ON players (updated_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5 (
+    bp_name, content = 'players', content_rowid = 'bp_id'
+);
+CREATE TRIGGER IF NOT EXISTS players_fts_insert AFTER INSERT ON players BEGIN
+    INSERT INTO players_fts (rowid, bp_name) VALUES (new.bp_id, new.bp_name);
+END;
+CREATE TRIGGER IF NOT EXISTS players_fts_delete AFTER DELETE ON players BEGIN
+    INSERT INTO players_fts (players_fts, rowid, bp_name)
+    VALUES ('delete', old.bp_id, old.bp_name);
+END;
+CREATE TRIGGER IF NOT EXISTS players_fts_update AFTER UPDATE ON players BEGIN
+    INSERT INTO players_fts (players_fts, rowid, bp_name)
+    VALUES ('delete', old.bp_id, old.bp_name);
+    INSERT INTO players_fts (rowid, bp_name) VALUES (new.bp_id, new.bp_name);
+END;
+
+CREATE TABLE IF NOT EXISTS standings (
+    bp_player_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    tier TEXT,
+    num_points INTEGER,
+    num_matches INTEGER,
+    ranking INTEGER,
+    updated_at TEXT,
+    PRIMARY KEY (bp_player_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bp_match_id INTEGER NOT NULL,
+    date TEXT,
+    category TEXT NOT NULL,
+    sets TEXT NOT NULL,
+    home_player1 TEXT,
+    home_player2 TEXT,
+    away_player1 TEXT,
+    away_player2 TEXT,
+    UNIQUE (bp_match_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS tournaments (
+    bp_id INTEGER NOT NULL,
+    bp_player_id INTEGER NOT NULL,
+    date TEXT,
+    host_club TEXT,
+    level TEXT,
+    PRIMARY KEY (bp_id, bp_player_id)
+);
+
+CREATE TABLE IF NOT EXISTS fingerprints (
+    entity TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    checked_at TEXT,
+    PRIMARY KEY (entity, key)
+);
+
+CREATE TABLE IF NOT EXISTS game_pairs (
+    player_name TEXT NOT NULL,
+    other_name TEXT NOT NULL,
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    relation TEXT NOT NULL,
+    date TEXT,
+    won INTEGER NOT NULL,
+    PRIMARY KEY (player_name, other_name, game_id)
+);
+
+CREATE TABLE IF NOT EXISTS ratings (
+    player_name TEXT NOT NULL,
+    discipline TEXT NOT NULL,
+    rating REAL NOT NULL,
+    num_games INTEGER NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (player_name, discipline)
+);
+
+CREATE TABLE IF NOT EXISTS rating_state (
+    id INTEGER PRIMARY KEY,
+    last_game_id INTEGER NOT NULL
+);
+"""
+
+_GAME_COLUMNS = (
+    "id, bp_match_id, date, category, sets, "
+    "home_player1, home_player2, away_player1, away_player2"
+)
+
+_UPSERT_GAME_SQL = (
+    "INSERT INTO games (bp_match_id, date, category, sets, home_player1, "
+    "home_player2, away_player1, away_player2) VALUES (:bp_match_id, :date, "
+    ":category, :sets, :home_player1, :home_player2, :away_player1, "
+    ":away_player2) ON CONFLICT (bp_match_id, category) DO UPDATE SET "
+    "date = excluded.date, sets = excluded.sets, "
+    "home_player1 = excluded.home_player1, home_player2 = excluded.home_player2, "
+    "away_player1 = excluded.away_player1, away_player2 = excluded.away_player2"
+)
+
+
+@metrics.instrument(QUERY_SECONDS, backend="sqlite")
+class SqliteStorage(Storage):
+    """Storage in a local SQLite database, for single node and offline use.
+
+    Every thread gets its own connection, as games and players are written from
+    background threads. `:memory:` databases are shared between the threads.
+    """
+
+    def __init__(self, path: str):
+        self.uri = path.startswith("file:")
+        if path == ":memory:":
+            path, self.uri = f"file:storage-{id(self)}?mode=memory&cache=shared", True
+        self.path = path
+        self._local = threading.local()
+        # keeps a shared in-memory database alive for as long as the storage
+        self._connection = self._connect()
+        self._connection.executescript(_SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path, uri=self.uri, isolation_level=None, timeout=10
+        )
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _query(self, sql: str, parameters=()) -> List[dict]:
+        return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def _execute_many(self, sql: str, rows: List[tuple]) -> None:
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(sql, rows)
+
+    # players
+
+    def get_player(self, player_id: int) -> Optional[Player]:
+        rows = self._query(_PLAYER_WITH_CLUB + "WHERE p.bp_id = ?", (player_id,))
+        return _player(rows[0]) if rows else None
+
+    def get_players_for_club(self, club_id: int) -> List[Player]:
+        rows = self._query(
+            "SELECT * FROM players WHERE bp_club_id = ? ORDER BY bp_name", (club_id,)
+        )
+        return [_player(row) for row in rows]
+
+    def get_players_by_name(self, names: List[str]) -> List[Player]:
+        if not names:
+            return []
+        rows = self._query(
+            _PLAYER_WITH_CLUB + f"WHERE p.bp_name IN ({_placeholders(names)})", names
+        )
+        return [_player(row) for row in rows]
+
+    def search_players(self, terms: List[str]) -> List[Player]:
+        terms = [t for t in terms if t]
+        if not terms:
+            return []
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        rows = self._query(
+            _PLAYER_WITH_CLUB
+            + "JOIN players_fts ON players_fts.rowid = p.bp_id "
+            + "WHERE players_fts MATCH ? ORDER BY players_fts.rank",
+            (match,),
+        )
+        return [_player(row) for row in rows]
+
+    def upsert_player(self, player: Player) -> None:
+        now = datetime.now().isoformat()
+        with self.connection:
+            self.connection.execute("BEGIN")
+            if player.club_id:
+                self.connection.execute(
+                    _upsert_sql("clubs", ("bp_id", "name", "updated_at")),
+                    {
+                        "bp_id": player.club_id,
+                        "name": player.club_name,
+                        "updated_at": now,
+                    },
+                )
+            self.connection.execute(
+                _upsert_sql(
+                    "players",
+                    ("bp_id", "bp_name", "bp_club_id", "birthdate", "updated_at"),
+                ),
+                {**player.to_dict(), "updated_at": now},
+            )
+
+    # clubs
+
+    def get_club(self, club_id: int) -> Optional[Club]:
+        rows = self._query("SELECT * FROM clubs WHERE bp_id = ?", (club_id,))
+        return Club.from_json(rows[0]) if rows else None
+
+    def search_clubs(self, name: str) -> List[Club]:
+        rows = self._query(
+            "SELECT * FROM clubs WHERE name LIKE ? ESCAPE '\\'",
+            ("%" + _escape_like(name) + "%",),
+        )
+        return [Club.from_json(row) for row in rows]
+
+    # standings
+
+    def get_standings(self, player_id: int, updated_since: datetime) -> List[Standing]:
+        since = updated_since.isoformat()
+        rows = self._query(
+            "SELECT * FROM standings WHERE bp_player_id = ? AND (updated_at >= ? "
+            "OR EXISTS (SELECT 1 FROM fingerprints WHERE entity = 'standings' "
+            "AND key = ? AND checked_at >= ?))",
+            (player_id, since, player_id, since),
+        )
+        return [Standing.from_json(row) for row in rows]
+
+    def upsert_standings(self, player_id: int, standings: List[Standing]) -> None:
+        self.upsert_standings_for_players({player_id: standings})
+
+    def upsert_standings_for_players(
+        self, standings: Dict[int, List[Standing]], checked: bool = True
+    ) -> None:
+        now = datetime.now().isoformat() if checked else None
+        self._execute_many(
+            "INSERT INTO standings (bp_player_id, category, tier, num_points, "
+            "num_matches, ranking, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (bp_player_id, category) DO UPDATE SET tier = excluded.tier, "
+            "num_points = excluded.num_points, num_matches = excluded.num_matches, "
+            "ranking = excluded.ranking, updated_at = excluded.updated_at",
+            [
+                (
+                    player_id,
+                    s.category,
+                    s.tier,
+                    s.num_points,
+                    s.num_matches,
+                    s.ranking,
+                    now,
+                )
+                for player_id, player_standings in standings.items()
+                for s in player_standings
+            ],
+        )
+
+    # games
+
+    def get_games_for_matches(self, match_ids: List[int]) -> Dict[int, List[Game]]:
+        games = {}
+        if not match_ids:
+            return games
+
+        rows = self._query(
+            f"SELECT {_GAME_COLUMNS} FROM games "
+            f"WHERE bp_match_id IN ({_placeholders(match_ids)})",
+            match_ids,
+        )
+        for row in rows:
+            row["sets"] = json.loads(row["sets"])
+            games.setdefault(row["bp_match_id"], []).append(Game.from_json(row))
+        return games
+
+    def upsert_game(self, match_id: int, game: Game) -> Optional[int]:
+        rows = self._query(
+            _UPSERT_GAME_SQL + " RETURNING id", _game_row(match_id, game)
+        )
+        return rows[0]["id"] if rows else None
+
+    def upsert_games(self, games: List[Tuple[int, Game]]) -> None:
+        self._execute_many(
+            _UPSERT_GAME_SQL, [_game_row(match_id, game) for match_id, game in games]
+        )
+
+    def iter_game_rows(
+        self, after_id: int = 0, page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        while True:
+            rows = self._query(
+                f"SELECT {_GAME_COLUMNS} FROM games WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, page_size),
+            )
+            if not rows:
+                return
+
+            for row in rows:
+                row["sets"] = json.loads(row["sets"])
+            yield rows
+            after_id = rows[-1]["id"]
+
+    # tournaments
+
+    def upsert_tournaments(self, player_id: int, tournaments: List[Tournament]) -> None:
+        self.upsert_tournaments_for_players({player_id: tournaments})
+
+    def upsert_tournaments_for_players(
+        self, tournaments: Dict[int, List[Tournament]]
+    ) -> None:
+        self._execute_many(
+            "INSERT INTO tournaments (bp_id, bp_player_id, date, host_club, level) "
+            "VALUES (:bp_id, :bp_player_id, :date, :host_club, :level) "
+            "ON CONFLICT (bp_id, bp_player_id) DO UPDATE SET date = excluded.date, "
+            "host_club = excluded.host_club, level = excluded.level",
+            [
+                {**t.to_dict(), "bp_player_id": player_id}
+                for player_id, player_tournaments in tournaments.items()
+                for t in player_tournaments
+            ],
+        )
+
+    # fingerprints
+
+    def get_fingerprints(self, entity: str, keys: List[int]) -> Dict[int, str]:
+        if not keys:
+            return {}
+        rows = self._query(
+            f"SELECT key, digest FROM fingerprints WHERE entity = ? "
+            f"AND key IN ({_placeholders(keys)})",
+            [entity, *keys],
+        )
+        return {row["key"]: row["digest"] for row in rows}
+
+    def put_fingerprints(
+        self, entity: str, digests: Dict[int, str], checked: bool = True
+    ) -> None:
+        now = datetime.now().isoformat() if checked else None
+        self._execute_many(
+            "INSERT INTO fingerprints (entity, key, digest, checked_at) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (entity, key) DO UPDATE SET "
+            "digest = excluded.digest, checked_at = excluded.checked_at",
+            [(entity, key, digest, now) for key, digest in digests.items()],
+        )
+
+    def touch_fingerprints(self, entity: str, keys: List[int]) -> None:
+        now = datetime.now().isoformat()
+        self._execute_many(
+            "UPDATE fingerprints SET checked_at = ? WHERE entity = ? AND key = ?",
+            [(now, entity, key) for key in keys],
+        )
+
+    # head-to-head index
+
+    def upsert_game_pairs(self, rows: List[dict]) -> None:
+        self._execute_many(
+            "INSERT INTO game_pairs (player_name, other_name, game_id, relation, "
+            "date, won) VALUES (:player_name, :other_name, :game_id, :relation, "
+            ":date, :won) ON CONFLICT (player_name, other_name, game_id) DO UPDATE "
+            "SET relation = excluded.relation, date = excluded.date, "
+            "won = excluded.won",
+            rows,
+        )
+
+    def get_pair_games(
+        self, player_name: str, other_name: str
+    ) -> List[Tuple[str, bool, Game]]:
+        columns = ", ".join(f"g.{c}" for c in _GAME_COLUMNS.split(", "))
+        rows = self._query(
+            f"SELECT p.relation AS pair_relation, p.won AS pair_won, {columns} "
+            "FROM game_pairs p JOIN games g ON g.id = p.game_id "
+            "WHERE p.player_name = ? AND p.other_name = ? ORDER BY p.date DESC",
+            (player_name, other_name),
+        )
+        pairs = []
+        for row in rows:
+            row["sets"] = json.loads(row["sets"])
+            pairs.append(
+                (row["pair_relation"], bool(row["pair_won"]), Game.from_json(row))
+            )
+        return pairs
+
+    def get_pair_records(self, player_name: str, relation: str) -> List[dict]:
+        rows = self._query(
+            "SELECT other_name, won FROM game_pairs "
+            "WHERE player_name = ? AND relation = ?",
+            (player_name, relation),
+        )
+        for row in rows:
+            row["won"] = bool(row["won"])
+        return rows
+
+    # ratings
+
+    def get_rating_rows(self, player_names: Iterable[str]) -> List[dict]:
+        player_names = list(player_names)
+        if not player_names:
+            return []
+        return self._query(
+            f"SELECT * FROM ratings WHERE player_name IN "
+            f"({_placeholders(player_names)})",
+            player_names,
+        )
+
+    def upsert_rating_rows(self, rows: List[dict]) -> None:
+        now = datetime.now().isoformat()
+        self._execute_many(
+            "INSERT INTO ratings (player_name, discipline, rating, num_games, "
+            "updated_at) VALUES (:player_name, :discipline, :rating, :num_games, "
+            ":updated_at) ON CONFLICT (player_name, discipline) DO UPDATE SET "
+            "rating = excluded.rating, num_games = excluded.num_games, "
+            "updated_at = excluded.updated_at",
+            [{**row, "updated_at": now} for row in rows],
+        )
+
+    def delete_ratings(self) -> None:
+        self.connection.execute("DELETE FROM ratings")
+
+    def get_last_rated_game_id(self) -> int:
+        rows = self._query("SELECT last_game_id FROM rating_state WHERE id = 1")
+        return rows[0]["last_game_id"] if rows else 0
+
+    def set_last_rated_game_id(self, game_id: int) -> None:
+        self.connection.execute(
+            "INSERT INTO rating_state (id, last_game_id) VALUES (1, ?) "
+            "ON CONFLICT (id) DO UPDATE SET last_game_id = excluded.last_game_id",
+            (game_id,),
+        )
+
+    # replication
+
+    def iter_updated_rows(
+        self, table: str, updated_since: Optional[str], page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        _check_replicated(table)
+        offset = 0
+        while True:
+            rows = self._query(
+                f"SELECT * FROM {table} WHERE updated_at >= ? "
+                "ORDER BY updated_at, bp_id LIMIT ? OFFSET ?",
+                (updated_since or "", page_size, offset),
+            )
+            if not rows:
+                return
+
+            yield rows
+            offset += len(rows)
+
+    def load_rows(self, table: str, rows: List[dict]) -> None:
+        _check_replicated(table)
+        columns = self._columns(table)
+        self._execute_many(
+            _upsert_sql(table, columns),
+            [{c: row.get(c) for c in columns} for row in rows],
+        )
+
+    def _columns(self, table: str) -> Tuple[str, ...]:
+        return tuple(r["name"] for r in self._query(f"PRAGMA table_info({table})"))
+
+
+_PLAYER_WITH_CLUB = (
+    "SELECT p.*, c.name AS club_name FROM players p "
+    "LEFT JOIN clubs c ON c.bp_id = p.bp_club_id "
+)
+
+
+def _player(row: dict) -> Player:
+    # mirrors the shape of a Supabase row with an embedded `clubs (name)`
+    club_name = row.pop("club_name", None)
+    if club_name is not None:
+        row["clubs"] = {"name": club_name}
+    return Player.from_json(row)
+
+
+def _placeholders(values: List) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _game_row(match_id: int, game: Game) -> dict:
+    row = game.to_dict()
+    row["bp_match_id"] = match_id
+    row["sets"] = json.dumps(row["sets"])
+    return row
+
+
+def _upsert_sql(table: str, columns: Iterable[str]) -> str:
+    # upserts rather than INSERT OR REPLACE, which would skip the FTS triggers
+    columns = list(columns)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(':' + c for c in columns)}) "
+        f"ON CONFLICT (bp_id) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in columns if c != "bp_id")
+    )
+
+
+def _check_replicated(table: str) -> None:
+    if table not in REPLICATED_TABLES:
+        raise ValueError(f"Table cannot be replicated: {table}")
@@ -0,0 +1,320 @@
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import supabase
+from supabase.lib.client_options import ClientOptions
+
+from app.badminton_player.models import Club, Game, Player, Standing, Tournament
+from app.storage.base import QUERY_SECONDS, Storage
+from app.utils import metrics, supabase_utils
+
+# values per `in` filter, which keeps the query string well below URL limits
+IN_BATCH_SIZE = 100
+# rows per upsert request
+UPSERT_BATCH_SIZE = 1000
+# the unique constraint games are upserted on, see the README
+GAMES_CONFLICT = "bp_match_id,category"
+
+
+@metrics.instrument(QUERY_SECONDS, backend="supabase")
+class SupabaseStorage(Storage):
+    def __init__(self, url: str, key: str):
+        self.client = supabase.create_client(
+            supabase_url=url,
+            supabase_key=key,
+            options=ClientOptions(postgrest_client_timeout=10000),
+        )
+
+    def get_player(self, player_id: int) -> Optional[Player]:
+        players = supabase_utils.from_resp(
+            self.client.from_("players")
+            .select("*, clubs (name)")
+            .eq("bp_id", player_id)
+            .execute(),
+            Player,
+        )
+        return players[0] if players else None
+
+    def get_players_for_club(self, club_id: int) -> List[Player]:
+        return supabase_utils.from_resp(
+            self.client.from_("players")
+            .select("*")
+            .eq("bp_club_id", club_id)
+            .order("bp_name")
+            .execute(),
+            Player,
+        )
+
+    def get_players_by_name(self, names: List[str]) -> List[Player]:
+        players = []
+        for i in range(0, len(names), IN_BATCH_SIZE):
+            players += supabase_utils.from_resp(
+                self.client.from_("players")
+                .select("*, clubs (name)")
+                .in_("bp_name", names[i : i + IN_BATCH_SIZE])
+                .execute(),
+                Player,
+            )
+        return players
+
+    def search_players(self, terms: List[str]) -> List[Player]:
+        return supabase_utils.from_resp(
+            self.client.from_("players")
+            .select("*, clubs (name)")
+            .text_search("bp_name", " | ".join(terms))
+            .execute(),
+            Player,
+        )
+
+    def upsert_player(self, player: Player) -> None:
+        # updated_at lets replicas pick up the change incrementally
+        if player.club_id:
+            self.client.from_("clubs").upsert(
+                {
+                    "bp_id": player.club_id,
+                    "name": player.club_name,
+                    "updated_at": "now()",
+                },
+                on_conflict="bp_id",
+            ).execute()
+        self.client.from_("players").upsert(
+            {**player.to_dict(), "updated_at": "now()"}, on_conflict="bp_id"
+        ).execute()
+
+    def get_club(self, club_id: int) -> Optional[Club]:
+        clubs = supabase_utils.from_resp(
+            self.client.from_("clubs").select("*").eq("bp_id", club_id).execute(), Club
+        )
+        return clubs[0] if clubs else None
+
+    def search_clubs(self, name: str) -> List[Club]:
+        return supabase_utils.from_resp(
+            self.client.from_("clubs").select("*").ilike("name", f"%{name}%").execute(),
+            Club,
+        )
+
+    def get_standings(self, player_id: int, updated_since: datetime) -> List[Standing]:
+        standings = supabase_utils.from_resp(
+            self.client.from_("standings")
+            .select("*")
+            .eq("bp_player_id", player_id)
+            .gte("updated_at", updated_since)
+            .execute(),
+            Standing,
+        )
+        if standings:
+            return standings
+
+        # unchanged standings are not rewritten, only their fingerprint is touched
+        checked = (
+            self.client.from_("fingerprints")
+            .select("key")
+            .eq("entity", "standings")
+            .eq("key", player_id)
+            .gte("checked_at", updated_since)
+            .execute()
+            .data
+        )
+        if not checked:
+            return []
+        return supabase_utils.from_resp(
+            self.client.from_("standings")
+            .select("*")
+            .eq("bp_player_id", player_id)
+            .execute(),
+            Standing,
+        )
+
+    def upsert_standings(self, player_id: int, standings: List[Standing]) -> None:
+        self.upsert_standings_for_players({player_id: standings})
+
+    def upsert_standings_for_players(
+        self, standings: Dict[int, List[Standing]], checked: bool = True
+    ) -> None:
+        rows = [
+            {**s.to_dict(player_id), "updated_at": "now()" if checked else None}
+            for player_id, player_standings in standings.items()
+            for s in player_standings
+        ]
+        self._upsert("standings", rows, on_conflict="bp_player_id,category")
+
+    def get_games_for_matches(self, match_ids: List[int]) -> Dict[int, List[Game]]:
+        games = {}
+        for i in range(0, len(match_ids), IN_BATCH_SIZE):
+            rows = (
+                self.client.from_("games")
+                .select("*")
+                .in_("bp_match_id", match_ids[i : i + IN_BATCH_SIZE])
+                .execute()
+                .data
+            )
+            for row in rows:
+                games.setdefault(row["bp_match_id"], []).append(Game.from_json(row))
+        return games
+
+    def upsert_games(self, games: List[Tuple[int, Game]]) -> None:
+        self._upsert(
+            "games",
+            [{**g.to_dict(), "bp_match_id": match_id} for match_id, g in games],
+            on_conflict=GAMES_CONFLICT,
+        )
+
+    def upsert_game(self, match_id: int, game: Game) -> Optional[int]:
+        row = game.to_dict()
+        row["bp_match_id"] = match_id
+        rows = (
+            self.client.from_("games")
+            .upsert(row, on_conflict=GAMES_CONFLICT)
+            .execute()
+            .data
+        )
+        return rows[0]["id"] if rows else None
+
+    def iter_game_rows(
+        self, after_id: int = 0, page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        return supabase_utils.iter_pages(
+            lambda: self.client.from_("games").select("*"),
+            after_id=after_id,
+            page_size=page_size,
+        )
+
+    def upsert_tournaments(self, player_id: int, tournaments: List[Tournament]) -> None:
+        self.upsert_tournaments_for_players({player_id: tournaments})
+
+    def upsert_tournaments_for_players(
+        self, tournaments: Dict[int, List[Tournament]]
+    ) -> None:
+        rows = [
+            {**t.to_dict(), "bp_player_id": player_id}
+            for player_id, player_tournaments in tournaments.items()
+            for t in player_tournaments
+        ]
+        self._upsert("tournaments", rows)
+
+    def get_fingerprints(self, entity: str, keys: List[int]) -> Dict[int, str]:
+        digests = {}
+        for i in range(0, len(keys), IN_BATCH_SIZE):
+            rows = (
+                self.client.from_("fingerprints")
+                .select("key, digest")
+                .eq("entity", entity)
+                .in_("key", keys[i : i + IN_BATCH_SIZE])
+                .execute()
+                .data
+            )
+            digests.update((row["key"], row["digest"]) for row in rows)
+        return digests
+
+    def put_fingerprints(
+        self, entity: str, digests: Dict[int, str], checked: bool = True
+    ) -> None:
+        checked_at = "now()" if checked else None
+        rows = [
+            {"entity": entity, "key": key, "digest": digest, "checked_at": checked_at}
+            for key, digest in digests.items()
+        ]
+        self._upsert("fingerprints", rows, on_conflict="entity,key")
+
+    def touch_fingerprints(self, entity: str, keys: List[int]) -> None:
+        for i in range(0, len(keys), IN_BATCH_SIZE):
+            self.client.from_("fingerprints").update({"checked_at": "now()"}).eq(
+                "entity", entity
+            ).in_("key", keys[i : i + IN_BATCH_SIZE]).execute()
+
+    def upsert_game_pairs(self, rows: List[dict]) -> None:
+        self._upsert("game_pairs", rows, on_conflict="player_name,other_name,game_id")
+
+    def get_pair_games(
+        self, player_name: str, other_name: str
+    ) -> List[Tuple[str, bool, Game]]:
+        # the games are embedded through the game_id foreign key
+        rows = (
+            self.client.from_("game_pairs")
+            .select("relation, won, games (*)")
+            .eq("player_name", player_name)
+            .eq("other_name", other_name)
+            .order("date", desc=True)
+            .execute()
+            .data
+        )
+        return [
+            (row["relation"], row["won"], Game.from_json(row["games"]))
+            for row in rows
+            if row.get("games")
+        ]
+
+    def get_pair_records(self, player_name: str, relation: str) -> List[dict]:
+        return (
+            self.client.from_("game_pairs")
+            .select("other_name, won")
+            .eq("player_name", player_name)
+            .eq("relation", relation)
+            .execute()
+            .data
+        )
+
+    def get_rating_rows(self, player_names: Iterable[str]) -> List[dict]:
+        player_names = list(player_names)
+        rows = []
+        for i in range(0, len(player_names), IN_BATCH_SIZE):
+            rows += (
+                self.client.from_("ratings")
+                .select("*")
+                .in_("player_name", player_names[i : i + IN_BATCH_SIZE])
+                .execute()
+                .data
+            )
+        return rows
+
+    def upsert_rating_rows(self, rows: List[dict]) -> None:
+        rows = [{**row, "updated_at": "now()"} for row in rows]
+        self._upsert("ratings", rows, on_conflict="player_name,discipline")
+
+    def delete_ratings(self) -> None:
+        self.client.from_("ratings").delete().neq("player_name", "").execute()
+
+    def get_last_rated_game_id(self) -> int:
+        rows = (
+            self.client.from_("rating_state")
+            .select("last_game_id")
+            .eq("id", 1)
+            .execute()
+            .data
+        )
+        return rows[0]["last_game_id"] if rows else 0
+
+    def set_last_rated_game_id(self, game_id: int) -> None:
+        self.client.from_("rating_state").upsert(
+            {"id": 1, "last_game_id": game_id}
+        ).execute()
+
+    def iter_updated_rows(
+        self, table: str, updated_since: Optional[str], page_size: int = 1000
+    ) -> Iterator[List[dict]]:
+        offset = 0
+        while True:
+            query = self.client.from_(table).select("*")
+            if updated_since:
+                query = query.gte("updated_at", updated_since)
+            rows = (
+                query.order("updated_at")
+                .order("bp_id")
+                .range(offset, offset + page_size - 1)
+                .execute()
+                .data
+            )
+            if not rows:
+                return
+
+            yield rows
+            offset += len(rows)
+
+    def load_rows(self, table: str, rows: List[dict]) -> None:
+        self._upsert(table, rows, on_conflict="bp_id")
+
+    def _upsert(self, table: str, rows: List[dict], on_conflict: str = "") -> None:
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            self.client.from_(table).upsert(
+                rows[i : i + UPSERT_BATCH_SIZE], on_conflict=on_conflict
+            ).execute()
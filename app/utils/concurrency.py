@@ -0,0 +1,76 @@
+import functools
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable
+
+from cachetools.keys import hashkey
+
+from app.utils import metrics
+
+# writes that the response does not wait for share this many threads per process
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+
+BACKGROUND_QUEUED = metrics.Gauge(
+    "background_jobs_queued", "Background jobs submitted and not yet finished."
+)
+
+_background = ThreadPoolExecutor(
+    max_workers=BACKGROUND_WORKERS, thread_name_prefix="background"
+)
+
+
+def run_in_background(fn: Callable, *args) -> Future:
+    """Runs `fn(*args)` on the process' background pool.
+
+    The pool is bounded, so a burst of writes queues up instead of starting a
+    thread and a storage connection per write. Errors are printed, as nothing
+    waits for the result.
+    """
+
+    def job():
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"Background job {fn.__name__} failed: {e}")
+        finally:
+            BACKGROUND_QUEUED.dec()
+
+    BACKGROUND_QUEUED.inc()
+    return _background.submit(job)
+
+
+def single_flight(fn: Callable) -> Callable:
+    """Lets concurrent calls with the same arguments share a single call of `fn`.
+
+    Placed under a cache decorator, a miss is computed once however many
+    requests miss at the same time, instead of each of them going upstream.
+    """
+    calls: Dict[Hashable, Future] = {}
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = hashkey(*args, **kwargs)
+        with lock:
+            future = calls.get(key)
+            leader = future is None
+            if leader:
+                future = calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with lock:
+                del calls[key]
+
+    return wrapper
@@ -0,0 +1,18 @@
+import dataclasses
+import hashlib
+import json
+from typing import Iterable
+
+
+def payload_digest(payload: str) -> str:
+    """Returns the hash of a raw upstream payload, as named in the archive."""
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def entity_digest(entities: Iterable) -> str:
+    """Returns a hash of the content of parsed models, independent of their order."""
+    # standings and games come in page order, which may change while they do not
+    rows = sorted(
+        json.dumps(dataclasses.asdict(e), sort_keys=True, default=str) for e in entities
+    )
+    return payload_digest("\n".join(rows))
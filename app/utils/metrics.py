@@ -0,0 +1,294 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# seconds, from cache lookups up to slow upstream pages
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, Any] = {}
+        self._collectors: List[Callable[[], Dict[tuple, float]]] = []
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def collect_from(self, collector: Callable[[], Dict[tuple, float]]) -> None:
+        """Adds values read at scrape time, keyed by their label values."""
+        self._collectors.append(collector)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[Tuple[str, tuple, float]]:
+        with self._lock:
+            values = dict(self._values)
+        for collector in self._collectors:
+            values.update(collector())
+        for key, value in sorted(values.items()):
+            yield "", tuple(zip(self.labelnames, key)), value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels) -> Iterator[None]:
+        """Counts the block as in flight while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Histogram of durations, optionally reported in the Server-Timing header.
+
+    Observations of histograms with a `timing` name are also added to the timings
+    of the current request under that name.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+        timing: Optional[str] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.timing = timing
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        # the last slot counts observations above every bucket
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observes how long the block takes. Also usable as a decorator."""
+        # nested blocks of the same timing, such as storage methods calling each
+        # other, are only added to the request timings once
+        active = _active_timings()
+        outermost = self.timing and self.timing not in active
+        if outermost:
+            active.add(self.timing)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed, **labels)
+            if outermost:
+                active.discard(self.timing)
+                timings = _timings.get()
+                if timings:
+                    timings.add(self.timing, elapsed)
+
+    def time_iter(self, iterable: Iterable, **labels) -> Iterator:
+        """Yields from `iterable`, observing the time spent producing items only."""
+        iterator, elapsed = iter(iterable), 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.observe(elapsed + time.perf_counter() - start, **labels)
+                return
+            elapsed += time.perf_counter() - start
+            yield item
+
+    def _samples(self) -> Iterator[Tuple[str, tuple, float]]:
+        with self._lock:
+            values = {k: (list(c), t) for k, (c, t) in self._values.items()}
+
+        for key, (counts, total) in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", labels + (("le", repr(bound)),), cumulative
+            yield "_bucket", labels + (("le", "+Inf"),), sum(counts)
+            yield "_sum", labels, total
+            yield "_count", labels, sum(counts)
+
+
+class Timings:
+    """Time spent per Server-Timing name while serving one request.
+
+    Work done for the request in pool threads is included when the work is
+    wrapped with `bind`.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[name] += seconds
+            self.counts[name] += 1
+
+    def header(self) -> str:
+        with self._lock:
+            entries = [
+                f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]}x"'
+                for name, seconds in sorted(self.durations.items())
+            ]
+        total = time.perf_counter() - self.start
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_timings: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+_local = threading.local()
+
+
+def current_timings() -> Optional[Timings]:
+    return _timings.get()
+
+
+def set_timings(timings: Optional[Timings]) -> None:
+    _timings.set(timings)
+
+
+def bind(fn: Callable) -> Callable:
+    """Wraps `fn` to record its timings on the caller's request from any thread."""
+    timings = _timings.get()
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        token = _timings.set(timings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _timings.reset(token)
+
+    return run
+
+
+def instrument(histogram: Histogram, **labels) -> Callable[[type], type]:
+    """Class decorator timing every public method in `histogram` by `method`."""
+
+    def decorate(cls: type) -> type:
+        for name, value in list(vars(cls).items()):
+            if name.startswith("_") or not callable(value):
+                continue
+            setattr(cls, name, histogram.time(method=name, **labels)(value))
+        return cls
+
+    return decorate
+
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def watch_cache(name: str, cache_info: Callable[[], Any]) -> None:
+    """Reports hits and misses of a cachetools.func cache in cache_requests_total."""
+    CACHE_REQUESTS.collect_from(
+        lambda: {
+            (name, "hit"): cache_info().hits,
+            (name, "miss"): cache_info().misses,
+        }
+    )
+
+
+def _active_timings() -> set:
+    active = getattr(_local, "active", None)
+    if active is None:
+        active = _local.active = set()
+    return active
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"]
+)
@@ -0,0 +1,105 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+import orjson
+from flask import request
+
+from app.utils import metrics
+
+# requests are profiled when they carry PROFILE_TOKEN in the X-Profile-Token
+# header or the profile_token query parameter, and at random at this rate
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# seconds between stack samples of the profiled request
+SAMPLE_INTERVAL = 0.005
+
+
+def should_profile() -> bool:
+    token = request.headers.get("X-Profile-Token") or request.args.get("profile_token")
+    if PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class RequestProfiler:
+    """Profiles the calling thread until `stop`, deterministically and by sampling.
+
+    cProfile records every call for pstats and snakeviz, while a sampler thread
+    records the thread's stack every SAMPLE_INTERVAL in the folded format read
+    by flamegraph.pl and speedscope. Work handed to pool threads only shows up as
+    time spent waiting on the pool, but is included in the request timings.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.stacks: Counter = Counter()
+        self._profile = cProfile.Profile()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+        self._stopped.set()
+        self._sampler.join()
+
+    def save(self, route: str, status: int, timings: Optional[metrics.Timings]) -> str:
+        """Writes the .prof, .folded and .json files and returns their path prefix."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "index"
+        prefix = os.path.join(PROFILE_DIR, f"{self.started_at:%Y%m%d-%H%M%S-%f}-{slug}")
+
+        self._profile.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}.folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        breakdown = {
+            "path": request.full_path,
+            "route": route,
+            "status": status,
+            "started_at": self.started_at.isoformat(),
+            "samples": sum(self.stacks.values()),
+            "timings": {},
+        }
+        if timings:
+            breakdown["elapsed_ms"] = (time.perf_counter() - timings.start) * 1000
+            breakdown["timings"] = {
+                name: {"ms": seconds * 1000, "calls": timings.counts[name]}
+                for name, seconds in timings.durations.items()
+            }
+        with open(f"{prefix}.json", "wb") as f:
+            f.write(orjson.dumps(breakdown, option=orjson.OPT_INDENT_2))
+
+        return prefix
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
@@ -0,0 +1,171 @@
+import hashlib
+from threading import Lock
+from typing import Any, Callable, Optional
+
+import orjson
+from cachetools import TTLCache
+from flask import Response, render_template, request, stream_template
+
+from app.utils import metrics
+
+# rendered pages are kept per route and device variant for a few minutes, which
+# is well below how often the upstream data changes
+CACHE_TTL = 5 * 60
+BROWSER_MAX_AGE = 60
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# (stamp, etag, body, max_age) by page key
+_pages = TTLCache(maxsize=1024, ttl=CACHE_TTL)
+_pages_lock = Lock()
+
+# emitted by templates through flush() wherever the streamed output should be sent
+# to the client before rendering continues
+_FLUSH_MARKER = "\x00flush\x00"
+
+RENDER_SECONDS = metrics.Histogram(
+    "template_render_seconds",
+    "Template rendering by template.",
+    ["template"],
+    timing="render",
+)
+
+
+def is_mobile() -> bool:
+    user_agent = request.headers.get("User-Agent", "").lower()
+    return "mobi" in user_agent or "android" in user_agent or "iphone" in user_agent
+
+
+def content_version(data: Any) -> str:
+    payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def get_cached_page(stamp: str, page_args: tuple = ()) -> Optional[Response]:
+    """Returns the cached page if it was rendered from data with the same `stamp`.
+
+    The stamp is a content version of the data a route has before building the
+    rest of the page, so a page is rendered again as soon as that data changes.
+    """
+    with _pages_lock:
+        entry = _pages.get(_page_key(page_args))
+    if not entry or entry[0] != stamp:
+        metrics.CACHE_REQUESTS.inc(cache="pages", result="miss")
+        return None
+
+    metrics.CACHE_REQUESTS.inc(cache="pages", result="hit")
+
+    _, etag, body, max_age = entry
+    return _respond(etag, body, max_age)
+
+
+def render_cached_page(
+    template_name: str,
+    version: str,
+    max_age: int = BROWSER_MAX_AGE,
+    stamp: Optional[str] = None,
+    page_args: tuple = (),
+    **context,
+) -> Response:
+    """Renders a page unless the cached one has the same `version`.
+
+    `page_args` are the query arguments the page depends on, and `stamp` is
+    what get_cached_page compares, which defaults to the version.
+    """
+    key = _page_key(page_args)
+    etag = _etag(key, version)
+
+    if etag in request.if_none_match:
+        # the client already holds this exact page, so skip rendering entirely
+        return _respond(etag, "", max_age)
+
+    with _pages_lock:
+        entry = _pages.get(key)
+    if entry and entry[1] == etag:
+        return _respond(etag, entry[2], max_age)
+
+    with RENDER_SECONDS.time(template=template_name):
+        body = render_template(
+            template_name, is_mobile=key[1] == "mobile", flush=lambda: "", **context
+        )
+    with _pages_lock:
+        _pages[key] = (stamp or version, etag, body, max_age)
+
+    return _respond(etag, body, max_age)
+
+
+def stream_cached_page(
+    template_name: str,
+    stamp: str,
+    version: Callable[[], str],
+    page_args: tuple = (),
+    **context,
+) -> Response:
+    """Streams a page and caches it once rendering completes.
+
+    The ETag cannot be known before the data is fully resolved, so streamed
+    responses are sent without one. `version` is called after the last chunk
+    has been rendered and the full page is stored for later requests under
+    `stamp`.
+    """
+    key = _page_key(page_args)
+    chunks = stream_template(
+        template_name,
+        is_mobile=key[1] == "mobile",
+        flush=lambda: _FLUSH_MARKER,
+        **context,
+    )
+
+    def generate():
+        body, pending = [], []
+        for chunk in chunks:
+            if _FLUSH_MARKER not in chunk:
+                pending.append(chunk)
+                continue
+
+            pending.append(chunk.replace(_FLUSH_MARKER, ""))
+            data = "".join(pending)
+            body.append(data)
+            pending = []
+            if data:
+                yield data
+
+        data = "".join(pending)
+        body.append(data)
+        if data:
+            yield data
+
+        with _pages_lock:
+            _pages[key] = (
+                stamp,
+                _etag(key, version()),
+                "".join(body),
+                BROWSER_MAX_AGE,
+            )
+
+    response = Response(generate(), mimetype="text/html")
+    response.cache_control.public = True
+    response.cache_control.max_age = BROWSER_MAX_AGE
+    response.vary.add("User-Agent")
+    return response
+
+
+def _etag(key: tuple, version: str) -> str:
+    return hashlib.blake2b(f"{key}:{version}".encode(), digest_size=16).hexdigest()
+
+
+def _page_key(page_args: tuple) -> tuple:
+    # only the arguments a page reads are part of the key, so arbitrary query
+    # strings neither miss the cache nor fill it
+    variant = "mobile" if is_mobile() else "desktop"
+    return request.path, variant, *page_args
+
+
+def _respond(etag: str, body: str, max_age: int) -> Response:
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if max_age >= IMMUTABLE_MAX_AGE:
+        response.cache_control.immutable = True
+    response.vary.add("User-Agent")
+    return response.make_conditional(request)
@@ -1,24 +1,128 @@
-from dataclasses import fields, is_dataclass
+import types
+import typing
+from dataclasses import MISSING, fields, is_dataclass
+from datetime import datetime
+from functools import lru_cache
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
 
-from postgrest import APIResponse
+if TYPE_CHECKING:
+    from postgrest import APIResponse
 
+Decoder = Callable[[dict], Any]
 
-def from_resp(resp: APIResponse, cls) -> list:
+_decoders: Dict[type, Decoder] = {}
+_decoders_lock = Lock()
+
+
+def from_resp(resp: "APIResponse", cls) -> list:
     rows = resp.data
     if not rows:
         return []
-    if len(rows) == 1:
-        return [_to_class(rows[0], cls)]
-    return [_to_class(row, cls) for row in rows]
+    if not is_dataclass(cls):
+        return [None] * len(rows)
+
+    decode = decoder_for(cls)
+    return [decode(row) if row else None for row in rows]
+
+
+def decoder_for(cls) -> Decoder:
+    """Returns the row decoder of a dataclass, compiling it on first use.
+
+    Fields are read from the column named by their `column` metadata, which may
+    be a dotted path into an embedded resource such as `clubs.name`, and can be
+    converted with a `decode` callable. Datetime and nested dataclass fields are
+    decoded automatically.
+    """
+    decode = _decoders.get(cls)
+    if decode is None:
+        # compiled outside the lock, as nested dataclass fields compile their own
+        # decoders, and a class compiled by two threads at once is kept once
+        decode = _compile_decoder(cls)
+        with _decoders_lock:
+            decode = _decoders.setdefault(cls, decode)
+    return decode
 
 
-def _to_class(obj: dict, cls):
-    if not obj or not is_dataclass(cls):
+@lru_cache(maxsize=8192)
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    # rows of the same match or season share timestamps, so most parses are hits
+    if not value:
         return None
-    if hasattr(cls, "from_json"):
-        return cls.from_json(obj)
+    return datetime.fromisoformat(value)
+
+
+def iter_pages(
+    select: Callable[[], Any], after_id: int = 0, page_size: int = 1000
+) -> Iterator[List[dict]]:
+    """Pages through a table in id order, starting after `after_id`.
+
+    `select` returns a fresh query for every page. Paging on the primary key
+    keeps every page an index range scan, unlike offsets.
+    """
+    while True:
+        rows = select().gt("id", after_id).order("id").limit(page_size).execute().data
+        if not rows:
+            return
+
+        yield rows
+        after_id = rows[-1]["id"]
+
+
+def _compile_decoder(cls) -> Decoder:
+    # generates `def decode(row): return cls(a=row["a"], ...)` once per class, so
+    # decoding a row does no reflection over the dataclass fields
+    hints = typing.get_type_hints(cls)
+    namespace = {"cls": cls, "parse_datetime": parse_datetime}
+    arguments = []
+
     for field in fields(cls):
-        if is_dataclass(field.type):
-            obj[field.name] = _to_class(obj[field.name], field.type)
-    obj = {key: value for key, value in obj.items() if key in fields(cls)}
-    return cls(**obj)
+        if not field.init:
+            continue
+
+        field_type, optional = _unwrap_optional(hints[field.name])
+        default = field.metadata.get("default", field.default)
+        if default is MISSING and optional:
+            default = None
+
+        column = field.metadata.get("column", field.name)
+        namespace[f"default_{field.name}"] = default
+        source = _column_source(column, f"default_{field.name}", default is MISSING)
+
+        if "decode" in field.metadata:
+            namespace[f"decode_{field.name}"] = field.metadata["decode"]
+            source = f"decode_{field.name}({source})"
+        elif field_type is datetime:
+            source = f"parse_datetime({source})"
+        elif is_dataclass(field_type):
+            namespace[f"decode_{field.name}"] = decoder_for(field_type)
+            source = f"(decode_{field.name}(value) if (value := {source}) else None)"
+
+        arguments.append(f"{field.name}={source}")
+
+    code = f"def decode(row):\n    return cls({', '.join(arguments)})\n"
+    exec(code, namespace)
+    return namespace["decode"]
+
+
+def _column_source(column: str, default_name: str, required: bool) -> str:
+    first, *rest = column.split(".")
+    if not rest:
+        return f"row[{first!r}]" if required else f"row.get({first!r}, {default_name})"
+
+    source = f"row.get({first!r})"
+    for key in rest:
+        # embedded resources are null when the join finds no row
+        source = f"({source} or {{}}).get({key!r}, {default_name})"
+    return source
+
+
+def _unwrap_optional(hint) -> tuple:
+    args = typing.get_args(hint)
+    if (
+        typing.get_origin(hint) in (typing.Union, types.UnionType)
+        and type(None) in args
+    ):
+        rest = [a for a in args if a is not type(None)]
+        return (rest[0] if len(rest) == 1 else hint), True
+    return hint, False
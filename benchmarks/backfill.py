@@ -0,0 +1,54 @@
+"""Reparses an archive of synthetic match pages with one and with all cores.
+
+The first run writes the games, and the runs after it find them unchanged.
+
+    python -m benchmarks.backfill
+"""
+
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# writes go to an in-memory database
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+
+from app.badminton_player.api import Client  # noqa: E402
+from app.badminton_player.archive import Archive  # noqa: E402
+from app.services import backfill_service  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+
+NUM_MATCHES = 2_000
+
+
+def populate(archive: Archive) -> None:
+    rnd = random.Random(0)
+    start = datetime(2023, 9, 2, 10)
+    player = synthetic.make_player()
+    for match_id in range(1, NUM_MATCHES + 1):
+        match = synthetic.make_match(
+            rnd, match_id, start + timedelta(days=match_id % 200), player
+        )
+        archive.put(Client.MATCH, match_id, synthetic.make_match_html(match))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        archive = Archive(root)
+        populate(archive)
+
+        # the games are written by the first run, so later runs only parse them
+        for workers in [1, *sorted({1, os.cpu_count()})]:
+            report = backfill_service.backfill(archive, workers=workers)
+            print(
+                f"{workers} workers: {report.parsed} matches, {report.games} games "
+                f"written, {report.unchanged} matches unchanged "
+                f"in {report.elapsed:.2f}s ({report.payloads_per_second:.0f}/s), "
+                f"{len(report.failures)} failures"
+            )
+
+
+if __name__ == "__main__":
+    main()
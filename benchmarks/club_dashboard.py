@@ -0,0 +1,121 @@
+"""Builds the club dashboard against simulated Supabase and upstream latency.
+
+Compares the batched pipeline with resolving every player's profile on its own,
+which is what rendering the dashboard from N profile builds would cost.
+
+    python -m benchmarks.club_dashboard
+"""
+
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# runs offline against an empty in-memory database
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+
+from app.badminton_player.models import MatchMeta, PlayerPerformance  # noqa: E402
+from app.services import club_service, player_service, storage  # noqa: E402
+from app.storage import supabase_storage  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+
+# round trips to Supabase and badmintonplayer.dk, respectively
+QUERY_LATENCY = 0.005
+FETCH_LATENCY = 0.05
+
+NUM_PLAYERS = 40
+NUM_MATCHES = 80
+MATCHES_PER_PLAYER = 16
+
+
+def setup(stored_ratio: float = 0.8):
+    rnd = random.Random(0)
+    players = [synthetic.make_player(i) for i in range(1, NUM_PLAYERS + 1)]
+    start = datetime(2023, 9, 1)
+    matches = {
+        1000
+        + i: synthetic.make_match(
+            rnd, 1000 + i, start + timedelta(days=3 * i), rnd.choice(players)
+        )
+        for i in range(NUM_MATCHES)
+    }
+    metas = {
+        m.id: MatchMeta(m.id, 0, m.date, m.division, m.home_team, m.away_team)
+        for m in matches.values()
+    }
+    performances = {
+        p.id: PlayerPerformance(
+            0, [], rnd.sample(list(metas.values()), MATCHES_PER_PLAYER), []
+        )
+        for p in players
+    }
+    stored = set(rnd.sample(list(matches), int(NUM_MATCHES * stored_ratio)))
+    calls = {"queries": 0, "fetches": 0}
+
+    def find_stored_games(match_ids):
+        calls["queries"] += -(-len(match_ids) // supabase_storage.IN_BATCH_SIZE)
+        time.sleep(QUERY_LATENCY)
+        return {i: list(matches[i].games) for i in match_ids if i in stored}
+
+    def fetch_team_match(match_id):
+        calls["fetches"] += 1
+        time.sleep(FETCH_LATENCY)
+        return matches[match_id]
+
+    def get_performance(player_id):
+        time.sleep(QUERY_LATENCY)
+        return performances[player_id]
+
+    club_service.get_club = lambda club_id: club_service.Club(club_id, "Benchmark")
+    player_service.get_players_for_club = lambda club_id: players
+    storage.get_games_for_matches = find_stored_games
+    player_service._fetch_team_match = fetch_team_match
+    player_service._try_fetch_team_match = fetch_team_match
+    club_service._try_get_performance = get_performance
+
+    return players, performances, calls
+
+
+def naive(players, performances):
+    # one games query per match of every player, with no sharing between teammates
+    for p in players:
+        for meta in performances[p.id].match_metadata:
+            games = storage.get_games_for_matches([meta.id]).get(meta.id)
+            if not games:
+                player_service._fetch_team_match(meta.id)
+
+
+def main():
+    players, performances, calls = setup()
+
+    start = time.perf_counter()
+    naive(players, performances)
+    print(
+        f"per-player profiles: {time.perf_counter() - start:.2f}s, "
+        f"{calls['queries']} queries, {calls['fetches']} fetches"
+    )
+
+    calls.update(queries=0, fetches=0)
+    start = time.perf_counter()
+    dashboard = club_service.build_club_dashboard(1)
+    print(
+        f"batched dashboard:   {time.perf_counter() - start:.2f}s, "
+        f"{calls['queries']} queries, {calls['fetches']} fetches, "
+        f"{len(dashboard.matches)} matches"
+    )
+
+    # the first read only lists the players while the dashboard is built
+    start = time.perf_counter()
+    club_service.get_club_dashboard(1)
+    print(f"first read:          {(time.perf_counter() - start) * 1000:.3f} ms")
+    while not club_service.get_club_dashboard(1).complete:
+        time.sleep(0.1)
+
+    start = time.perf_counter()
+    club_service.get_club_dashboard(1)
+    print(f"materialized read:   {(time.perf_counter() - start) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
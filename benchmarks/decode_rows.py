@@ -0,0 +1,108 @@
+"""Decodes Supabase rows into models, as from_resp does for list queries.
+
+The reference decoders are the per-row strptime implementations that the
+compiled decoders replaced.
+
+    python -m benchmarks.decode_rows
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.badminton_player.models import Game, Player, Set
+from app.utils import supabase_utils
+
+
+def player_rows(n: int) -> list:
+    rnd = random.Random(0)
+    return [
+        {
+            "bp_id": i,
+            "bp_name": f"Player {i}",
+            "bp_club_id": 1,
+            "birthdate": f"{rnd.randint(1950, 2015)}-{rnd.randint(1, 12):02}-"
+            f"{rnd.randint(1, 28):02}T00:00:00+00:00",
+            "clubs": {"name": "Benchmark Club"},
+        }
+        for i in range(n)
+    ]
+
+
+def game_rows(n: int) -> list:
+    rnd = random.Random(0)
+    start = datetime(2023, 9, 1)
+    rows = []
+    for i in range(n):
+        # eight games per team match share its timestamp
+        date = start + timedelta(days=i // 8 // 4, hours=i // 8 % 4)
+        rows.append(
+            {
+                "id": i,
+                "bp_match_id": i // 8,
+                "date": date.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+                "category": rnd.choice(["1. HS", "2. DS", "1. MD", "1. HD"]),
+                "sets": [
+                    {"number": s, "home_points": 21, "away_points": rnd.randint(0, 19)}
+                    for s in range(1, 3)
+                ],
+                "home_player1": f"Player {rnd.randint(0, 500)}",
+                "home_player2": None,
+                "away_player1": f"Player {rnd.randint(0, 500)}",
+                "away_player2": None,
+            }
+        )
+    return rows
+
+
+def reference_player(d: dict) -> Player:
+    return Player(
+        id=d["bp_id"],
+        name=d["bp_name"],
+        club_name=d["clubs"]["name"] if "clubs" in d else "",
+        club_id=d["bp_club_id"],
+        birth_date=datetime.strptime(d["birthdate"], "%Y-%m-%dT%H:%M:%S%z"),
+    )
+
+
+def reference_game(d: dict) -> Game:
+    return Game(
+        category=d["category"],
+        date=datetime.strptime(d["date"], "%Y-%m-%dT%H:%M:%S%z"),
+        sets=[
+            Set.of(s["number"], s["home_points"], s["away_points"]) for s in d["sets"]
+        ],
+        home_player1=d["home_player1"] if "home_player1" in d else None,
+        home_player2=d["home_player2"] if "home_player2" in d else None,
+        away_player1=d["away_player1"] if "away_player1" in d else None,
+        away_player2=d["away_player2"] if "away_player2" in d else None,
+    )
+
+
+def bench(decode, rows, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        supabase_utils.parse_datetime.cache_clear()
+        start = time.perf_counter()
+        for row in rows:
+            decode(row)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    cases = [
+        ("players", player_rows(5_000), reference_player, Player),
+        ("games", game_rows(50_000), reference_game, Game),
+    ]
+    for label, rows, reference, cls in cases:
+        before = bench(reference, rows)
+        after = bench(supabase_utils.decoder_for(cls), rows)
+        print(
+            f"{label:>8} ({len(rows)} rows): strptime {before * 1000:.1f} ms, "
+            f"compiled {after * 1000:.1f} ms ({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Serves the badmintonplayer.dk endpoints that Client uses, for load tests.
+
+Payloads come from an archive when one is given and the key was recorded, and
+are otherwise generated for a synthetic population of players, whose profiles
+cycle through the small, medium and extreme sizes. Every response is delayed
+by --latency plus up to --jitter seconds, and fails with a 500 at --error-rate.
+Point the app at it with UPSTREAM_BASE_URL=http://127.0.0.1:<port>. GET
+/_requests returns how many requests it has been sent.
+
+    python -m benchmarks.fake_upstream --port 8100 --latency 0.05
+"""
+
+import argparse
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from flask import Flask, Response, abort, request
+
+from app.badminton_player.api import Client
+from app.badminton_player.archive import Archive
+from benchmarks import synthetic
+
+NUM_PLAYERS = 500
+PLAYERS_PER_CLUB = 25
+
+# one in ten profiles is extreme and three are medium
+PROFILE_SIZES = [60, 20, 20, 20, 5, 5, 5, 5, 5, 5]
+
+
+def num_matches(player_id: int) -> int:
+    return PROFILE_SIZES[player_id % len(PROFILE_SIZES)]
+
+
+def create_fake_upstream(
+    archive: Optional[Archive] = None,
+    num_players: int = NUM_PLAYERS,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+) -> Flask:
+    app = Flask(__name__)
+    population = {
+        p.id: p for p in synthetic.make_population(num_players, PLAYERS_PER_CLUB)
+    }
+
+    @lru_cache(maxsize=None)
+    def profile(player_id: int) -> str:
+        player = population[player_id]
+        return synthetic.make_profile_json(num_matches(player_id), player_id, player)
+
+    @lru_cache(maxsize=None)
+    def matches(player_id: int) -> dict:
+        player = population[player_id]
+        return {
+            m.id: synthetic.make_match_html(m)
+            for m in synthetic.make_matches(num_matches(player_id), player_id, player)
+        }
+
+    def recorded(endpoint: str, key) -> Optional[str]:
+        return archive.get(endpoint, key) if archive else None
+
+    served, served_lock = [0], threading.Lock()
+
+    @app.before_request
+    def delay_or_fail():
+        if request.path == "/_requests":
+            return
+        with served_lock:
+            served[0] += 1
+        time.sleep(latency + random.uniform(0, jitter))
+        if random.random() < error_rate:
+            abort(500)
+
+    @app.route("/_requests", methods=["GET"])
+    def requests_served():
+        return str(served[0])
+
+    @app.route("/", methods=["GET"])
+    def index():
+        return "<script>var SR_CallbackContext = 'fake-context';</script>"
+
+    @app.route(
+        "/SportsResults/Components/WebService1.asmx/GetPlayerProfile",
+        methods=["POST"],
+    )
+    def get_player_profile():
+        player_id = int(request.json["playerid"])
+        payload = recorded(Client.PLAYER_PROFILE, player_id)
+        if payload is None and player_id in population:
+            payload = profile(player_id)
+        if payload is None:
+            abort(404)
+        return Response(payload, mimetype="application/json")
+
+    @app.route(
+        "/SportsResults/Components/WebService1.asmx/SearchPlayer", methods=["POST"]
+    )
+    def search_player():
+        name = request.json["name"]
+        payload = recorded(Client.SEARCH_PLAYER, name)
+        if payload is None:
+            query = name.lower()
+            found = [p for p in population.values() if query in p.name.lower()]
+            payload = synthetic.make_search_json(found[:100])
+        return Response(payload, mimetype="application/json")
+
+    @app.route("/DBF/HoldTurnering/UdskrivHoldkamp/", methods=["GET"])
+    def match_page():
+        match_id = request.args.get("match", type=int)
+        page = recorded(Client.MATCH, match_id)
+        if page is None and match_id // 1000 in population:
+            page = matches(match_id // 1000).get(match_id)
+        if page is None:
+            abort(404)
+        return page
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--archive", help="Serve recorded payloads from here first.")
+    parser.add_argument("--players", type=int, default=NUM_PLAYERS)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_fake_upstream(
+        archive=Archive(args.archive) if args.archive else None,
+        num_players=args.players,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    app.run(port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Upstream payload fixtures for the benchmark suite.
+
+Every fixture set is an archive holding one player profile, the pages of the
+matches it lists and a player search, under benchmarks/fixtures/<name>. Sets
+are either synthetic, with the small, medium and extreme profile sizes, or
+recorded from an archive filled in production through UPSTREAM_ARCHIVE_PATH.
+Recorded sets hold real names and are not committed.
+
+    python -m benchmarks.fixtures synthetic
+    python -m benchmarks.fixtures record <archive> <player id> <search> <name>
+"""
+
+import argparse
+import os
+import shutil
+from typing import Dict
+
+from app.badminton_player.api import Client
+from app.badminton_player.archive import Archive
+from benchmarks import synthetic
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+SIZES = {"small": 5, "medium": 20, "extreme": 60}
+
+
+class FixtureSet:
+    def __init__(self, name: str, archive: Archive):
+        self.name = name
+        self.archive = archive
+        self.client = Client(archive=archive, replay=True)
+        self.player_id = int(self._first_key(Client.PLAYER_PROFILE))
+        self.search = self._first_key(Client.SEARCH_PLAYER)
+        self.match_ids = sorted(
+            {int(key) for _, key, _, _ in archive.iter_index(Client.MATCH)}
+        )
+
+    def _first_key(self, endpoint: str) -> str:
+        for _, key, _, _ in self.archive.iter_index(endpoint):
+            return key
+        raise ValueError(f"Fixture set {self.name} has no {endpoint} payload")
+
+
+def write_synthetic(root: str, num_matches: int) -> None:
+    archive = Archive(root)
+    player = synthetic.make_player()
+    archive.put(
+        Client.PLAYER_PROFILE, player.id, synthetic.make_profile_json(num_matches)
+    )
+    for match in synthetic.make_matches(num_matches):
+        archive.put(Client.MATCH, match.id, synthetic.make_match_html(match))
+
+    players = [synthetic.make_player(i) for i in range(1, 26)]
+    archive.put(Client.SEARCH_PLAYER, "Player", synthetic.make_search_json(players))
+
+
+def record(source: Archive, root: str, player_id: int, search: str) -> None:
+    """Copies a player's latest profile, its matches and a search into a set."""
+    profile = source.get(Client.PLAYER_PROFILE, player_id)
+    if profile is None:
+        raise ValueError(f"No profile of player {player_id} in {source.root}")
+    search_payload = source.get(Client.SEARCH_PLAYER, search)
+    if search_payload is None:
+        raise ValueError(f"No search for {search!r} in {source.root}")
+
+    archive = Archive(root)
+    archive.put(Client.PLAYER_PROFILE, player_id, profile)
+    archive.put(Client.SEARCH_PLAYER, search, search_payload)
+
+    performance = Client().parse_performance(profile)
+    for meta in performance.match_metadata:
+        page = source.get(Client.MATCH, meta.id)
+        if page is None:
+            print(f"Match {meta.id} is not archived and is left out")
+            continue
+        archive.put(Client.MATCH, meta.id, page)
+
+
+def load(root: str = FIXTURES_DIR) -> Dict[str, FixtureSet]:
+    """Returns every fixture set under `root`, writing the synthetic ones if none."""
+    if not os.path.isdir(root) or not os.listdir(root):
+        for name, num_matches in SIZES.items():
+            write_synthetic(os.path.join(root, name), num_matches)
+
+    return {
+        name: FixtureSet(name, Archive(os.path.join(root, name)))
+        for name in sorted(os.listdir(root))
+        if os.path.isdir(os.path.join(root, name))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("synthetic", help="(Re)write the synthetic sets.")
+    recorder = commands.add_parser("record", help="Record a set from an archive.")
+    recorder.add_argument("archive")
+    recorder.add_argument("player_id", type=int)
+    recorder.add_argument("search")
+    recorder.add_argument("name")
+    args = parser.parse_args()
+
+    if args.command == "synthetic":
+        for name, num_matches in SIZES.items():
+            root = os.path.join(FIXTURES_DIR, name)
+            shutil.rmtree(root, ignore_errors=True)
+            write_synthetic(root, num_matches)
+            print(f"Wrote {name} ({num_matches} matches) to {root}")
+    else:
+        root = os.path.join(FIXTURES_DIR, args.name)
+        shutil.rmtree(root, ignore_errors=True)
+        record(Archive(args.archive), root, args.player_id, args.search)
+        print(f"Recorded player {args.player_id} to {root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Simulates a week of profile views under the flat and the adaptive cache TTL.
+
+Players have a team match every one to three weeks, and some have no matches
+left this season. Every player is viewed at random, and three times as often
+on match days. Reports how many performances each policy fetches from
+badmintonplayer.dk, and how stale the cached performance was when viewed
+around a match, when freshness matters.
+
+    python -m benchmarks.freshness --players 500
+"""
+
+import argparse
+import random
+import statistics
+from datetime import datetime, timedelta
+
+from app.badminton_player import freshness
+from app.badminton_player.models import MatchMeta, PlayerPerformance
+
+START = datetime(2024, 1, 15)
+DAYS = 7
+STEP = timedelta(minutes=5)
+# views per player per hour, outside and around matches
+VIEW_RATE = 0.1
+ACTIVE_VIEW_RATE = 0.3
+
+
+def make_performance(rnd: random.Random) -> PlayerPerformance:
+    metas = []
+    if rnd.random() < 0.8:
+        interval = timedelta(days=rnd.randint(7, 21))
+        date = START - timedelta(days=60) + timedelta(hours=rnd.randint(0, 24 * 21))
+        for i in range(12):
+            metas.append(MatchMeta(i, i, date, "Division", "Home", "Away"))
+            date += interval
+    return PlayerPerformance(0, [], metas, [])
+
+
+def simulate(performances, ttl) -> tuple:
+    rnd = random.Random(1)
+    expires, fetched_at = {}, {}
+    fetches, staleness = 0, []
+    now = START
+    while now < START + timedelta(days=DAYS):
+        for player_id, performance in enumerate(performances):
+            active = freshness.activity(performance, now) == freshness.ACTIVE
+            rate = ACTIVE_VIEW_RATE if active else VIEW_RATE
+            if rnd.random() >= rate * STEP.total_seconds() / 3600:
+                continue
+
+            if expires.get(player_id, now) <= now:
+                fetches += 1
+                fetched_at[player_id] = now
+                expires[player_id] = now + timedelta(seconds=ttl(performance, now))
+            if active:
+                staleness.append((now - fetched_at[player_id]).total_seconds())
+        now += STEP
+    return fetches, staleness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=500)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    performances = [make_performance(rnd) for _ in range(args.players)]
+
+    policies = {
+        "flat 1h": lambda performance, now: 3600,
+        "adaptive": freshness.performance_ttl,
+    }
+    for name, ttl in policies.items():
+        fetches, staleness = simulate(performances, ttl)
+        print(
+            f"{name:<9} {fetches:>7} fetches, around matches stale by "
+            f"{statistics.mean(staleness) / 60:.1f} min on average, "
+            f"{max(staleness) / 60:.0f} min at most"
+        )
+
+
+if __name__ == "__main__":
+    main()
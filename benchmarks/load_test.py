@@ -0,0 +1,246 @@
+"""Drives /player, /search and /club at a target rate against fake backends.
+
+Starts benchmarks.fake_upstream in place of badmintonplayer.dk and the app
+under gunicorn with gunicorn.conf.py, against a SQLite database seeded with the
+fake upstream's players and clubs, which stands in for Supabase. Requests are
+sent open loop, so latencies are measured from when each request was due and
+include any queueing. Upstream calls are counted by the fake upstream, and per
+route from the app's /metrics when there is a single worker, as every worker
+process keeps its own metrics.
+
+    python -m benchmarks.load_test --rps 20 --duration 30 --latency 0.05
+    python -m benchmarks.load_test --rps 40 --workers 4 --threads 8
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import requests
+
+from app.storage.sqlite_storage import SqliteStorage
+from benchmarks import fake_upstream, synthetic
+
+# relative share of requests per route, keyed by the route as /metrics labels it
+ROUTE_WEIGHTS = {
+    "/player/<player_id>": 6,
+    "/search": 3,
+    "/club/<club_id>": 1,
+}
+
+
+def seed(path: str, num_players: int) -> None:
+    storage = SqliteStorage(path)
+    players = synthetic.make_population(num_players, fake_upstream.PLAYERS_PER_CLUB)
+    clubs = {p.club_id: p.club_name for p in players}
+    storage.load_rows(
+        "clubs", [{"bp_id": club_id, "name": name} for club_id, name in clubs.items()]
+    )
+    for player in players:
+        storage.upsert_player(player)
+
+
+def start(args: List[str], env: dict, url: str) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, *args],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # gunicorn accepts connections before its workers have imported the app
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{' '.join(args)} did not start")
+
+
+def make_path(route: str, rnd: random.Random, num_players: int) -> str:
+    if route == "/player/<player_id>":
+        return f"/player/{rnd.randint(1, num_players)}"
+    if route == "/search":
+        return f"/search?q=Player+{rnd.randint(1, num_players)}"
+    num_clubs = (num_players - 1) // fake_upstream.PLAYERS_PER_CLUB + 1
+    return f"/club/{rnd.randint(1, num_clubs)}"
+
+
+def upstream_requests(upstream_url: str) -> int:
+    return int(requests.get(f"{upstream_url}/_requests", timeout=10).text)
+
+
+def upstream_calls(app_url: str) -> Dict[str, Tuple[float, float]]:
+    """Returns (sum, count) of http_request_upstream_calls by route."""
+    text = requests.get(f"{app_url}/metrics", timeout=10).text
+    calls = defaultdict(lambda: [0.0, 0.0])
+    pattern = r'^http_request_upstream_calls_(sum|count)\{route="([^"]*)"\} (\S+)$'
+    for kind, route, value in re.findall(pattern, text, re.MULTILINE):
+        calls[route][kind == "count"] = float(value)
+    return {route: tuple(v) for route, v in calls.items()}
+
+
+def run_load(
+    app_url: str,
+    rps: float,
+    duration: float,
+    num_players: int,
+    concurrency: int,
+    routes: List[str],
+) -> List[Tuple[str, float, int]]:
+    rnd = random.Random(0)
+    weights = [ROUTE_WEIGHTS[route] for route in routes]
+    results, lock = [], threading.Lock()
+
+    def send(route: str, path: str, due: float):
+        try:
+            status = requests.get(app_url + path, timeout=60).status_code
+        except requests.RequestException:
+            status = 0
+        with lock:
+            results.append((route, time.perf_counter() - due, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(int(rps * duration)):
+            due = start + i / rps
+            time.sleep(max(0.0, due - time.perf_counter()))
+            route = rnd.choices(routes, weights)[0]
+            pool.submit(send, route, make_path(route, rnd, num_players), due)
+
+    return results
+
+
+def report(results, calls_before, calls_after, upstream: int, elapsed: float) -> None:
+    """Prints latencies by route, with upstream calls per request when known."""
+    served = sum(1 for r in results if r[2] == 200)
+    print(
+        f"{len(results)} requests in {elapsed:.1f}s, {served / elapsed:.1f}/s served, "
+        f"{upstream / max(len(results), 1):.2f} upstream calls per request"
+    )
+    print(
+        f"{'route':<22} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'upstream/req':>12}"
+    )
+    for route in ROUTE_WEIGHTS:
+        latencies = sorted(r[1] for r in results if r[0] == route)
+        errors = sum(1 for r in results if r[0] == route and r[2] != 200)
+        if len(latencies) < 2:
+            continue
+
+        p = statistics.quantiles(latencies, n=100)
+        per_request = "-"
+        if calls_after is not None:
+            total, count = calls_after.get(route, (0.0, 0.0))
+            before_total, before_count = calls_before.get(route, (0.0, 0.0))
+            served = count - before_count
+            per_request = f"{(total - before_total) / served if served else 0.0:.2f}"
+        print(
+            f"{route:<22} {len(latencies):>8} {errors:>6} {p[49] * 1000:>8.1f} "
+            f"{p[94] * 1000:>8.1f} {p[98] * 1000:>8.1f} {per_request:>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--route",
+        action="append",
+        choices=list(ROUTE_WEIGHTS),
+        help="Only send requests to these routes.",
+    )
+    parser.add_argument("--players", type=int, default=fake_upstream.NUM_PLAYERS)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--archive", help="Recorded payloads for the fake upstream.")
+    parser.add_argument("--upstream-port", type=int, default=8100)
+    parser.add_argument("--app-port", type=int, default=8200)
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+
+    with tempfile.TemporaryDirectory() as root:
+        database = os.path.join(root, "load_test.db")
+        seed(database, args.players)
+
+        upstream_args = [
+            "-m",
+            "benchmarks.fake_upstream",
+            f"--port={args.upstream_port}",
+            f"--players={args.players}",
+            f"--latency={args.latency}",
+            f"--jitter={args.jitter}",
+            f"--error-rate={args.error_rate}",
+        ]
+        if args.archive:
+            upstream_args.append(f"--archive={args.archive}")
+
+        processes = [start(upstream_args, {}, upstream_url)]
+        try:
+            processes.append(
+                start(
+                    [
+                        "-m",
+                        "gunicorn",
+                        "--config=gunicorn.conf.py",
+                        f"--bind=127.0.0.1:{args.app_port}",
+                        "wsgi:app",
+                    ],
+                    {
+                        "WEB_CONCURRENCY": str(args.workers),
+                        "GUNICORN_THREADS": str(args.threads),
+                        "STORAGE_BACKEND": "sqlite",
+                        "SQLITE_PATH": database,
+                        "UPSTREAM_BASE_URL": upstream_url,
+                    },
+                    f"{app_url}/metrics",
+                )
+            )
+
+            single_worker = args.workers == 1
+            calls_before = upstream_calls(app_url) if single_worker else None
+            upstream_before = upstream_requests(upstream_url)
+            started = time.perf_counter()
+            results = run_load(
+                app_url,
+                args.rps,
+                args.duration,
+                args.players,
+                args.concurrency,
+                args.route or list(ROUTE_WEIGHTS),
+            )
+            elapsed = time.perf_counter() - started
+            report(
+                results,
+                calls_before,
+                upstream_calls(app_url) if single_worker else None,
+                upstream_requests(upstream_url) - upstream_before,
+                elapsed,
+            )
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Measures how many bytes a cached TeamMatch (with its games and sets) retains.
+
+Games are decoded from JSON rows the same way rows from the games table are
+(with the timezone Supabase returns), so player names and categories are fresh
+string objects per row.
+
+    python -m benchmarks.model_memory
+"""
+
+import gc
+import json
+import tracemalloc
+
+from app.badminton_player.models import Game, TeamMatch
+from benchmarks import synthetic
+
+NUM_MATCHES = 2000
+
+
+def main():
+    rows = [
+        [dict(g.to_dict(), date=g.to_dict()["date"] + "+00:00") for g in m.games]
+        for m in synthetic.make_matches(NUM_MATCHES)
+    ]
+    matches = json.loads(json.dumps(rows))
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    cached = []
+    for i, games in enumerate(matches):
+        games = [Game.from_json(g) for g in games]
+        cached.append(
+            TeamMatch(id=i, date=games[0].date, division="Division 1", games=games)
+        )
+    del matches
+    gc.collect()
+
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{NUM_MATCHES} matches: {retained / NUM_MATCHES:.0f} bytes per match")
+
+
+if __name__ == "__main__":
+    main()
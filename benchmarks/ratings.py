@@ -0,0 +1,55 @@
+"""Rates a synthetic season of 100k games, from scratch and incrementally.
+
+    python -m benchmarks.ratings
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.badminton_player.game_table import GameTable
+from app.badminton_player.ratings import rate
+from benchmarks import synthetic
+
+NUM_GAMES = 100_000
+NUM_PLAYERS = 5_000
+INCREMENT = 1_000
+
+
+def make_season(num_games: int):
+    rnd = random.Random(0)
+    names = [f"Player {i}" for i in range(NUM_PLAYERS)]
+    start = datetime(2023, 9, 1)
+    games = []
+    for i in range(num_games):
+        # roughly 200 match days over a season
+        date = start + timedelta(days=i * 200 // num_games)
+        category = synthetic.LINE_UP[i % len(synthetic.LINE_UP)]
+        games.append(synthetic.make_game(rnd, date, category, names))
+    return games
+
+
+def main():
+    games = make_season(NUM_GAMES)
+
+    start = time.perf_counter()
+    table = GameTable.from_games(games)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ratings = rate(table, {})
+    full = time.perf_counter() - start
+
+    history, new = games[:-INCREMENT], games[-INCREMENT:]
+    ratings = rate(GameTable.from_games(history), {})
+    start = time.perf_counter()
+    rate(GameTable.from_games(new), ratings)
+    incremental = time.perf_counter() - start
+
+    print(f"columnar table of {NUM_GAMES} games: {build * 1000:.0f} ms")
+    print(f"full recompute of {NUM_GAMES} games: {full * 1000:.0f} ms")
+    print(f"incremental update of {INCREMENT} games: {incremental * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Renders /player/<id> and every match fragment for synthetic profiles.
+
+Upstream and database access is replaced by synthetic data and the views are
+called directly, so the timings only cover building the page context and
+rendering the templates.
+
+    python -m benchmarks.render_player
+"""
+
+import os
+import time
+
+# runs offline against an empty in-memory database
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+
+from app import create_app  # noqa: E402
+from app.badminton_player.game_table import GameTable  # noqa: E402
+from app.services import head_to_head_service, player_service  # noqa: E402
+from app.utils import render_cache  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+
+SIZES = {"small": 5, "medium": 20, "extreme": 60}
+
+# routes are registered when the app is first created, so it is shared by all runs
+app = create_app()
+
+
+def bench(num_matches: int, repeat: int = 50) -> float:
+    return bench_stages(list(synthetic.make_profile_stages(num_matches)), repeat)
+
+
+def bench_stages(stages: list, repeat: int = 50) -> float:
+    """Renders the profile given as iter_player_profile stages, best of `repeat`."""
+    player_view = app.view_functions["player"]
+    fragment_view = app.view_functions["match_fragment"]
+    player = dict(stages)["player"]
+    matches = {v.id: v for stage, v in stages if stage == "match"}
+
+    player_service.iter_player_profile = lambda player_id, fields=None: iter(stages)
+    player_service.get_team_match = lambda match_id, player_id: matches[match_id]
+    player_service.get_player = lambda player_id: player
+    # stands in for the game_pairs lookup with records of everyone in the games
+    games = dict(stages)["games"]
+    opponents = GameTable.from_games(games).player_records()
+    head_to_head_service.get_opponents = lambda player_name: opponents
+
+    best = float("inf")
+    for _ in range(repeat):
+        render_cache._pages.clear()
+        start = time.perf_counter()
+        with app.test_request_context(f"/player/{player.id}"):
+            player_view(player_id=player.id).get_data()
+        for match_id in matches:
+            path = f"/match/{match_id}/fragment?player={player.id}"
+            with app.test_request_context(path):
+                fragment_view(match_id=match_id).get_data()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    for label, num_matches in SIZES.items():
+        seconds = bench(num_matches)
+        print(f"{label:>8} ({num_matches} matches): {seconds * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
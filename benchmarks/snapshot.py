@@ -0,0 +1,163 @@
+"""Compares the player and club snapshot with a per-worker SQLite replica.
+
+Reports the time to build the snapshot, its size, lookup latencies of both,
+and the memory each of --workers processes adds by holding one, with replicas
+loaded from a primary SQLite database the way they are synced. Memory is the
+proportional set size, which splits pages shared by several processes between
+them, so a mapped snapshot is only counted once across the workers. Linux only.
+
+    python -m benchmarks.snapshot --players 100000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+from app.badminton_player.models import Club, Player
+from app.storage.snapshot import Snapshot, write_snapshot
+from app.storage.sqlite_storage import SqliteStorage
+
+NUM_CLUBS = 600
+FIRST_NAMES = ["Anders", "Mette", "Jens", "Sofie", "Søren", "Line", "Emil", "Ida"]
+LAST_NAMES = ["Hansen", "Jensen", "Nielsen", "Pedersen", "Kristensen", "Larsen"]
+
+
+def make_players(num_players: int):
+    rnd = random.Random(0)
+    return [
+        Player(
+            id=i,
+            name=f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}{i % 997}",
+            club_name=f"Badmintonklub {i % NUM_CLUBS}",
+            club_id=i % NUM_CLUBS,
+            birth_date=datetime(1960 + i % 50, 1 + i % 12, 1 + i % 28),
+        )
+        for i in range(1, num_players + 1)
+    ]
+
+
+def make_replica(players, path: str = ":memory:") -> SqliteStorage:
+    replica = SqliteStorage(path)
+    now = datetime.now().isoformat()
+    clubs = {p.club_id: p.club_name for p in players}
+    replica.load_rows(
+        "clubs",
+        [{"bp_id": i, "name": n, "updated_at": now} for i, n in clubs.items()],
+    )
+    replica.load_rows("players", [{**p.to_dict(), "updated_at": now} for p in players])
+    return replica
+
+
+def sync_replica(primary: SqliteStorage) -> SqliteStorage:
+    """Loads a replica the way ReplicatedStorage does, a page at a time."""
+    replica = SqliteStorage(":memory:")
+    for table in ("clubs", "players"):
+        for rows in primary.iter_updated_rows(table, None):
+            replica.load_rows(table, rows)
+    return replica
+
+
+def lookups(reader, num_players: int, repeat: int = 2000) -> dict:
+    rnd = random.Random(1)
+    cases = {
+        "get_player": lambda: reader.get_player(rnd.randint(1, num_players)),
+        "get_players_for_club": lambda: reader.get_players_for_club(
+            rnd.randrange(NUM_CLUBS)
+        ),
+        "get_players_by_name": lambda: reader.get_players_by_name(
+            [f"{rnd.choice(FIRST_NAMES)} Hansen{rnd.randrange(997)}" for _ in range(8)]
+        ),
+        "search_players": lambda: reader.search_players(
+            [rnd.choice(FIRST_NAMES), f"Jensen{rnd.randrange(997)}"]
+        ),
+    }
+
+    timings = {}
+    for name, lookup in cases.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            lookup()
+        timings[name] = (time.perf_counter() - start) / repeat
+    return timings
+
+
+def pss_kib() -> int:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    raise RuntimeError("No Pss in /proc/self/smaps_rollup")
+
+
+def hold(kind: str, path: str, barrier, results) -> None:
+    before = pss_kib()
+    if kind == "snapshot":
+        reader = Snapshot(path)
+        # reads every page, as a long running worker eventually would
+        zlib.crc32(reader._mmap)
+    else:
+        reader = sync_replica(SqliteStorage(path))
+    # every worker holds its copy while the others measure theirs
+    barrier.wait()
+    results.put(pss_kib() - before)
+    barrier.wait()
+
+
+def added_memory(kind: str, path: str, workers: int) -> float:
+    # spawned rather than forked, so the workers share nothing but the snapshot
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=hold, args=(kind, path, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    added = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sum(added) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    players = make_players(args.players)
+    clubs = {p.club_id: p.club_name for p in players}
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "directory.snapshot")
+        primary = os.path.join(root, "primary.db")
+        make_replica(players, primary)
+        start = time.perf_counter()
+        write_snapshot(path, [Club(i, n) for i, n in clubs.items()], players)
+        print(
+            f"snapshot of {args.players} players built in "
+            f"{time.perf_counter() - start:.2f}s, "
+            f"{os.path.getsize(path) / 1024 / 1024:.1f} MiB"
+        )
+
+        snapshot, replica = Snapshot(path), make_replica(players)
+        for name, reader in (("snapshot", snapshot), ("sqlite", replica)):
+            for case, seconds in lookups(reader, args.players).items():
+                print(f"{name:>8} {case:<22} {seconds * 1_000_000:>8.1f} µs")
+
+        for kind, source in (("snapshot", path), ("sqlite", primary)):
+            total = added_memory(kind, source, args.workers)
+            print(
+                f"{kind:>8} memory across {args.workers} workers: {total:.1f} MiB "
+                f"({total / args.workers:.1f} MiB each)"
+            )
+
+
+if __name__ == "__main__":
+    main()
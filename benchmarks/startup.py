@@ -0,0 +1,138 @@
+"""Measures how long the app takes to import, to boot and to answer first.
+
+Every case runs in fresh interpreters, as only a cold start pays for imports.
+Boots are timed until gunicorn answers /metrics, and first requests are a
+player page right after the boot, against benchmarks.fake_upstream and a
+seeded SQLite database, with and without WARM_UP=1.
+
+    python -m benchmarks.startup --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import requests
+
+from benchmarks import load_test
+
+NUM_PLAYERS = 50
+
+IMPORTS = {
+    "interpreter": "pass",
+    "import app.services": "import app.services",
+    "create_app/sqlite": "import app; app.create_app()",
+    "create_app/supabase": "import app; app.create_app()",
+}
+
+
+def time_import(code: str, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, **env},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def time_boot(env: dict, port: int, database: str) -> Dict[str, float]:
+    """Boots a worker against a newly seeded database, as matches get stored."""
+    load_test.seed(database, NUM_PLAYERS)
+    env = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": database, **env}
+    app_url = f"http://127.0.0.1:{port}"
+    args = [
+        "-m",
+        "gunicorn",
+        "--config=gunicorn.conf.py",
+        f"--bind=127.0.0.1:{port}",
+        "wsgi:app",
+    ]
+
+    start = time.perf_counter()
+    process = load_test.start(
+        args, {"WEB_CONCURRENCY": "1", **env}, f"{app_url}/metrics"
+    )
+    try:
+        booted = time.perf_counter()
+        requests.get(f"{app_url}/player/1", timeout=60).raise_for_status()
+        return {"boot": booted - start, "first_request": time.perf_counter() - booted}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(name: str, times) -> None:
+    print(
+        f"{name:<36} best {min(times) * 1000:>8.1f} ms  "
+        f"median {statistics.median(times) * 1000:>8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--upstream-port", type=int, default=8110)
+    parser.add_argument("--app-port", type=int, default=8210)
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+
+    with tempfile.TemporaryDirectory() as root:
+        database = os.path.join(root, "startup.db")
+        load_test.seed(database, NUM_PLAYERS)
+        sqlite = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": database}
+        # the client is built without connecting, so any well-formed key does
+        supabase = {
+            "STORAGE_BACKEND": "supabase",
+            "SUPABASE_URL": "http://127.0.0.1:1",
+            "SUPABASE_KEY": "startup.benchmark.key",
+        }
+
+        for name, code in IMPORTS.items():
+            env = supabase if name.endswith("supabase") else sqlite
+            summarize(name, [time_import(code, env) for _ in range(args.repeat)])
+
+        upstream = load_test.start(
+            [
+                "-m",
+                "benchmarks.fake_upstream",
+                f"--port={args.upstream_port}",
+                f"--players={NUM_PLAYERS}",
+                f"--latency={args.latency}",
+            ],
+            {},
+            upstream_url,
+        )
+        try:
+            for warm_up in ("0", "1"):
+                env = {
+                    "UPSTREAM_BASE_URL": upstream_url,
+                    "WARM_UP": warm_up,
+                    "WARM_UP_PLAYERS": "1",
+                }
+                runs = [
+                    time_boot(
+                        env, args.app_port, os.path.join(root, f"{warm_up}-{i}.db")
+                    )
+                    for i in range(args.repeat)
+                ]
+                for case in ("boot", "first_request"):
+                    summarize(
+                        f"gunicorn {case}, warm_up={warm_up}",
+                        [run[case] for run in runs],
+                    )
+        finally:
+            upstream.terminate()
+            upstream.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measures reads from the SQLite storage backend populated with synthetic data.
+
+    python -m benchmarks.storage
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.badminton_player.models import Player, Standing
+from app.storage.sqlite_storage import SqliteStorage
+from benchmarks import synthetic
+
+NUM_CLUBS = 100
+NUM_PLAYERS = 10_000
+NUM_MATCHES = 5_000
+
+
+def populate(storage: SqliteStorage) -> None:
+    rnd = random.Random(0)
+    for i in range(1, NUM_PLAYERS + 1):
+        storage.upsert_player(
+            Player(
+                id=i,
+                name=f"{rnd.choice(['Anders', 'Mette', 'Jens', 'Sofie'])} Player{i}",
+                club_name=f"Club {i % NUM_CLUBS}",
+                club_id=i % NUM_CLUBS,
+                birth_date=datetime(2000, 1, 1),
+            )
+        )
+        storage.upsert_standings(i, [Standing("Rangliste Single", "A", 1500, 10, i)])
+
+    start = datetime(2023, 9, 1)
+    player = synthetic.make_player()
+    for match_id in range(NUM_MATCHES):
+        match = synthetic.make_match(
+            rnd, match_id, start + timedelta(hours=match_id), player
+        )
+        for game in match.games:
+            storage.upsert_game(match_id, game)
+
+
+def bench(label: str, read, repeat: int = 1000) -> None:
+    start = time.perf_counter()
+    for i in range(repeat):
+        read(i)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:>24}: {elapsed * 1_000_000:.0f} µs")
+
+
+def main():
+    storage = SqliteStorage(":memory:")
+    start = time.perf_counter()
+    populate(storage)
+    print(f"populated in {time.perf_counter() - start:.1f}s")
+
+    since = datetime.now() - timedelta(days=1)
+    bench("get_player", lambda i: storage.get_player(i % NUM_PLAYERS + 1))
+    bench("get_players_for_club", lambda i: storage.get_players_for_club(i % 100))
+    bench("search_players", lambda i: storage.search_players([f"Player{i + 1}"]))
+    bench("get_standings", lambda i: storage.get_standings(i + 1, since))
+    bench(
+        "get_games_for_matches",
+        lambda i: storage.get_games_for_matches([i, i + 1, i + 2, i + 3]),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Runs the offline benchmarks against every fixture set and stores the results.
+
+Results are written as JSON to benchmarks/results/<commit>.json, and passing
+an earlier result with --compare reports the cases that got slower or faster.
+Each case reports the best and median time per call over --repeat runs.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --compare benchmarks/results/<commit>.json
+"""
+
+import argparse
+import contextlib
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from datetime import datetime
+from typing import Callable, Dict
+
+import orjson
+
+# runs offline against an empty in-memory database
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+
+from app.badminton_player.api import Client  # noqa: E402
+from app.badminton_player.models import Game, Player  # noqa: E402
+from app.services import player_service  # noqa: E402
+from app.utils import supabase_utils  # noqa: E402
+from benchmarks import decode_rows, fixtures, render_player  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# changes within this fraction of the baseline are reported as unchanged
+THRESHOLD = 0.1
+
+
+def measure(fn: Callable[[], object], repeat: int, number: int = 1) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {"best": min(times), "median": statistics.median(times)}
+
+
+def profile_stages(fixture: fixtures.FixtureSet) -> list:
+    """Resolves the fixture's profile into iter_player_profile stages."""
+    client = fixture.client
+    player = client.get_player(fixture.player_id)
+    performance = client.get_performance_cached(fixture.player_id)
+
+    matches = []
+    for meta in list(performance.match_metadata)[::-1]:
+        match = client.get_match(meta.id)
+        if match:
+            match.division = meta.division
+            matches.append(match)
+
+    games = [g for m in matches for g in m.games if g.date and g.contains(player.name)]
+    games.sort(key=lambda g: g.date, reverse=True)
+
+    return [
+        ("player", player),
+        ("metadata", performance),
+        ("standings", list(performance.standings)),
+        *(("match", m) for m in matches),
+        ("games", games),
+        ("tournaments", performance.tournaments),
+    ]
+
+
+def run(repeat: int) -> Dict[str, dict]:
+    results = {}
+
+    for name, fixture in fixtures.load().items():
+        client = fixture.client
+        profile = fixture.archive.get(Client.PLAYER_PROFILE, fixture.player_id)
+
+        def get_performance():
+            Client.get_performance_cached.cache_clear()
+            Client.parse_performance_once.cache_clear()
+            client.get_performance_cached(fixture.player_id)
+
+        def get_performance_unchanged():
+            # expired, but refetched as it was, so it is not parsed again
+            Client.get_performance_cached.cache_clear()
+            client.get_performance_cached(fixture.player_id)
+
+        def get_matches():
+            for match_id in fixture.match_ids:
+                client.get_match(match_id)
+
+        stages = profile_stages(fixture)
+        games = dict(stages)["games"]
+
+        results[f"parse_performance/{name}"] = measure(
+            lambda: client.parse_performance(profile), repeat
+        )
+        results[f"get_performance_cached/{name}"] = measure(get_performance, repeat)
+        results[f"get_performance_unchanged/{name}"] = measure(
+            get_performance_unchanged, repeat
+        )
+        results[f"get_match/{name}"] = measure(get_matches, repeat)
+        results[f"search_player/{name}"] = measure(
+            lambda: client.search_player(fixture.search), repeat
+        )
+        results[f"group_games_by_category/{name}"] = measure(
+            lambda: player_service.group_games_by_category(games), repeat, number=100
+        )
+        results[f"render_player/{name}"] = measure(
+            lambda: render_player.bench_stages(stages, repeat=1), repeat
+        )
+
+    for cls, rows in (
+        (Player, decode_rows.player_rows(5_000)),
+        (Game, decode_rows.game_rows(50_000)),
+    ):
+        response = types.SimpleNamespace(data=rows)
+
+        def from_resp():
+            supabase_utils.parse_datetime.cache_clear()
+            supabase_utils.from_resp(response, cls)
+
+        results[f"from_resp/{cls.__name__.lower()}s"] = measure(from_resp, repeat)
+
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict]) -> bool:
+    """Prints every case against the baseline and returns whether any regressed."""
+    regressed = False
+    for case, result in results.items():
+        if case not in baseline:
+            print(f"{case:<40} {result['best'] * 1000:>10.3f} ms  (new)")
+            continue
+
+        ratio = result["best"] / baseline[case]["best"]
+        status = ""
+        if ratio > 1 + THRESHOLD:
+            status, regressed = "slower", True
+        elif ratio < 1 - THRESHOLD:
+            status = "faster"
+        print(
+            f"{case:<40} {baseline[case]['best'] * 1000:>10.3f} ms -> "
+            f"{result['best'] * 1000:>10.3f} ms  {ratio:5.2f}x  {status}"
+        )
+    return regressed
+
+
+def git_commit() -> tuple:
+    def git(*args) -> str:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(
+        git("status", "--porcelain", "--untracked-files=no")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Defaults to results/<commit>.json.")
+    parser.add_argument("--compare", help="Earlier results to compare against.")
+    args = parser.parse_args()
+
+    # the parsers log every page they read
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = run(args.repeat)
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            baseline = orjson.loads(f.read())
+        print(f"Compared with {baseline['commit']}:")
+        regressed = compare(results, baseline["results"])
+    else:
+        for case, result in results.items():
+            print(f"{case:<40} {result['best'] * 1000:>10.3f} ms")
+
+    print(f"Results written to {output}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from app.badminton_player.models import (
+    Game,
+    Player,
+    PlayerPerformance,
+    Set,
+    Standing,
+    TeamMatch,
+    Tournament,
+)
+
+# team match line-up as played in the Danish league
+LINE_UP = ["1. MD", "2. MD", "1. DS", "2. DS", "1. HS", "2. HS", "1. DD", "1. HD"]
+
+
+def make_player(player_id: int = 1) -> Player:
+    return Player(
+        id=player_id,
+        name=f"Player {player_id}",
+        club_name="Benchmark Club",
+        club_id=1,
+        birth_date=datetime(2000, 1, 1),
+    )
+
+
+def make_game(rnd: random.Random, date: datetime, category: str, names: List[str]):
+    doubles = category[3:] in ("MD", "DD", "HD")
+    sets = []
+    for number in range(1, rnd.choice([2, 2, 3]) + 1):
+        winner, loser = 21, rnd.randint(5, 19)
+        if rnd.random() < 0.5:
+            winner, loser = loser, winner
+        sets.append(Set(number=number, home_points=winner, away_points=loser))
+
+    players = rnd.sample(names, 4)
+    return Game(
+        date=date,
+        category=category,
+        sets=sets,
+        home_player1=players[0],
+        home_player2=players[1] if doubles else None,
+        away_player1=players[2],
+        away_player2=players[3] if doubles else None,
+    )
+
+
+def make_match(
+    rnd: random.Random, match_id: int, date: datetime, player: Player
+) -> TeamMatch:
+    names = [f"Player {i}" for i in range(2, 200)]
+    games = [make_game(rnd, date, category, names) for category in LINE_UP]
+    # the player appears in two games of every match
+    games[0].home_player1 = player.name
+    games[4].home_player1 = player.name
+    return TeamMatch(
+        id=match_id,
+        date=date,
+        division=f"Division {match_id % 3}",
+        games=games,
+        home_team=f"{player.club_name} 1",
+        away_team="Opponent 1",
+        home_club=player.club_name,
+        away_club="Opponent Club",
+    )
+
+
+def make_population(num_players: int, players_per_club: int = 25) -> List[Player]:
+    """Players with ids 1..num_players in clubs of `players_per_club`."""
+    players = []
+    for player_id in range(1, num_players + 1):
+        club_id = (player_id - 1) // players_per_club + 1
+        player = make_player(player_id)
+        player.club_id, player.club_name = club_id, f"Club {club_id}"
+        players.append(player)
+    return players
+
+
+def make_profile_stages(
+    num_matches: int, seed: int = 0, player: Optional[Player] = None
+) -> Iterator[Tuple[str, object]]:
+    """Yields the same stages as player_service.iter_player_profile.
+
+    Match ids are 1000 * player id + the match number, so profiles of different
+    players do not share matches.
+    """
+    rnd = random.Random(seed)
+    player = player or make_player()
+    start = datetime(2023, 9, 1)
+
+    matches = [
+        make_match(rnd, 1000 * player.id + i, start + timedelta(days=7 * i), player)
+        for i in range(num_matches)
+    ][::-1]
+    games = sorted(
+        [g for m in matches for g in m.games if g.contains(player.name)],
+        key=lambda g: g.date,
+        reverse=True,
+    )
+    standings = [
+        Standing("Rangliste Single", "A", 1500, num_matches, 12),
+        Standing("Rangliste Mix", "A", 1300, num_matches, -1),
+        Standing("Rangliste Double", "A", 1200, num_matches, 40),
+    ]
+    tournaments = [
+        Tournament(
+            bp_id=i, date=start + timedelta(days=30 * i), host_club="Host", level="A"
+        )
+        for i in range(num_matches // 10)
+    ]
+
+    yield "player", player
+    yield "metadata", PlayerPerformance(1400, standings, [], tournaments)
+    yield "standings", standings
+    for match in matches:
+        yield "match", match
+    yield "games", games
+    yield "tournaments", tournaments
+
+
+def make_matches(
+    num_matches: int, seed: int = 0, player: Optional[Player] = None
+) -> List[TeamMatch]:
+    stages = make_profile_stages(num_matches, seed, player)
+    return [v for stage, v in stages if stage == "match"]
+
+
+def make_match_html(match: TeamMatch) -> str:
+    """Renders a match like the UdskrivHoldkamp page that Client.parse_match reads."""
+    days = {
+        "Mon": "ma",
+        "Tue": "ti",
+        "Wed": "on",
+        "Thu": "to",
+        "Fri": "fr",
+        "Sat": "lø",
+        "Sun": "sø",
+    }
+    day = days[match.date.strftime("%a")]
+    time = f"{day} {match.date.strftime('%d-%m-%Y %H:%M')}"
+
+    def players(*names) -> str:
+        return "<div>Spillere</div>" + "".join(f"<div>{n}</div>" for n in names if n)
+
+    rows = []
+    for game in match.games:
+        scores = [f"<td>{s.home_points}-{s.away_points}</td>" for s in game.sets]
+        scores += ["<td></td>"] * (3 - len(scores))
+        rows.append(
+            f"<tr><td>{game.category}</td>"
+            f"<td>{players(game.home_player1, game.home_player2)}</td>"
+            f"<td>{players(game.away_player1, game.away_player2)}</td>"
+            f"{''.join(scores)}</tr>"
+        )
+
+    return (
+        "<html><body>"
+        "<table><tr>"
+        f"<td><span>Kampnr</span>{match.id}</td>"
+        f"<td><span>Række</span>{match.division}</td>"
+        f"<td><span>Tid</span>{time}</td>"
+        "</tr></table>"
+        f"<table><tr><td>{match.home_team}</td><td></td><td>"
+        f"{match.home_points}-{match.away_points}</td><td></td>"
+        f"<td>{match.away_team}</td></tr></table>"
+        "<table><tr><th>Kamp</th><th>Hjemme</th><th>Ude</th><th colspan=3>Sæt</th>"
+        f"</tr>{''.join(rows)}</table>"
+        "</body></html>"
+    )
+
+
+def make_profile_json(
+    num_matches: int, seed: int = 0, player: Optional[Player] = None
+) -> str:
+    """Renders a GetPlayerProfile response that Client.parse_performance reads.
+
+    The profile lists the matches of make_profile_stages with the same ids, so
+    the pages of make_match_html resolve them.
+    """
+    stages = list(make_profile_stages(num_matches, seed, player))
+    player = dict(stages)["player"]
+    performance = dict(stages)["metadata"]
+    matches = [v for stage, v in stages if stage == "match"][::-1]
+
+    def table(columns, rows) -> str:
+        header = "".join(f"<th>{c}</th>" for c in columns)
+        body = "".join(
+            "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>"
+            for row in rows
+        )
+        return f"<table><tr>{header}</tr>{body}</table>"
+
+    html = (
+        "<table><tr><td>Tilmeldingsniveau ved sæsonstart:</td>"
+        f"<td>{performance.season_start_points}</td></tr></table>"
+        + table(
+            ["Rangliste", "Række", "Point", "Kampe", "Placering"],
+            [
+                (s.category, s.tier, s.num_points, s.num_matches, s.ranking)
+                for s in performance.standings
+            ],
+        )
+        + table(
+            ["Kampdato", "Række", "Hold", "Modstander"],
+            [
+                (
+                    f"<a onclick=\"ShowMatch(1,{m.id},'')\">"
+                    f"{m.date.strftime('%d-%m-%Y %H:%M:%S')}</a>",
+                    m.division,
+                    m.home_team,
+                    m.away_team,
+                )
+                for m in matches
+            ],
+        )
+        + table(
+            ["Dato", "Række", "Klub"],
+            [
+                (
+                    t.date.strftime("%d-%m-%Y"),
+                    f'<a href="/Turnering/{t.bp_id}">{t.level}</a>',
+                    t.host_club,
+                )
+                for t in performance.tournaments
+            ],
+        )
+    )
+
+    return json.dumps(
+        {
+            "d": {
+                "Html": html,
+                "playernumber": player.birth_date.strftime("%y%m%d") + "-0000",
+                "playername": player.name,
+                "clubid": player.club_id,
+                "clubname": player.club_name,
+            }
+        }
+    )
+
+
+def make_search_json(players: List[Player]) -> str:
+    """Renders a SearchPlayer response that Client.parse_search_player reads."""
+    rows = "".join(
+        f"<tr onclick=\"SPSel1('{p.id}', '{p.birth_date.strftime('%y%m%d')}-0000', "
+        f"'{p.name}', '{p.club_id}', '{p.club_name}', 'M')\">"
+        f"<td></td><td>{p.name}</td><td></td><td>{p.club_name}</td></tr>"
+        for p in players
+    )
+    return json.dumps({"d": {"Html": f"<table>{rows}</table>"}})
@@ -0,0 +1,14 @@
+import os
+
+bind = f":{os.getenv('PORT', '8000')}"
+
+# every worker process has its own caches, so a few processes with many threads
+# each share more of them than many single threaded processes would. Requests
+# mostly wait on badmintonplayer.dk, which threads or gevent overlap
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# a club dashboard that misses the cache can take a while to aggregate
+timeout = 120
+graceful_timeout = 30
@@ -1,4 +1,6 @@
 from app import create_app, is_production
 
 app = create_app()
-app.run(host="0.0.0.0", debug=not is_production)
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", debug=not is_production)